@@ -0,0 +1,107 @@
+"""
+Shared plumbing for resumable, polite scrapers.
+
+Classes:
+    CrawlState: Persistent record of fetched URLs with their ETag/Last-Modified validators
+    HostThrottle: Enforces a minimum interval between requests to the same host
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from urllib.parse import urlsplit
+
+
+#################
+## Crawl State ##
+#################
+
+
+class CrawlState:
+    """
+    SQLite-backed crawl state, safe to share between worker threads.
+
+    Each URL is stored with its status ('pending' once discovered, 'done' once its output has
+    been written) and the validators from its last response, so reruns can pick up pages that
+    were found but never finished, skip finished ones and send conditional requests for the
+    ones that may have changed.
+    """
+
+    def __init__(self, path: str):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            " url TEXT PRIMARY KEY, status TEXT NOT NULL, etag TEXT, last_modified TEXT, updated_at REAL NOT NULL)"
+        )
+        self._db.commit()
+
+    def is_done(self, url: str) -> bool:
+        with self._lock:
+            row = self._db.execute("SELECT status FROM pages WHERE url = ?", (url,)).fetchone()
+        return row is not None and row[0] == 'done'
+
+    def add_pending(self, urls):
+        """Record newly discovered URLs as 'pending', leaving URLs already known untouched."""
+        now = time.time()
+        with self._lock:
+            self._db.executemany(
+                "INSERT INTO pages (url, status, updated_at) VALUES (?, 'pending', ?) ON CONFLICT(url) DO NOTHING",
+                [(url, now) for url in urls]
+            )
+            self._db.commit()
+
+    def pending(self) -> list:
+        """URLs discovered earlier but not finished, e.g. because they failed or the run was interrupted."""
+        with self._lock:
+            return [row[0] for row in self._db.execute("SELECT url FROM pages WHERE status = 'pending'")]
+
+    def conditional_headers(self, url: str) -> dict:
+        """Return If-None-Match/If-Modified-Since headers from the URL's last response."""
+        with self._lock:
+            row = self._db.execute("SELECT etag, last_modified FROM pages WHERE url = ?", (url,)).fetchone()
+        headers = {}
+        if row and row[0]: headers['If-None-Match'] = row[0]
+        if row and row[1]: headers['If-Modified-Since'] = row[1]
+        return headers
+
+    def record(self, url: str, status: str, response=None):
+        """Store the URL's status, keeping validators from the response when it has them."""
+        etag = response.headers.get('ETag') if response is not None else None
+        last_modified = response.headers.get('Last-Modified') if response is not None else None
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO pages VALUES (?, ?, ?, ?, ?) ON CONFLICT(url) DO UPDATE SET "
+                " status = excluded.status, etag = COALESCE(excluded.etag, pages.etag),"
+                " last_modified = COALESCE(excluded.last_modified, pages.last_modified),"
+                " updated_at = excluded.updated_at",
+                (url, status, etag, last_modified, time.time())
+            )
+            self._db.commit()
+
+
+###################
+## Host Throttle ##
+###################
+
+
+class HostThrottle:
+    """Spaces requests to each host at least `interval` seconds apart, across all threads."""
+
+    def __init__(self, interval: float = 1.0):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._next = {}
+
+    def wait(self, url: str):
+        host = urlsplit(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next.get(host, now))
+            self._next[host] = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
@@ -0,0 +1,75 @@
+"""
+Pluggable local text embedders for the RAG index.
+
+An embedder turns a batch of texts into an (n, dim) float32 matrix of L2-normalized rows,
+so a dot product between rows is their cosine similarity.
+
+Classes:
+    HashingEmbedder: Dependency-free feature-hashing embedder (the default)
+    SentenceTransformerEmbedder: Wraps a local sentence-transformers model
+
+Functions:
+    get_embedder: Build an embedder from its name as stored in an index's metadata
+"""
+
+import re
+import zlib
+
+import numpy as np
+
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9']+")
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms > 0)
+
+
+class HashingEmbedder:
+    """
+    Hashes unigrams and bigrams into signed buckets. Needs no model download and embeds
+    thousands of chunks per second, at the cost of only matching on shared vocabulary.
+    """
+
+    def __init__(self, dim: int = 256):
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+
+    def embed(self, texts: list) -> np.ndarray:
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            tokens = TOKEN_PATTERN.findall(text.lower())
+            for feature in tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]:
+                bucket = zlib.crc32(feature.encode())
+                matrix[row, bucket % self.dim] += 1.0 if bucket & 0x80000000 else -1.0
+        return _normalize(matrix)
+
+
+class SentenceTransformerEmbedder:
+    """
+    Wraps a locally available sentence-transformers model. The package is optional and only
+    imported when this embedder is used.
+    """
+
+    def __init__(self, model: str = "all-MiniLM-L6-v2", batch_size: int = 64):
+        from sentence_transformers import SentenceTransformer
+
+        self.model = SentenceTransformer(model)
+        self.batch_size = batch_size
+        self.dim = self.model.get_sentence_embedding_dimension()
+        self.name = f"st-{model}"
+
+    def embed(self, texts: list) -> np.ndarray:
+        vectors = self.model.encode(texts, batch_size=self.batch_size, convert_to_numpy=True,
+                                    normalize_embeddings=True)
+        return vectors.astype(np.float32, copy=False)
+
+
+def get_embedder(name: str = "hashing-256"):
+    """Build the embedder an index was created with, e.g. 'hashing-256' or 'st-all-MiniLM-L6-v2'."""
+    if name.startswith("hashing-"):
+        return HashingEmbedder(int(name.split("-", 1)[1]))
+    if name.startswith("st-"):
+        return SentenceTransformerEmbedder(name[3:])
+    raise ValueError(f"Unknown embedder: {name}")
@@ -0,0 +1,321 @@
+"""
+A retrieval index over the RAG knowledge sources.
+
+Documents (Pitchfork reviews and the Reddit knowledge files under data/) are split into
+overlapping chunks and embedded. The vectors are stored as one float32 matrix on disk and
+memory-mapped at load time. A JSON Lines sidecar holds each chunk's ID, source and text,
+with a row-offset array so text is read only for the rows a query returns.
+
+Exact search runs batched matrix products over the matrix in fixed-size blocks. Indexes of
+IVF_MIN_CHUNKS chunks or more also get an IVF index (k-means centroids and inverted lists),
+and queries are then narrowed to the nprobe closest lists unless exact search is requested.
+Such indexes store their rows grouped by list, so each probed list is one contiguous slice of
+the matrix, scored for every query that probes it at once.
+
+Layout of an index directory:
+    meta.json       dim, count, embedder name, IVF lists and default nprobe
+    vectors.f32     (count, dim) float32, row-major; grouped by IVF list when there are lists
+    chunks.jsonl    one {"id", "source", "text"} object per chunk, in the order they were indexed
+    offsets.npy     int64 byte offset of each row's chunk in chunks.jsonl
+    ivf_*.npy       centroids and the first row of each list (IVF only)
+
+Functions:
+    chunk_text: Split text into overlapping word windows
+    iter_source_documents: Yield documents from the scraped RAG sources
+    build_index: Chunk, embed and write an index directory
+    get_knowledge_index: Return the process-wide index, or None if none has been built
+
+Classes:
+    VectorIndex: A memory-mapped index answering top-k queries
+"""
+
+import glob
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+from RAG.embedders import HashingEmbedder, get_embedder
+
+
+INDEX_DIR = os.getenv("RAG_INDEX_DIR", "data/index")
+
+# Below this many chunks, exact search over the memory-mapped matrix is fast enough on its own.
+IVF_MIN_CHUNKS = int(os.getenv("RAG_IVF_MIN_CHUNKS", "50000"))
+
+# Lists probed per query by default. With about sqrt(chunks) lists, probing 8 scans 2.5% of a
+# 100k-chunk index; indexes with over a million chunks have finer lists and probe 16.
+NPROBE = 8
+NPROBE_LARGE = 16
+NPROBE_LARGE_LISTS = 1024
+
+
+##############
+## Chunking ##
+##############
+
+
+def chunk_text(text: str, size: int = 120, overlap: int = 30) -> list:
+    """Split text into windows of `size` words, each overlapping the previous by `overlap` words."""
+    words = text.split()
+    if not words:
+        return []
+    step = max(1, size - overlap)
+    return [" ".join(words[start:start + size]) for start in range(0, max(1, len(words) - overlap), step)]
+
+
+def _iter_reviews(data_dir: str):
+    """Yield reviews from the one-shot JSON dump and the incremental JSON Lines crawl output."""
+    pitchfork = os.path.join(data_dir, "pitchfork.json")
+    if os.path.exists(pitchfork):
+        with open(pitchfork, encoding='utf-8') as file:
+            yield from json.load(file)
+
+    pitchfork_lines = os.path.join(data_dir, "pitchfork.jsonl")
+    if os.path.exists(pitchfork_lines):
+        with open(pitchfork_lines, encoding='utf-8') as file:
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def iter_source_documents(data_dir: str = "data"):
+    """
+    Yield (doc_id, source, text) for every scraped document: each Pitchfork review in
+    pitchfork.json or pitchfork.jsonl and each REDDIT-*.txt knowledge file.
+    """
+    seen = set()
+    for review in _iter_reviews(data_dir):
+        if not review or review.get('URL') in seen:
+            continue
+        seen.add(review.get('URL'))
+        text = (f"{review.get('Artist', '')} - {review.get('Title', '')} "
+                f"({review.get('Genre', '')}, rated {review.get('Rating', '')}). {review.get('Description', '')}")
+        yield review.get('URL', text[:80]), "pitchfork", text
+
+    for path in sorted(glob.glob(os.path.join(data_dir, "REDDIT-*.txt"))):
+        with open(path, encoding='utf-8') as file:
+            yield os.path.basename(path), "reddit", file.read()
+
+
+###################
+## Index Builder ##
+###################
+
+
+def build_index(documents, index_dir: str = INDEX_DIR, embedder=None, batch_size: int = 1024,
+                ivf_lists: int = None, ivf_iterations: int = 10, chunk_size: int = 120, chunk_overlap: int = 30):
+    """
+    Chunk, embed and write documents to an index directory, streaming so memory stays flat.
+
+    Args:
+        documents: Iterable of (doc_id, source, text)
+        embedder: Object with name, dim and embed(texts); defaults to HashingEmbedder
+        batch_size: Chunks embedded and written per step
+        ivf_lists: Number of IVF lists to build; None builds about sqrt(chunks) lists once there are
+            IVF_MIN_CHUNKS chunks, 0 builds none (exact search only)
+
+    Returns:
+        int: Number of chunks indexed.
+    """
+    embedder = embedder or HashingEmbedder()
+    os.makedirs(index_dir, exist_ok=True)
+    start = time.perf_counter()
+
+    count, offsets, pending = 0, [], []
+    with open(os.path.join(index_dir, "vectors.f32"), 'wb') as vectors, \
+         open(os.path.join(index_dir, "chunks.jsonl"), 'wb') as chunks:
+
+        def flush():
+            nonlocal count
+            embedder.embed([chunk['text'] for chunk in pending]).astype(np.float32).tofile(vectors)
+            for chunk in pending:
+                offsets.append(chunks.tell())
+                chunks.write(json.dumps(chunk, ensure_ascii=False).encode('utf-8') + b"\n")
+            count += len(pending)
+            pending.clear()
+
+        for doc_id, source, text in documents:
+            for i, chunk in enumerate(chunk_text(text, chunk_size, chunk_overlap)):
+                pending.append({'id': f"{doc_id}#{i}", 'source': source, 'text': chunk})
+                if len(pending) == batch_size:
+                    flush()
+        if pending:
+            flush()
+
+    offsets = np.asarray(offsets, dtype=np.int64)
+    meta = {'dim': embedder.dim, 'count': count, 'embedder': embedder.name, 'ivf_lists': 0}
+    if ivf_lists is None:
+        ivf_lists = int(np.sqrt(count)) if count >= IVF_MIN_CHUNKS else 0
+    if ivf_lists and count > ivf_lists:
+        order = _build_ivf(index_dir, count, embedder.dim, ivf_lists, ivf_iterations)
+        offsets = offsets[order]
+        meta['ivf_lists'] = ivf_lists
+        meta['ivf_grouped'] = True
+        meta['nprobe'] = _default_nprobe(ivf_lists)
+    np.save(os.path.join(index_dir, "offsets.npy"), offsets)
+
+    with open(os.path.join(index_dir, "meta.json"), 'w') as file:
+        json.dump(meta, file)
+    print(f"Indexed {count} chunks in {time.perf_counter() - start:.2f}s to {index_dir}")
+    return count
+
+
+def _default_nprobe(lists: int) -> int:
+    return min(lists, NPROBE_LARGE if lists >= NPROBE_LARGE_LISTS else NPROBE)
+
+
+def _build_ivf(index_dir: str, count: int, dim: int, lists: int, iterations: int, sample: int = 100_000,
+               block: int = 65536) -> np.ndarray:
+    """
+    Spherical k-means on a sample, then assign every row and rewrite vectors.f32 with the rows
+    grouped by list. Returns the new row order (new row -> original row).
+    """
+    path = os.path.join(index_dir, "vectors.f32")
+    vectors = np.memmap(path, dtype=np.float32, mode='r', shape=(count, dim))
+    rng = np.random.default_rng(0)
+    sample_rows = np.sort(rng.choice(count, size=min(sample, count), replace=False))
+    training = np.asarray(vectors[sample_rows])
+    centroids = training[rng.choice(len(training), size=lists, replace=False)].copy()
+
+    for _ in range(iterations):
+        assign = np.argmax(training @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, training)
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        centroids = np.where(norms > 0, sums / np.maximum(norms, 1e-12), centroids)
+
+    assign = np.empty(count, dtype=np.int32)
+    for start in range(0, count, block):
+        assign[start:start + block] = np.argmax(np.asarray(vectors[start:start + block]) @ centroids.T, axis=1)
+
+    order = np.argsort(assign, kind='stable').astype(np.int64)
+    bounds = np.searchsorted(assign[order], np.arange(lists + 1)).astype(np.int64)
+    with open(path + ".tmp", 'wb') as grouped:
+        for start in range(0, count, block):
+            np.asarray(vectors[order[start:start + block]]).tofile(grouped)
+    del vectors
+    os.replace(path + ".tmp", path)
+    np.save(os.path.join(index_dir, "ivf_centroids.npy"), centroids.astype(np.float32))
+    np.save(os.path.join(index_dir, "ivf_bounds.npy"), bounds)
+    return order
+
+
+##################
+## Vector Index ##
+##################
+
+
+class VectorIndex:
+    def __init__(self, index_dir: str = INDEX_DIR, embedder=None):
+        """
+        Memory-map an index directory written by build_index. Loading is instant and the
+        vector pages are shared between processes by the OS page cache.
+        """
+        with open(os.path.join(index_dir, "meta.json")) as file:
+            self.meta = json.load(file)
+        self.embedder = embedder or get_embedder(self.meta['embedder'])
+        self.vectors = np.memmap(os.path.join(index_dir, "vectors.f32"), dtype=np.float32, mode='r',
+                                 shape=(self.meta['count'], self.meta['dim']))
+        self.offsets = np.load(os.path.join(index_dir, "offsets.npy"), mmap_mode='r')
+        self._chunks = open(os.path.join(index_dir, "chunks.jsonl"), 'rb')
+        self._chunks_lock = threading.Lock()
+
+        self.centroids = None
+        self.nprobe = 0
+        # Indexes built before rows were grouped by list are searched exactly until rebuilt.
+        if self.meta.get('ivf_lists') and self.meta.get('ivf_grouped'):
+            self.nprobe = self.meta.get('nprobe') or _default_nprobe(self.meta['ivf_lists'])
+            self.centroids = np.load(os.path.join(index_dir, "ivf_centroids.npy"))
+            self.bounds = np.load(os.path.join(index_dir, "ivf_bounds.npy"))
+
+    def __len__(self) -> int:
+        return self.meta['count']
+
+    def __repr__(self) -> str:
+        return f"VectorIndex(count={len(self)}, dim={self.meta['dim']}, ivf_lists={self.meta.get('ivf_lists', 0)})"
+
+    def search(self, queries: list, k: int = 5, nprobe: int = None, block: int = 65536) -> list:
+        """
+        Return the top-k chunks for each query string.
+
+        Args:
+            queries: Query strings, embedded and scored together as one batch
+            k: Results per query
+            nprobe: Search only the nprobe closest IVF lists (approximate); None for the index's
+                default (approximate when it has IVF lists), 0 for exact search
+
+        Returns:
+            list: One list per query of {'id', 'source', 'text', 'score'} dicts, best first.
+        """
+        if not len(self) or not queries:
+            return [[] for _ in queries]
+        q = self.embedder.embed(list(queries))
+        if nprobe is None:
+            nprobe = self.nprobe
+        if nprobe and self.centroids is not None:
+            rows, scores = self._search_ivf(q, k, nprobe)
+        else:
+            rows, scores = self._search_exact(q, k, block)
+        return [[{**self._chunk(row), 'score': float(score)} for row, score in zip(r, s) if row >= 0]
+                for r, s in zip(rows, scores)]
+
+    def _search_exact(self, q: np.ndarray, k: int, block: int):
+        best_rows = np.full((len(q), 0), -1, dtype=np.int64)
+        best_scores = np.empty((len(q), 0), dtype=np.float32)
+        for start in range(0, len(self), block):
+            scores = q @ np.asarray(self.vectors[start:start + block]).T
+            rows = np.broadcast_to(np.arange(start, start + scores.shape[1]), scores.shape)
+            best_rows, best_scores = _top_k(np.hstack([best_rows, rows]), np.hstack([best_scores, scores]), k)
+        return best_rows, best_scores
+
+    def _search_ivf(self, q: np.ndarray, k: int, nprobe: int):
+        """Score each probed list once, as one contiguous slice, against every query probing it."""
+        probes = np.argsort(-(q @ self.centroids.T), axis=1)[:, :nprobe]
+        best_rows = np.full((len(q), k), -1, dtype=np.int64)
+        best_scores = np.full((len(q), k), -np.inf, dtype=np.float32)
+        for l in np.unique(probes):
+            start, end = self.bounds[l], self.bounds[l + 1]
+            if start == end:
+                continue
+            probing = np.flatnonzero((probes == l).any(axis=1))
+            scores = q[probing] @ np.asarray(self.vectors[start:end]).T
+            rows = np.broadcast_to(np.arange(start, end), scores.shape)
+            best_rows[probing], best_scores[probing] = _top_k(
+                np.hstack([best_rows[probing], rows]), np.hstack([best_scores[probing], scores]), k)
+        return best_rows, best_scores
+
+    def _chunk(self, row: int) -> dict:
+        with self._chunks_lock:
+            self._chunks.seek(int(self.offsets[row]))
+            return json.loads(self._chunks.readline())
+
+
+def _top_k(rows: np.ndarray, scores: np.ndarray, k: int):
+    """Keep the k highest-scoring columns of each row, sorted best first."""
+    if scores.shape[1] > k:
+        keep = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        rows, scores = np.take_along_axis(rows, keep, axis=1), np.take_along_axis(scores, keep, axis=1)
+    order = np.argsort(-scores, axis=1, kind='stable')
+    return np.take_along_axis(rows, order, axis=1), np.take_along_axis(scores, order, axis=1)
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_knowledge_index(index_dir: str = INDEX_DIR):
+    """Return the process-wide VectorIndex, loading it on first use; None if no index is built."""
+    global _index
+    if _index is None and os.path.exists(os.path.join(index_dir, "meta.json")):
+        with _index_lock:
+            if _index is None:
+                _index = VectorIndex(index_dir)
+    return _index
+
+
+if __name__ == "__main__":
+    ivf_lists = os.getenv("RAG_IVF_LISTS")
+    build_index(iter_source_documents(), ivf_lists=int(ivf_lists) if ivf_lists else None)
@@ -0,0 +1,84 @@
+"""
+Benchmark the HTML extractors over a directory of saved pages.
+
+Each extractor runs in its own subprocess so that peak RSS is measured per parser rather than
+for whichever ran first. Every extractor is also checked against the baseline (html.parser)
+output, so a faster parser that extracts different text is reported rather than silently used.
+
+Usage:
+    python -m RAG.sources.bench_extractors data/pages/ [--repeat 3] [--extractors lxml selectolax]
+"""
+
+import argparse
+import glob
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+from RAG.sources.extractors import EXTRACTORS, get_extractor
+
+
+def _load_pages(page_dir: str) -> list:
+    pages = []
+    for path in sorted(glob.glob(os.path.join(page_dir, "*.html"))):
+        with open(path, 'rb') as file:
+            pages.append((path, file.read()))
+    return pages
+
+
+def run_one(name: str, page_dir: str, repeat: int) -> dict:
+    """Time one extractor over every page, returning throughput, peak RSS and its extracted output."""
+    pages = _load_pages(page_dir)
+    extractor = get_extractor(name)
+    results = [extractor.extract(content, path) for path, content in pages]  # warm-up, and for comparison
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for path, content in pages:
+            extractor.extract(content, path)
+    elapsed = time.perf_counter() - start
+
+    return {
+        'extractor': name,
+        'pages': len(pages),
+        'pages_per_sec': len(pages) * repeat / elapsed if elapsed else 0.0,
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,  # KiB on Linux
+        'results': results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("page_dir", help="Directory of saved review pages (*.html)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--extractors", nargs="*", default=list(EXTRACTORS))
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_one(args.worker, args.page_dir, args.repeat)))
+        return
+
+    reports = {}
+    for name in args.extractors:
+        proc = subprocess.run([sys.executable, "-m", "RAG.sources.bench_extractors", args.page_dir,
+                               "--repeat", str(args.repeat), "--worker", name], capture_output=True, text=True)
+        if proc.returncode != 0:
+            print(f"{name:14} unavailable: {proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else 'failed'}")
+            continue
+        reports[name] = json.loads(proc.stdout)
+
+    baseline = reports.get('soup', {}).get('results')
+    print(f"{'extractor':14} {'pages':>6} {'pages/sec':>10} {'peak RSS MB':>12}  matches baseline")
+    for name, report in reports.items():
+        matches = "n/a"
+        if baseline is not None:
+            matches = f"{sum(a == b for a, b in zip(report['results'], baseline))}/{report['pages']}"
+        print(f"{name:14} {report['pages']:>6} {report['pages_per_sec']:>10.1f} {report['peak_rss_mb']:>12.1f}  {matches}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""
+Pluggable HTML extractors for scraped pages.
+
+An extractor pulls named fields out of a page using a declarative selector config: a JSON file
+mapping each field to a list of CSS selectors tried in order. When a site's hashed class names
+change, only the config needs updating; the prefix-match fallbacks (e.g. [class*='Rating-'])
+usually keep working in the meantime.
+
+Classes:
+    SoupExtractor: BeautifulSoup with html.parser over the full tree (the original behavior)
+    StrainedSoupExtractor: BeautifulSoup with lxml, building only the subtrees the selectors can match
+    LxmlExtractor: lxml with selectors precompiled to XPath
+    SelectolaxExtractor: selectolax's Lexbor parser, the fastest option
+
+Functions:
+    load_selectors: Read a selector config
+    get_extractor: Build an extractor by name, or the fastest one installed
+"""
+
+import importlib.util
+import json
+import os
+import re
+
+
+SELECTOR_DIR = os.path.join(os.path.dirname(__file__), "selectors")
+
+
+def load_selectors(name: str = "pitchfork_review") -> dict:
+    """Read a selector config ({'required': [...], 'fields': {field: [selector, ...]}}) by name or path."""
+    path = name if name.endswith(".json") else os.path.join(SELECTOR_DIR, f"{name}.json")
+    with open(path, encoding='utf-8') as file:
+        return json.load(file)
+
+
+class _Extractor:
+    name = None
+    # Modules the parser needs. Most are only imported when a page is parsed, so they are looked
+    # up here to fail at construction, which lets get_extractor move on to the next extractor.
+    requires = ()
+
+    def __init__(self, selectors: dict = None):
+        missing = [module for module in self.requires if importlib.util.find_spec(module) is None]
+        if missing:
+            raise ImportError(f"The {self.name} extractor needs {', '.join(missing)}")
+        self.selectors = selectors or load_selectors()
+        self.fields = self.selectors['fields']
+        self.required = self.selectors.get('required', [])
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(fields={list(self.fields)})"
+
+    def extract(self, content, url: str = None):
+        """
+        Return a dict of field -> text (None when no selector matched), with 'URL' first when given.
+        Returns None if any required field is missing, e.g. for pages without a review layout.
+        """
+        root = self._parse(content)
+        details = {'URL': url} if url is not None else {}
+        for field, selectors in self.fields.items():
+            details[field] = None
+            for selector in selectors:
+                text = self._first_text(root, selector)
+                if text is not None:
+                    details[field] = text
+                    break
+        if any(details[field] is None for field in self.required):
+            return None
+        return details
+
+    def _parse(self, content):
+        raise NotImplementedError
+
+    def _first_text(self, root, selector):
+        raise NotImplementedError
+
+
+class SoupExtractor(_Extractor):
+    name = "soup"
+    requires = ("bs4",)
+
+    def _parse(self, content):
+        from bs4 import BeautifulSoup
+        return BeautifulSoup(content, 'html.parser')
+
+    def _first_text(self, root, selector):
+        node = root.select_one(selector)
+        return node.text if node is not None else None
+
+
+_SIMPLE_SELECTOR = re.compile(r"^(?P<tag>[a-zA-Z0-9]+)?(?:\.(?P<cls>[\w-]+)|\[(?P<attr>[\w-]+)[*^]?=['\"]?(?P<value>[^'\"\]]+)['\"]?\])?$")
+
+
+class StrainedSoupExtractor(SoupExtractor):
+    """
+    Keeps BeautifulSoup's API but parses with lxml and only builds the subtrees of tags that a
+    configured selector could match, skipping the rest of the page.
+    """
+    name = "strained-soup"
+    requires = ("bs4", "lxml")
+
+    def __init__(self, selectors: dict = None):
+        super().__init__(selectors)
+        from bs4 import SoupStrainer
+
+        hints = {}
+        for selectors_for_field in self.fields.values():
+            for selector in selectors_for_field:
+                match = _SIMPLE_SELECTOR.match(selector)
+                if match is None:
+                    raise ValueError(f"Selector too complex to strain on: {selector}")
+                hint = match['cls'] or match['value'] or ""
+                # Hashed class names end in a generated suffix; strain on the stable prefix.
+                hints.setdefault(match['tag'], set()).add(hint.split('-')[0])
+
+        def keep(name, attrs=None):
+            # bs4 < 4.13 passes (name, attrs); newer versions pass the bare name while parsing, so
+            # there the strainer can only prune by tag name.
+            if attrs is None:
+                return getattr(name, 'name', name) in hints
+            if name not in hints:
+                return False
+            values = " ".join(str(v) for v in attrs.values())
+            return any(hint in values for hint in hints[name])
+
+        self.strainer = SoupStrainer(keep)
+
+    def _parse(self, content):
+        from bs4 import BeautifulSoup
+        return BeautifulSoup(content, 'lxml', parse_only=self.strainer)
+
+
+class LxmlExtractor(_Extractor):
+    name = "lxml"
+    requires = ("lxml", "cssselect")
+
+    def __init__(self, selectors: dict = None):
+        super().__init__(selectors)
+        from cssselect import GenericTranslator
+        from lxml import etree
+
+        translator = GenericTranslator()
+        self.xpaths = {selector: etree.XPath(translator.css_to_xpath(selector))
+                       for selectors_for_field in self.fields.values() for selector in selectors_for_field}
+
+    def _parse(self, content):
+        import lxml.html
+        return lxml.html.fromstring(content)
+
+    def _first_text(self, root, selector):
+        nodes = self.xpaths[selector](root)
+        return nodes[0].text_content() if nodes else None
+
+
+class SelectolaxExtractor(_Extractor):
+    name = "selectolax"
+    requires = ("selectolax",)
+
+    def _parse(self, content):
+        from selectolax.lexbor import LexborHTMLParser
+        return LexborHTMLParser(content)
+
+    def _first_text(self, root, selector):
+        node = root.css_first(selector)
+        return node.text() if node is not None else None
+
+
+EXTRACTORS = {cls.name: cls for cls in (SelectolaxExtractor, LxmlExtractor, StrainedSoupExtractor, SoupExtractor)}
+
+
+def get_extractor(name: str = None, selectors: dict = None):
+    """
+    Build the named extractor, or with no name the fastest one whose parser is installed.
+    """
+    if name:
+        return EXTRACTORS[name](selectors)
+    for cls in EXTRACTORS.values():
+        try:
+            return cls(selectors)
+        except ImportError:
+            continue
+    raise ImportError("No HTML parser available; install beautifulsoup4")
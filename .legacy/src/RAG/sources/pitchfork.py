@@ -7,12 +7,21 @@ scraping the details of each review, and saving the review details to a JSON fil
 Functions:
     get_review_links: Get review links from the Pitchfork website.
     scrape_review_details: Scrape the details of a review from a review URL.
+    crawl_reviews: Concurrently and resumably crawl new reviews into a JSON Lines file.
 """
 
-import requests
 import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
+from urllib.parse import urljoin
 from bs4 import BeautifulSoup
 
+from utils.http_client import get_session
+from RAG.crawl import CrawlState, HostThrottle
+from RAG.sources.extractors import get_extractor, load_selectors
+
 #######################
 ## Pitchfork Scraper ##
 #######################
@@ -22,19 +31,9 @@ def get_review_links(base_url, start_page=1, end_page=50):
     
     for page_num in range(start_page, end_page + 1):
         url = f"{base_url}?page={page_num}"
-        response = requests.get(url)
+        response = get_session().get(url)
         if response.status_code == 200:
-            soup = BeautifulSoup(response.content, 'html.parser')
-            review_fragments = soup.find_all('div', class_='review-collection-fragment')
-            
-            for fragment in review_fragments:
-                reviews = fragment.find_all('div', class_='review')
-                for review in reviews:
-                    link_tag = review.find('a', class_='review__link')
-                    if link_tag and 'href' in link_tag.attrs:
-                        link = link_tag['href']
-                        full_link = f"https://pitchfork.com{link}"
-                        all_review_links.append(full_link)
+            all_review_links.extend(parse_review_links(response.content, url))
             print(f"Page {page_num}: Found {len(all_review_links)} links so far.")
         else:
             print(f"Failed to retrieve page {page_num}")
@@ -42,42 +41,119 @@ def get_review_links(base_url, start_page=1, end_page=50):
 
     return all_review_links
 
+def parse_review_links(content, page_url="https://pitchfork.com/"):
+    """Return the absolute review URLs on a listing page, resolving links against the page's URL."""
+    soup = BeautifulSoup(content, 'html.parser')
+    links = []
+    for fragment in soup.find_all('div', class_='review-collection-fragment'):
+        for review in fragment.find_all('div', class_='review'):
+            link_tag = review.find('a', class_='review__link')
+            if link_tag and 'href' in link_tag.attrs:
+                links.append(urljoin(page_url, link_tag['href']))
+    return links
+
 def scrape_review_details(review_url: str):
-    response = requests.get(review_url)
-    soup = BeautifulSoup(response.content, 'html.parser')
-    
-    rating = soup.find('p', class_='Rating-iATjmx').text
-    try:
-        title = soup.find('h1', {"data-testid": "ContentHeaderHed"}).text
-    except:
-        return None
-    artist = soup.find('div', class_='SplitScreenContentHeaderArtist-ftloCc').text
-    genre = soup.find('p', class_='InfoSliceValue-tfmqg').text
-    description = soup.find('div', class_='SplitScreenContentHeaderDekDown-csTFQR').text
-    
-    review_details = {
-        'URL': review_url,
-        'Rating': rating,
-        'Title': title,
-        'Artist': artist,
-        'Genre': genre,
-        'Description': description
-    }
-    
-    return review_details
+    response = get_session().get(review_url)
+    return parse_review_details(response.content, review_url)
+
+def parse_review_details(content, review_url: str):
+    """
+    Extract a review with the configured extractor (see RAG/sources/selectors/pitchfork_review.json).
+    Returns None for pages without a review title; other missing fields come back as None.
+    """
+    return _review_extractor().extract(content, review_url)
+
+@lru_cache(maxsize=None)
+def _review_extractor():
+    return get_extractor(os.getenv("PITCHFORK_EXTRACTOR"), load_selectors("pitchfork_review"))
 
 def save_to_json(links, filename="data/pitchfork.json"):
     with open(filename, 'w', encoding='utf-8') as file:
         json.dump(links, file, ensure_ascii=False, indent=4)
     print(f"Saved {len(links)} links to {filename}")
 
+############################
+## Incremental Crawl Mode ##
+############################
+
+def _fetch(url, state, throttle):
+    """
+    Conditionally GET a URL, politely. Returns the response, or None if the page is unchanged (304).
+    """
+    throttle.wait(url)
+    response = get_session().get(url, headers=state.conditional_headers(url))
+    if response.status_code == 304:
+        return None
+    response.raise_for_status()
+    return response
+
+def _listing_links(url, state, throttle):
+    response = _fetch(url, state, throttle)
+    if response is None:
+        return []
+    links = parse_review_links(response.content, url)
+    # Store the links before the listing's validators: once those are saved the listing may answer
+    # 304, and reviews that fail or are interrupted would otherwise never be fetched again.
+    state.add_pending(links)
+    state.record(url, 'listed', response)
+    return links
+
+def _review(url, state, throttle):
+    response = _fetch(url, state, throttle)
+    if response is None:
+        return None, None
+    return parse_review_details(response.content, url), response
+
+def crawl_reviews(base_url, start_page=1, end_page=50, output="data/pitchfork.jsonl",
+                  state_path="data/pitchfork_state.sqlite3", workers=8, per_host_interval=0.5):
+    """
+    Crawl listing pages and reviews on a bounded thread pool, appending each review to a JSON Lines
+    file as soon as it is scraped. Crawl state (discovered and finished URLs, ETag/Last-Modified
+    validators) is persisted, so an interrupted run resumes where it stopped, reviews that failed
+    are retried on the next run, and reruns otherwise only fetch new reviews.
+    Requests to the same host are spaced at least per_host_interval seconds apart.
+    """
+    state = CrawlState(state_path)
+    throttle = HostThrottle(per_host_interval)
+    start = time.perf_counter()
+    written = skipped = failed = 0
+
+    with ThreadPoolExecutor(max_workers=workers) as pool, open(output, 'a', encoding='utf-8') as file:
+        listings = [f"{base_url}?page={page_num}" for page_num in range(start_page, end_page + 1)]
+        # Reviews found by earlier runs but never finished; their listing pages may now answer 304.
+        reviews = {link: pool.submit(_review, link, state, throttle) for link in state.pending()}
+        for future in as_completed([pool.submit(_listing_links, url, state, throttle) for url in listings]):
+            try:
+                links = future.result()
+            except Exception as e:
+                print(f"Failed to retrieve listing page: {e}")
+                continue
+            for link in links:
+                if link in reviews or state.is_done(link):
+                    skipped += 1
+                    continue
+                reviews[link] = pool.submit(_review, link, state, throttle)
+
+        urls = {future: link for link, future in reviews.items()}
+        for future in as_completed(urls):
+            try:
+                details, response = future.result()
+            except Exception as e:
+                print(f"Failed to scrape review {urls[future]}: {e}")
+                failed += 1
+                continue
+            if details is not None:
+                file.write(json.dumps(details, ensure_ascii=False) + "\n")
+                file.flush()
+                written += 1
+            # Pages without a review layout are marked done too, so reruns don't refetch them.
+            if response is not None:
+                state.record(urls[future], 'done', response)
+
+    print(f"Wrote {written} new reviews to {output} in {time.perf_counter() - start:.2f}s "
+          f"({skipped} duplicate or already crawled, {failed} failed and left for the next run)")
+    return written
+
 if __name__ == "__main__":
     base_url = 'https://pitchfork.com/reviews/albums/'
-    review_links = get_review_links(base_url, 1, 25)
-    
-    all_review_details = []
-    for link in review_links:
-        details = scrape_review_details(link)
-        all_review_details.append(details)
-
-    save_to_json(all_review_details)
\ No newline at end of file
+    crawl_reviews(base_url, 1, 25)
\ No newline at end of file
@@ -4,13 +4,16 @@ A module for fetching and processing posts from Reddit.
 This module contains functions for fetching posts from Reddit using the PRAW library, processing the posts, and saving the processed data to a file.
 
 Functions:
-    setup_praw: Set up the PRAW Reddit instance.
+    setup_praw: Set up a PRAW Reddit instance.
+    iter_posts: Fetch posts from several subreddits concurrently, yielding each as it arrives.
     fetch_posts: Fetch posts from a list of subreddits.
-    process_and_save_posts: Process and save the fetched posts.
 """
 
 import praw
 import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 ######################
 ## Reddit Functions ##
@@ -21,18 +24,67 @@ def setup_praw():
                        client_secret=os.getenv('REDDIT_CLIENT_SECRET'),
                        user_agent='XAI-MRS')
 
-def fetch_posts(subreddit_names, reddit_instance, posts_per_sub = 50):
-    post_container = {}
-    for subreddit_name in subreddit_names:
-        subreddit = reddit_instance.subreddit(subreddit_name)
-        posts = []
-        for post in subreddit.hot(limit = posts_per_sub):
-            post_data = {
-                "title": post.title,
-                "url": post.url,
-                "subreddit": subreddit_name,
-                "selftext": post.selftext if post.selftext else "No content"
-            }
-            posts.append(post_data)
-        post_container[subreddit_name] = posts
-    return post_container
\ No newline at end of file
+def _post_data(post, subreddit_name):
+    return {
+        "title": post.title,
+        "url": post.url,
+        "subreddit": subreddit_name,
+        "selftext": post.selftext if post.selftext else "No content"
+    }
+
+def iter_posts(subreddit_names, reddit_factory = setup_praw, posts_per_sub = 50, workers = 4, buffer = 256):
+    """
+    Fetch each subreddit's hot posts on a thread pool and yield post dicts as they arrive,
+    interleaved across subreddits. At most `buffer` fetched posts wait to be consumed, so a slow
+    consumer holds back the fetchers instead of accumulating posts in memory.
+    A subreddit that fails to load is reported and skipped.
+
+    PRAW instances are not thread-safe, so each worker thread builds its own by calling
+    reddit_factory() (e.g. setup_praw) and uses it for every subreddit it fetches.
+    """
+    posts = queue.Queue(maxsize=buffer)
+    stopped = threading.Event()
+    done = object()
+    local = threading.local()
+
+    def put(item):
+        # Give up if the consumer has gone away, so closing the generator early can't deadlock.
+        while not stopped.is_set():
+            try:
+                posts.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def fetch(subreddit_name):
+        try:
+            if not hasattr(local, 'reddit'):
+                local.reddit = reddit_factory()
+            for post in local.reddit.subreddit(subreddit_name).hot(limit = posts_per_sub):
+                if not put(_post_data(post, subreddit_name)):
+                    return
+        except Exception as e:
+            print(f"Failed to fetch r/{subreddit_name}: {e}")
+        finally:
+            put(done)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for subreddit_name in subreddit_names:
+            pool.submit(fetch, subreddit_name)
+        try:
+            remaining = len(subreddit_names)
+            while remaining:
+                post = posts.get()
+                if post is done:
+                    remaining -= 1
+                else:
+                    yield post
+        finally:
+            stopped.set()
+
+def fetch_posts(subreddit_names, reddit_factory = setup_praw, posts_per_sub = 50):
+    post_container = {subreddit_name: [] for subreddit_name in subreddit_names}
+    for post in iter_posts(subreddit_names, reddit_factory, posts_per_sub):
+        post_container[post["subreddit"]].append(post)
+    return post_container
@@ -1,9 +1,14 @@
-from flask import Flask, render_template, session, redirect
+from flask import Flask, Response, jsonify, render_template, session, redirect, stream_with_context
+import json
 import os
 from dotenv import load_dotenv
 
 from spotify.auth import login, callback
-from recommendation_engine.recommender import get_recommendations
+from spotify.api import fetch_user_profile
+from recommendation_engine.recommender import get_recommendations, stream_recommendations
+from spotify.tokens import TOKENS, session_access_token
+from recommendation_engine.snapshots import SNAPSHOTS, SNAPSHOT_WORKERS, serve_snapshot, start_workers
+from utils.langchain_utils import warm_up
 
 ##################
 ## Flask Routes ##
@@ -15,6 +20,12 @@ app.secret_key = os.getenv("SECRET_KEY")
 if not app.secret_key:
     raise ValueError("No secret key set for Flask application")
 
+# Build the LLM wrappers once at startup instead of on the first /home hit.
+warm_up(ping=os.getenv("LLM_WARM_UP_PING") == "1")
+
+# Keep recently active users' Spotify tokens refreshed ahead of expiry.
+TOKENS.start_refresher()
+
 @app.route('/')
 def index():
     return render_template('index.html')
@@ -29,6 +40,9 @@ def callback_route():
 
 @app.route('/home')
 def home():
+    if SNAPSHOT_WORKERS:
+        return home_snapshot()
+
     recommendations = get_recommendations()
 
     print(recommendations)
@@ -37,5 +51,58 @@ def home():
 
     return render_template('profile.html', recommendations=recommendations, explanations="", error=None)
 
+def home_snapshot():
+    """
+    Serve the user's latest precomputed snapshot, queueing a refresh when it is missing or stale.
+    """
+    access_token = session_access_token(session)
+    if not access_token:
+        return render_template('profile.html', error="Access token is not available. Please log in.")
+
+    if not session.get('user_id'):
+        profile = fetch_user_profile(access_token)
+        if not profile:
+            return render_template('profile.html', error="Failed to fetch your Spotify profile.")
+        session['user_id'] = profile['id']
+
+    recommendations, refresh_error = serve_snapshot(session['user_id'], access_token, session.get('expires_at'))
+    if recommendations is None and refresh_error:
+        return render_template('profile.html',
+                               error=f"Preparing your recommendations failed: {refresh_error}. Reload to try again.")
+    if recommendations is None:
+        return render_template('profile.html', refresh=5,
+                               error="Your recommendations are being prepared. This page will refresh shortly.")
+
+    notice = f"Showing your previous recommendations; the latest refresh failed: {refresh_error}" if refresh_error else None
+    return render_template('profile.html', recommendations=recommendations, explanations="", error=None, notice=notice)
+
+@app.route('/snapshots/stats')
+def snapshot_stats():
+    """
+    Refresh queue depth and lag, and refresh durations, as JSON.
+    """
+    return jsonify(SNAPSHOTS.stats())
+
+@app.route('/home/live')
+def home_live():
+    return render_template('stream.html')
+
+@app.route('/home/stream')
+def home_stream():
+    """
+    Server-sent events: recommendation and explanation tokens as they are generated,
+    then a final result (or error) event.
+    """
+    def events():
+        for event, data in stream_recommendations():
+            yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+        yield "event: done\ndata: {}\n\n"
+
+    return Response(stream_with_context(events()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 if __name__ == "__main__":
+    # The debug reloader runs this block twice; only its child process serves requests.
+    if SNAPSHOT_WORKERS and os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        start_workers(SNAPSHOT_WORKERS)
     app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
@@ -0,0 +1,110 @@
+"""
+Async (ASGI) serving mode for the web app.
+
+The same pages as app.py, served by Quart (Flask's async counterpart) so views can await their
+outbound I/O: the token exchange, Spotify fetches and LLM calls suspend the request's coroutine
+instead of holding a worker thread, and one process can keep hundreds of slow requests in flight.
+Session cookies are signed the same way as Flask's, so both apps share logins and templates.
+Local blocking work (the SQLite token and snapshot stores) runs in threads via asyncio.to_thread.
+
+Run with the launcher:
+    python serve.py --workers 4 --port 8000
+"""
+
+from quart import Quart, jsonify, redirect, render_template, request, session
+import asyncio
+import os
+from dotenv import load_dotenv
+
+from spotify.auth import authorize_url, exchange_code_for_token_async
+from spotify.api import fetch_user_profile_async
+from spotify.tokens import TOKENS, session_access_token_async
+from recommendation_engine.recommender import recommend_async
+from recommendation_engine.snapshots import SNAPSHOTS, SNAPSHOT_WORKERS, request_refresh, serve_snapshot
+from utils.http_client import close_async_client
+from utils.langchain_utils import warm_up
+
+##################
+## Quart Routes ##
+##################
+
+load_dotenv()
+app = Quart(__name__)
+app.secret_key = os.getenv("SECRET_KEY")
+if not app.secret_key:
+    raise ValueError("No secret key set for Quart application")
+
+@app.before_serving
+async def startup():
+    warm_up(ping=os.getenv("LLM_WARM_UP_PING") == "1")
+    TOKENS.start_refresher()
+
+@app.after_serving
+async def shutdown():
+    await close_async_client()
+
+@app.route('/')
+async def index():
+    return await render_template('index.html')
+
+@app.route('/login')
+async def login_route():
+    return redirect(authorize_url())
+
+@app.route('/callback')
+async def callback_route():
+    error = request.args.get('error')
+    code = request.args.get('code')
+    if error:
+        return jsonify({'error': error})
+    if not code:
+        return jsonify({'error': 'No code provided'})
+
+    tokens, details = await exchange_code_for_token_async(code)
+    if tokens is None:
+        return jsonify({'error': 'Failed to retrieve tokens', 'details': details})
+    session.update(tokens)
+
+    profile = await fetch_user_profile_async(tokens['access_token'])
+    if profile:
+        session['user_id'] = profile['id']
+        await asyncio.to_thread(TOKENS.remember, profile['id'], tokens['access_token'], tokens['refresh_token'],
+                                tokens['expires_at'])
+        await asyncio.to_thread(request_refresh, profile['id'], tokens['access_token'], tokens['expires_at'])
+    return redirect('/home')
+
+@app.route('/home')
+async def home():
+    access_token = await session_access_token_async(session)
+    if not access_token:
+        return await render_template('profile.html', error="Access token is not available. Please log in.")
+
+    notice = None
+    if SNAPSHOT_WORKERS:
+        if not session.get('user_id'):
+            profile = await fetch_user_profile_async(access_token)
+            if not profile:
+                return await render_template('profile.html', error="Failed to fetch your Spotify profile.")
+            session['user_id'] = profile['id']
+
+        recommendations, refresh_error = await asyncio.to_thread(serve_snapshot, session['user_id'], access_token,
+                                                                 session.get('expires_at'))
+        if recommendations is None and refresh_error:
+            return await render_template('profile.html',
+                                         error=f"Preparing your recommendations failed: {refresh_error}. Reload to try again.")
+        if recommendations is None:
+            return await render_template('profile.html', refresh=5,
+                                         error="Your recommendations are being prepared. This page will refresh shortly.")
+        if refresh_error:
+            notice = f"Showing your previous recommendations; the latest refresh failed: {refresh_error}"
+    else:
+        recommendations, error = await recommend_async(access_token)
+        if error:
+            return await render_template('profile.html', error=error)
+
+    return await render_template('profile.html', recommendations=recommendations, explanations="", error=None,
+                                 notice=notice)
+
+@app.route('/snapshots/stats')
+async def snapshot_stats():
+    return jsonify(await asyncio.to_thread(SNAPSHOTS.stats))
@@ -1,42 +1,148 @@
-from utils.openai_utils import convert_data_to_knowledge
-from RAG.sources.reddit import setup_praw, fetch_posts
-from openai import OpenAI
+"""
+Converts scraped Reddit posts into knowledge notes for the RAG index.
+
+Posts stream in from concurrent subreddit fetches and are grouped into per-subreddit chunks of
+bounded size. Each chunk is one LLM conversion call on a worker pool, and its notes are appended
+to data/REDDIT-<subreddit>.txt as soon as the call finishes. A content hash of every converted
+post is recorded, so reruns only convert new or edited posts.
+
+Functions:
+    post_digest: Content hash of a post
+    chunk_posts: Group a stream of posts into per-subreddit chunks of bounded size
+    convert_data_to_knowledge: Convert one chunk of post text with the knowledge LLM
+    save_reddit_posts: Run the conversion pipeline over a stream of posts
+"""
+
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import hashlib
+import os
+import time
+
+from RAG.crawl import CrawlState
+from RAG.sources.reddit import setup_praw, iter_posts
+from utils.langchain_utils import KnowledgeLLM, get_llm
+
+
+##############
+## Chunking ##
+##############
+
+def post_digest(post: dict) -> str:
+    """Hash the fields that go into the prompt, so an edited post is converted again."""
+    content = "\0".join(str(post.get(field, "")) for field in ("subreddit", "title", "url", "selftext"))
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+def _format_post(post: dict, max_chars: int) -> str:
+    text = f"Title: {post['title']}\nURL: {post['url']}\nContent: {post['selftext']}"
+    return text[:max_chars]
+
+def chunk_posts(posts, max_chars: int = 8000):
+    """
+    Group posts by subreddit into chunks of at most max_chars of prompt text, yielding
+    (subreddit, posts, text) as each chunk fills. Only one partial chunk per subreddit is held
+    in memory; the remainders are yielded when the stream ends. Oversized posts are truncated.
+    """
+    buffers = {}
+    for post in posts:
+        subreddit = post['subreddit']
+        text = _format_post(post, max_chars)
+        chunk, size = buffers.get(subreddit, ([], 0))
+        if chunk and size + len(text) + 2 > max_chars:
+            yield subreddit, [p for p, _ in chunk], "\n\n".join(t for _, t in chunk)
+            chunk, size = [], 0
+        chunk.append((post, text))
+        buffers[subreddit] = (chunk, size + len(text) + 2)
+
+    for subreddit, (chunk, _) in buffers.items():
+        if chunk:
+            yield subreddit, [p for p, _ in chunk], "\n\n".join(t for _, t in chunk)
 
 
 ################
 ## RAG Script ##
 ################
 
-client = OpenAI()
+def convert_data_to_knowledge(data_string: str) -> str:
+    return get_llm(KnowledgeLLM, debug=False)(data_string)
+
+def save_reddit_posts(posts, output_dir: str = "data", state_path: str = "data/reddit_state.sqlite3",
+                      workers: int = 4, max_chars: int = 8000, convert = convert_data_to_knowledge):
+    """
+    Convert posts to knowledge notes and append them to output_dir/REDDIT-<subreddit>.txt.
+
+    Args:
+        posts: Iterable of post dicts (as from iter_posts), or a {subreddit: [posts]} mapping
+        workers: Concurrent conversion calls; at most 2 * workers chunks are in flight
+        max_chars: Upper bound on the post text sent in one conversion call
+        convert: Function turning a chunk's text into notes (swap in a stub to run offline)
+
+    Returns:
+        int: Number of chunks converted and written.
+    """
+    if isinstance(posts, dict):
+        posts = (post for subreddit_posts in posts.values() for post in subreddit_posts)
+
+    os.makedirs(output_dir, exist_ok=True)
+    state = CrawlState(state_path)
+    start = time.perf_counter()
+    seen = skipped = written = failed = 0
+    digests = set()
 
-def save_reddit_posts(posts):
-    for subreddit, posts in posts.items():
-        data_string = "\n\n".join([f"Title: {post['title']}\nURL: {post['url']}\nContent: {post['selftext']}" for post in posts])
-        
-        processed_data = convert_data_to_knowledge(data_string)
-        
-        file_name = f"data/REDDIT-{subreddit}.txt"
-        
+    def fresh():
+        nonlocal seen, skipped
+        for post in posts:
+            seen += 1
+            digest = post_digest(post)
+            if digest in digests or state.is_done(f"reddit:{digest}"):
+                skipped += 1
+                continue
+            digests.add(digest)
+            yield post
+
+    def finish(future):
+        nonlocal written, failed
+        subreddit, chunk = pending.pop(future)
         try:
-            with open(file_name, 'w', encoding='utf-8') as f:
-                f.write(processed_data)
+            processed_data = future.result()
+            if processed_data.startswith("Error:"):
+                raise RuntimeError(processed_data)
+            with open(os.path.join(output_dir, f"REDDIT-{subreddit}.txt"), 'a', encoding='utf-8') as f:
+                f.write(processed_data.strip() + "\n\n")
         except Exception as e:
-            print(f"An error occurred while saving processed posts for {subreddit}: {e}")
+            print(f"An error occurred while converting {len(chunk)} posts from r/{subreddit}: {e}")
+            failed += 1
+            return
+        # Posts are only marked once their notes are on disk, so a crash converts them again.
+        for post in chunk:
+            state.record(f"reddit:{post_digest(post)}", 'done')
+        written += 1
+
+    pending = {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for subreddit, chunk, text in chunk_posts(fresh(), max_chars):
+            pending[pool.submit(convert, text)] = (subreddit, chunk)
+            if len(pending) >= 2 * workers:
+                for future in wait(pending, return_when=FIRST_COMPLETED).done:
+                    finish(future)
+        while pending:
+            for future in wait(pending, return_when=FIRST_COMPLETED).done:
+                finish(future)
+
+    print(f"Converted {written} chunks from {seen} posts in {time.perf_counter() - start:.2f}s "
+          f"({skipped} already processed, {failed} chunks failed)")
+    return written
 
 if __name__ == "__main__":
-    reddit = setup_praw()
     subreddits = [
-        'jazz', 
-        'hiphopheads', 
-        'listentothis', 
-        'indieheads', 
-        'letstalkmusic', 
-        'popheads', 
-        'rnb', 
-        'postrock', 
+        'jazz',
+        'hiphopheads',
+        'listentothis',
+        'indieheads',
+        'letstalkmusic',
+        'popheads',
+        'rnb',
+        'postrock',
         'electronicmusic'
     ]
 
-    posts = fetch_posts(subreddits, reddit)
-
-    save_reddit_posts(posts)
\ No newline at end of file
+    save_reddit_posts(iter_posts(subreddits, setup_praw))
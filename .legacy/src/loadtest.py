@@ -0,0 +1,241 @@
+"""
+Load test for the web app against local stubs of Spotify and the LLM server.
+
+Starts a stub server that answers the Spotify endpoints and Ollama's /api/generate after a
+configurable delay, launches the app (the ASGI app via serve.py by default) pointed at it, then
+fires concurrent /home requests, each as a different logged-in user, and reports latency
+percentiles and throughput.
+
+Usage:
+    python loadtest.py --concurrency 300 --requests 600 [--workers 1] [--llm-latency 2] [--spotify-latency 0.2]
+    python loadtest.py --target http://localhost:5000 ...   # an app you started yourself against the stubs
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+
+SECRET_KEY = "loadtest"
+
+
+##################
+## Stub Backend ##
+##################
+
+
+def _llm_response() -> str:
+    recommendations = [{"song": f"Song {i}", "artist": f"Artist {i}", "explanation": "Shares the user's taste."}
+                       for i in range(7)]
+    return json.dumps({"recommendations": recommendations})
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Answers the Spotify Web API calls the app makes, the token endpoint and Ollama's /api/generate."""
+    protocol_version = "HTTP/1.1"
+    spotify_latency = 0.2
+    llm_latency = 2.0
+
+    def log_message(self, *args):
+        pass
+
+    def _json(self, body, status=200, content_type="application/json"):
+        data = body if isinstance(body, bytes) else json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        time.sleep(self.spotify_latency)
+        path = urlsplit(self.path).path
+        # Vary names by user so every virtual user gets its own prompts and cache entries.
+        user = self.headers.get("Authorization", "").rsplit("-", 1)[-1]
+        if path.endswith("/me/top/tracks"):
+            items = [{"name": f"Track {i} ({user})", "uri": f"spotify:track:t{i}", "artists": [{"name": f"Artist {i}"}]}
+                     for i in range(20)]
+            self._json({"items": items})
+        elif path.endswith("/me/top/artists"):
+            items = [{"name": f"Artist {i}", "uri": f"spotify:artist:a{i}", "genres": ["indie"]} for i in range(20)]
+            self._json({"items": items})
+        elif path.endswith("/recommendations"):
+            limit = int(parse_qs(urlsplit(self.path).query).get("limit", ["20"])[0])
+            tracks = [{"name": f"Candidate {i} ({user})", "uri": f"spotify:track:c{i}", "artists": [{"name": f"Artist {i % 40}"}]}
+                      for i in range(limit)]
+            self._json({"tracks": tracks})
+        elif path.endswith("/me"):
+            self._json({"id": f"user-{user}", "display_name": user})
+        else:
+            self._json({"error": "not found"}, 404)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        path = urlsplit(self.path).path
+        if path.endswith("/api/token"):
+            time.sleep(self.spotify_latency)
+            self._json({"access_token": "token-0", "refresh_token": "refresh", "expires_in": 3600})
+        elif path.endswith("/api/generate"):
+            time.sleep(self.llm_latency)
+            lines = [{"model": "llama3", "response": _llm_response(), "done": False},
+                     {"model": "llama3", "response": "", "done": True}]
+            self._json("".join(json.dumps(line) + "\n" for line in lines).encode(), content_type="application/x-ndjson")
+        else:
+            self._json({"error": "not found"}, 404)
+
+
+def start_stub(port: int, spotify_latency: float, llm_latency: float) -> ThreadingHTTPServer:
+    StubHandler.spotify_latency = spotify_latency
+    StubHandler.llm_latency = llm_latency
+    server = ThreadingHTTPServer(("127.0.0.1", port), StubHandler)
+    server.daemon_threads = True
+    server.request_queue_size = 1024
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+############
+## Client ##
+############
+
+
+def session_cookie(user: int) -> str:
+    """A session cookie for a logged-in virtual user, signed the way Flask and Quart sign theirs."""
+    from flask import Flask
+    from flask.sessions import SecureCookieSessionInterface
+
+    app = Flask(__name__)
+    app.secret_key = SECRET_KEY
+    serializer = SecureCookieSessionInterface().get_signing_serializer(app)
+    return serializer.dumps({"access_token": f"token-{user}", "refresh_token": "refresh",
+                             "expires_at": time.time() + 3600, "user_id": f"user-{user}"})
+
+
+async def run_load(target: str, total: int, concurrency: int, timeout: float) -> dict:
+    import httpx
+
+    cookies = [session_cookie(user) for user in range(total)]
+    latencies, failures = [], {}
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=target, timeout=timeout, limits=limits) as client:
+        async def one(user):
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    response = await client.get("/home", headers={"Cookie": f"session={cookies[user]}"})
+                    ok = response.status_code == 200 and "Error" not in response.text
+                    reason = f"HTTP {response.status_code}" if response.status_code != 200 else "error page"
+                except httpx.HTTPError as e:
+                    ok, reason = False, type(e).__name__
+                if ok:
+                    latencies.append(time.perf_counter() - start)
+                else:
+                    failures[reason] = failures.get(reason, 0) + 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(user) for user in range(total)))
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    percentile = lambda p: latencies[min(len(latencies) - 1, int(p * len(latencies)))] if latencies else 0.0
+    return {
+        'requests': total,
+        'concurrency': concurrency,
+        'ok': len(latencies),
+        'failed': failures,
+        'elapsed': elapsed,
+        'throughput': len(latencies) / elapsed if elapsed else 0.0,
+        'p50': percentile(0.50),
+        'p95': percentile(0.95),
+        'p99': percentile(0.99),
+        'max': latencies[-1] if latencies else 0.0,
+        'mean': statistics.mean(latencies) if latencies else 0.0,
+    }
+
+
+async def wait_until_up(target: str, deadline: float):
+    import httpx
+
+    async with httpx.AsyncClient(base_url=target, timeout=1.0) as client:
+        while time.monotonic() < deadline:
+            try:
+                await client.get("/")
+                return
+            except httpx.HTTPError:
+                await asyncio.sleep(0.25)
+    raise RuntimeError(f"App at {target} did not start")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=600)
+    parser.add_argument("--concurrency", type=int, default=300)
+    parser.add_argument("--workers", type=int, default=1, help="Web worker processes for the launched app")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--stub-port", type=int, default=8766)
+    parser.add_argument("--spotify-latency", type=float, default=0.2)
+    parser.add_argument("--llm-latency", type=float, default=2.0)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--target", help="Load an already running app instead of launching serve.py")
+    args = parser.parse_args()
+
+    stub = start_stub(args.stub_port, args.spotify_latency, args.llm_latency)
+    stub_url = f"http://127.0.0.1:{args.stub_port}"
+    print(f"Stub backend on {stub_url} (Spotify {args.spotify_latency}s, LLM {args.llm_latency}s)")
+
+    app = None
+    target = args.target
+    if target is None:
+        scratch = tempfile.mkdtemp(prefix="loadtest-")
+        env = {
+            **os.environ,
+            "SECRET_KEY": SECRET_KEY,
+            "SPOTIFY_API_URL": f"{stub_url}/v1",
+            "SPOTIFY_TOKEN_URL": f"{stub_url}/api/token",
+            "OLLAMA_BASE_URL": stub_url,
+            "SNAPSHOT_WORKERS": "0",
+            "SPOTIFY_RATE_LIMIT": "100000",
+            "SPOTIFY_RATE_BURST": "100000",
+            "SPOTIFY_CACHE_PATH": os.path.join(scratch, "spotify_cache.sqlite3"),
+            "LLM_CACHE_PATH": os.path.join(scratch, "llm_cache.sqlite3"),
+            # The stub has no generation limit, so let every request's LLM call be in flight at once.
+            "LLM_MAX_IN_FLIGHT": str(args.concurrency),
+            "LLM_MAX_QUEUE": str(args.requests),
+            "LLM_MAX_BATCH": "1",
+            "HTTP_POOL_MAXSIZE": str(args.concurrency),
+        }
+        app = subprocess.Popen([sys.executable, "serve.py", "--port", str(args.port), "--workers", str(args.workers)],
+                               cwd=os.path.dirname(os.path.abspath(__file__)), env=env,
+                               stdout=subprocess.DEVNULL)
+        target = f"http://127.0.0.1:{args.port}"
+
+    try:
+        asyncio.run(wait_until_up(target, time.monotonic() + 60))
+        report = asyncio.run(run_load(target, args.requests, args.concurrency, args.timeout))
+    finally:
+        if app is not None:
+            app.terminate()
+            app.wait()
+        stub.shutdown()
+
+    print(f"{report['ok']}/{report['requests']} ok at concurrency {report['concurrency']} "
+          f"in {report['elapsed']:.1f}s ({report['throughput']:.1f} req/s)")
+    print(f"latency p50 {report['p50']:.2f}s  p95 {report['p95']:.2f}s  p99 {report['p99']:.2f}s  "
+          f"max {report['max']:.2f}s  mean {report['mean']:.2f}s")
+    if report['failed']:
+        print(f"failures: {report['failed']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,387 @@
+"""
+A columnar store of track and artist features.
+
+Track and artist metadata, genres and audio features are written once as typed NumPy arrays
+and memory-mapped at load time. Services start without parsing anything, and the pages are
+shared between processes through the OS page cache. Strings (IDs, names, genres) are interned
+into one UTF-8 blob, so each distinct string is stored once and columns hold int32 string IDs.
+Multi-valued columns (a track's artists, an artist's genres) are stored as CSR pairs: a pointer
+array and a flat value array. Sorted 64-bit hashes of the Spotify IDs and lowercase artist
+names map keys to rows with a binary search.
+
+Layout of a store directory:
+    meta.json               row counts, audio feature names and their min/max
+    strings.bin             interned strings, UTF-8, concatenated
+    string_offsets.npy      int64 start of each string in strings.bin (count + 1)
+    track_id.npy            int32 string ID of each track's Spotify ID
+    track_name.npy          int32 string ID of each track's name
+    track_artist_ptr.npy    int64 CSR pointers into track_artists.npy (tracks + 1)
+    track_artists.npy       int32 artist rows
+    track_audio.npy         (tracks, features) float32 audio features, NaN when unknown
+    artist_id.npy           int32 string ID of each artist's Spotify ID
+    artist_name.npy         int32 string ID of each artist's name
+    artist_genre_ptr.npy    int64 CSR pointers into artist_genres.npy (artists + 1)
+    artist_genres.npy       int32 string IDs of genres
+    *_keys.npy, *_rows.npy  sorted key hashes and their rows (track_id, artist_id, artist_name)
+
+Functions:
+    build_feature_store: Write a store directory from Spotify track, artist and audio-feature objects
+    iter_cached_responses: Yield cached Spotify objects from a response cache database
+    build_from_cache: Write a store directory from the graph crawler's response cache
+    get_feature_store: Return the process-wide store, or None if none has been built
+
+Classes:
+    FeatureStore: A memory-mapped store answering row lookups and feature gathers
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+
+FEATURE_STORE_DIR = os.getenv("FEATURE_STORE_DIR", "data/features")
+
+AUDIO_FEATURES = ['danceability', 'energy', 'valence', 'acousticness', 'instrumentalness',
+                  'speechiness', 'liveness', 'loudness', 'tempo']
+
+INDEXES = ('track_id', 'artist_id', 'artist_name')
+
+
+def _spotify_id(value) -> str:
+    """Accept a bare Spotify ID or a spotify:track:... URI."""
+    return str(value).rsplit(':', 1)[-1]
+
+
+def _key_hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+def _hashes(keys) -> np.ndarray:
+    return np.fromiter((_key_hash(key) for key in keys), dtype=np.uint64)
+
+
+##############
+## Building ##
+##############
+
+
+class _Strings:
+    """Interns strings to dense int32 IDs while the store is built."""
+
+    def __init__(self):
+        self.ids = {}
+
+    def __call__(self, value: str) -> int:
+        value = value or ""
+        string_id = self.ids.get(value)
+        if string_id is None:
+            string_id = self.ids[value] = len(self.ids)
+        return string_id
+
+    def save(self, store_dir: str):
+        encoded = [value.encode('utf-8') for value in self.ids]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(value) for value in encoded], out=offsets[1:])
+        with open(os.path.join(store_dir, "strings.bin"), 'wb') as file:
+            file.write(b"".join(encoded))
+        np.save(os.path.join(store_dir, "string_offsets.npy"), offsets)
+
+
+def _save_index(store_dir: str, name: str, keys: list):
+    hashes = _hashes(keys)
+    order = np.argsort(hashes, kind='stable')
+    np.save(os.path.join(store_dir, f"{name}_keys.npy"), hashes[order])
+    np.save(os.path.join(store_dir, f"{name}_rows.npy"), order.astype(np.int32))
+
+
+def build_feature_store(tracks=(), artists=(), audio_features=(), store_dir: str = FEATURE_STORE_DIR) -> dict:
+    """
+    Write a store directory from Spotify Web API objects. Repeated IDs keep their last object.
+
+    Args:
+        tracks: Iterable of track objects ({'id', 'name', 'artists': [{'id', 'name'}]}, full or simplified)
+        artists: Iterable of artist objects ({'id', 'name', 'genres'})
+        audio_features: Iterable of audio-feature objects ({'id', 'danceability', ...})
+
+    Returns:
+        dict: The store's meta.json contents.
+    """
+    start = time.perf_counter()
+    os.makedirs(store_dir, exist_ok=True)
+    strings = _Strings()
+
+    artist_rows, artist_names, artist_genres = {}, [], []
+    for artist in artists:
+        if not artist or not artist.get('id'):
+            continue
+        row = artist_rows.setdefault(artist['id'], len(artist_rows))
+        entry = (strings(artist.get('name')), [strings(genre) for genre in artist.get('genres') or []])
+        if row == len(artist_names):
+            artist_names.append(entry[0])
+            artist_genres.append(entry[1])
+        else:
+            artist_names[row], artist_genres[row] = entry
+
+    track_rows, track_names, track_artists = {}, [], []
+    for track in tracks:
+        if not track or not track.get('id'):
+            continue
+        credited = []
+        for artist in track.get('artists') or []:
+            if not artist.get('id'):
+                continue
+            # Artists only seen on tracks get a row without genres.
+            if artist['id'] not in artist_rows:
+                artist_rows[artist['id']] = len(artist_rows)
+                artist_names.append(strings(artist.get('name')))
+                artist_genres.append([])
+            credited.append(artist_rows[artist['id']])
+        row = track_rows.setdefault(track['id'], len(track_rows))
+        if row == len(track_names):
+            track_names.append(strings(track.get('name')))
+            track_artists.append(credited)
+        else:
+            track_names[row], track_artists[row] = strings(track.get('name')), credited
+
+    audio = np.full((len(track_rows), len(AUDIO_FEATURES)), np.nan, dtype=np.float32)
+    for features in audio_features:
+        row = track_rows.get((features or {}).get('id'))
+        if row is not None:
+            audio[row] = [features.get(name, np.nan) for name in AUDIO_FEATURES]
+
+    def save(name, values, dtype):
+        np.save(os.path.join(store_dir, f"{name}.npy"), np.asarray(values, dtype=dtype))
+
+    def save_csr(pointer_name, values_name, lists):
+        pointers = np.zeros(len(lists) + 1, dtype=np.int64)
+        np.cumsum([len(values) for values in lists], out=pointers[1:])
+        save(pointer_name, pointers, np.int64)
+        save(values_name, [value for values in lists for value in values], np.int32)
+
+    save("track_id", [strings(track_id) for track_id in track_rows], np.int32)
+    save("track_name", track_names, np.int32)
+    save_csr("track_artist_ptr", "track_artists", track_artists)
+    np.save(os.path.join(store_dir, "track_audio.npy"), audio)
+    save("artist_id", [strings(artist_id) for artist_id in artist_rows], np.int32)
+    save("artist_name", artist_names, np.int32)
+    save_csr("artist_genre_ptr", "artist_genres", artist_genres)
+
+    names = {string_id: value for value, string_id in strings.ids.items()}
+    _save_index(store_dir, "track_id", list(track_rows))
+    _save_index(store_dir, "artist_id", list(artist_rows))
+    _save_index(store_dir, "artist_name", [names[name].lower() for name in artist_names])
+    strings.save(store_dir)
+
+    known = ~np.isnan(audio).any(axis=1)
+    meta = {
+        'tracks': len(track_rows),
+        'artists': len(artist_rows),
+        'strings': len(strings.ids),
+        'audio_features': AUDIO_FEATURES,
+        'tracks_with_audio': int(known.sum()),
+        'audio_min': np.nanmin(audio, axis=0).tolist() if known.any() else None,
+        'audio_max': np.nanmax(audio, axis=0).tolist() if known.any() else None,
+    }
+    with open(os.path.join(store_dir, "meta.json"), 'w') as file:
+        json.dump(meta, file)
+    print(f"Stored {meta['tracks']} tracks and {meta['artists']} artists ({meta['strings']} strings) "
+          f"in {time.perf_counter() - start:.2f}s to {store_dir}")
+    return meta
+
+
+def iter_cached_responses(cache_path: str, endpoint: str):
+    """
+    Yield the Spotify objects cached under an endpoint ('artist', 'track', 'album_tracks', ...)
+    in a response cache database (spotify.cache.ResponseCache). Lists are flattened.
+    """
+    db = sqlite3.connect(f"file:{cache_path}?mode=ro", uri=True)
+    try:
+        for (value,) in db.execute("SELECT value FROM responses WHERE endpoint = ?", (endpoint,)):
+            value = json.loads(value)
+            yield from value if isinstance(value, list) else [value]
+    finally:
+        db.close()
+
+
+def build_from_cache(cache_path: str, audio_path: str = None, store_dir: str = FEATURE_STORE_DIR) -> dict:
+    """
+    Write a store directory from a response cache filled by the graph crawler, which caches every
+    artist and track it fetches under the 'artist' and 'track' endpoints, one entry per ID.
+
+    Args:
+        cache_path: The crawler's SPOTIFY_CACHE_PATH, data/spotify_cache.sqlite3 by default
+        audio_path: Optional JSON Lines file of Spotify audio-feature objects
+
+    Returns:
+        dict: The store's meta.json contents.
+    """
+    def iter_tracks():
+        yield from iter_cached_responses(cache_path, 'album_tracks')
+        # Full track objects last, so they win over the simplified ones listed under an album.
+        yield from iter_cached_responses(cache_path, 'track')
+
+    def iter_audio():
+        if audio_path:
+            with open(audio_path, encoding='utf-8') as file:
+                for line in file:
+                    if line.strip():
+                        yield json.loads(line)
+
+    return build_feature_store(iter_tracks(), iter_cached_responses(cache_path, 'artist'), iter_audio(), store_dir)
+
+
+#############
+## Loading ##
+#############
+
+
+class FeatureStore:
+    def __init__(self, store_dir: str = FEATURE_STORE_DIR):
+        """
+        Memory-map a store directory written by build_feature_store. Loading is instant; pages
+        are read (and shared between processes) only as columns are touched.
+        """
+        with open(os.path.join(store_dir, "meta.json")) as file:
+            self.meta = json.load(file)
+        load = lambda name: np.load(os.path.join(store_dir, f"{name}.npy"), mmap_mode='r')
+
+        self._strings = np.memmap(os.path.join(store_dir, "strings.bin"), dtype=np.uint8, mode='r') \
+            if os.path.getsize(os.path.join(store_dir, "strings.bin")) else np.zeros(0, dtype=np.uint8)
+        self._string_offsets = load("string_offsets")
+
+        self.track_id = load("track_id")
+        self.track_name = load("track_name")
+        self.track_artist_ptr = load("track_artist_ptr")
+        self.track_artists = load("track_artists")
+        self.track_audio = load("track_audio")
+        self.artist_id = load("artist_id")
+        self.artist_name = load("artist_name")
+        self.artist_genre_ptr = load("artist_genre_ptr")
+        self.artist_genres = load("artist_genres")
+        self._indexes = {name: (load(f"{name}_keys"), load(f"{name}_rows")) for name in INDEXES}
+
+        self.audio_names = self.meta['audio_features'] if self.meta.get('tracks_with_audio') else []
+        if self.audio_names:
+            low = np.asarray(self.meta['audio_min'], dtype=np.float32)
+            self._audio_low = low
+            self._audio_range = np.maximum(np.asarray(self.meta['audio_max'], dtype=np.float32) - low, 1e-6)
+
+    def __repr__(self) -> str:
+        return (f"FeatureStore(tracks={self.meta['tracks']}, artists={self.meta['artists']}, "
+                f"strings={self.meta['strings']}, audio={len(self.audio_names)})")
+
+    # Strings
+
+    def string(self, string_id: int) -> str:
+        start, end = self._string_offsets[string_id], self._string_offsets[string_id + 1]
+        return bytes(self._strings[start:end]).decode('utf-8')
+
+    # Row lookups
+
+    def _lookup(self, index: str, keys: list, column: np.ndarray, fold=None) -> np.ndarray:
+        """Rows for keys through a hash index, verified against the stored strings; -1 when absent."""
+        hashes, rows = self._indexes[index]
+        result = np.full(len(keys), -1, dtype=np.int64)
+        if not len(keys) or not len(hashes):
+            return result
+        wanted = _hashes(keys)
+        positions = np.minimum(np.searchsorted(hashes, wanted), len(hashes) - 1)
+        for i in np.flatnonzero(hashes[positions] == wanted):
+            # Walk equal hashes (collisions and duplicate names) until the string matches.
+            position = positions[i]
+            while position < len(hashes) and hashes[position] == wanted[i]:
+                value = self.string(column[rows[position]])
+                if (fold(value) if fold else value) == keys[i]:
+                    result[i] = rows[position]
+                    break
+                position += 1
+        return result
+
+    def track_rows(self, ids) -> np.ndarray:
+        """Rows of tracks given as Spotify IDs or URIs; -1 for unknown tracks."""
+        return self._lookup('track_id', [_spotify_id(value) for value in ids], self.track_id)
+
+    def artist_rows(self, ids) -> np.ndarray:
+        """Rows of artists given as Spotify IDs or URIs; -1 for unknown artists."""
+        return self._lookup('artist_id', [_spotify_id(value) for value in ids], self.artist_id)
+
+    def artist_rows_by_name(self, names) -> np.ndarray:
+        """Rows of artists by case-insensitive name (the first match for shared names); -1 when unknown."""
+        return self._lookup('artist_name', [name.lower() for name in names], self.artist_name, fold=str.lower)
+
+    # Gathers
+
+    def audio(self, rows: np.ndarray, scaled: bool = True) -> np.ndarray:
+        """
+        Audio features for track rows as a (len(rows), features) float32 matrix, NaN for rows that
+        are -1 or have no features. With scaled=True each feature is min-max scaled to [0, 1].
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        features = np.full((len(rows), len(AUDIO_FEATURES)), np.nan, dtype=np.float32)
+        known = rows >= 0
+        features[known] = self.track_audio[rows[known]]
+        if scaled and self.audio_names:
+            features = (features - self._audio_low) / self._audio_range
+        return features
+
+    def genre_ids(self, artist_row: int) -> np.ndarray:
+        return self.artist_genres[self.artist_genre_ptr[artist_row]:self.artist_genre_ptr[artist_row + 1]]
+
+    def artist_genres_by_name(self, names) -> dict:
+        """Map each known lowercase artist name to its genre list, for prerank's artist_genres."""
+        names = list(names)
+        genres = {}
+        for name, row in zip(names, self.artist_rows_by_name(names)):
+            if row >= 0:
+                genres[name.lower()] = [self.string(genre) for genre in self.genre_ids(row)]
+        return genres
+
+    def track(self, row: int) -> dict:
+        """One track as {'id', 'name', 'artists', 'audio'}, for debugging and compatibility."""
+        artist_rows = self.track_artists[self.track_artist_ptr[row]:self.track_artist_ptr[row + 1]]
+        audio = self.track_audio[row]
+        return {
+            'id': self.string(self.track_id[row]),
+            'name': self.string(self.track_name[row]),
+            'artists': [self.string(self.artist_name[artist]) for artist in artist_rows],
+            'audio': None if np.isnan(audio).any() else dict(zip(AUDIO_FEATURES, audio.tolist())),
+        }
+
+    def artist(self, row: int) -> dict:
+        """One artist as {'id', 'name', 'genres'}."""
+        return {
+            'id': self.string(self.artist_id[row]),
+            'name': self.string(self.artist_name[row]),
+            'genres': [self.string(genre) for genre in self.genre_ids(row)],
+        }
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_feature_store(store_dir: str = FEATURE_STORE_DIR):
+    """Return the process-wide FeatureStore, loading it on first use; None if no store is built."""
+    global _store
+    if _store is None and os.path.exists(os.path.join(store_dir, "meta.json")):
+        with _store_lock:
+            if _store is None:
+                _store = FeatureStore(store_dir)
+    return _store
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build the feature store from a Spotify response cache")
+    parser.add_argument("cache", help="Response cache database, e.g. the graph crawler's data/spotify_cache.sqlite3")
+    parser.add_argument("--audio", help="JSON Lines file of Spotify audio-feature objects")
+    parser.add_argument("--out", default=FEATURE_STORE_DIR)
+    args = parser.parse_args()
+
+    build_from_cache(args.cache, args.audio, args.out)
@@ -0,0 +1,160 @@
+"""
+A module for pre-ranking recommendation candidates before they reach the LLM.
+
+Candidates are scored against the user's profile with vectorized NumPy operations, and only
+the top-K are passed on, so the prompt stays the same size however large the candidate pool is.
+
+Signals (each is optional and contributes nothing when its data is missing):
+    artist: Overlap between the candidate's artists and the user's top artists, weighted by rank
+    genre: Cosine similarity between the candidate's genre vector and the user's
+    audio: Cosine similarity between the candidate's audio features and the user's mean features
+
+Spotify's candidate tracks carry neither genres nor audio features, so the genre and audio
+signals only have candidate data when it is supplied: through artist_genres/audio_features, or
+through a FeatureStore's memory-mapped columns (see recommendation_engine/feature_store.py).
+The recommender passes the store when one has been built; without it, candidates are ranked
+by artist overlap alone, except that candidates by the user's own top artists also get those
+artists' genres.
+
+Functions:
+    prerank: Return the top-K candidates for a user profile.
+    score_candidates: Score every candidate against a user profile.
+"""
+
+import numpy as np
+
+
+DEFAULT_WEIGHTS = {'artist': 1.0, 'genre': 0.5, 'audio': 0.5}
+
+
+#######################
+## Candidate Scoring ##
+#######################
+
+
+def _split_artists(artist_field) -> list:
+    """Candidate dicts carry artists as one comma-joined string."""
+    return [name.strip().lower() for name in str(artist_field).split(',') if name.strip()]
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms > 0)
+
+
+def _user_artist_weights(top_tracks, top_artists) -> dict:
+    """Weight the user's artists by rank: earlier entries count more."""
+    weights = {}
+    for rank, artist in enumerate(top_artists):
+        name = artist['name'].lower()
+        weights[name] = max(weights.get(name, 0.0), 1.0 / (1 + rank))
+    for rank, track in enumerate(top_tracks):
+        for name in _split_artists(track['artist']):
+            weights[name] = max(weights.get(name, 0.0), 0.5 / (1 + rank))
+    return weights
+
+
+def score_candidates(top_tracks: list, top_artists: list, candidates: list, artist_genres: dict = None,
+                     audio_features: dict = None, weights: dict = None, batch_size: int = 4096,
+                     store=None) -> np.ndarray:
+    """
+    Score every candidate against the user profile. The genre and audio signals contribute
+    nothing unless artist_genres/audio_features or a store supply data for the candidates.
+
+    Args:
+        top_tracks: The user's top tracks ({'name', 'artist', 'uri'})
+        top_artists: The user's top artists ({'name', 'uri', optionally 'genres'})
+        candidates: Candidate tracks ({'name', 'artist', optionally 'uri'})
+        artist_genres: Optional mapping of lowercase artist name to genre list (e.g. from the graph)
+        audio_features: Optional mapping of track URI to a numeric audio-feature vector
+        weights: Weight of each signal, defaulting to DEFAULT_WEIGHTS
+        batch_size: Candidates scored per NumPy batch, bounding peak memory
+        store: Optional FeatureStore filling in genres for artists missing from artist_genres and,
+            without audio_features, supplying audio features by track URI
+
+    Returns:
+        np.ndarray: One float32 score per candidate, in candidate order.
+    """
+    weights = {**DEFAULT_WEIGHTS, **(weights or {})}
+    artist_genres = dict(artist_genres or {})
+    for artist in top_artists:
+        if artist.get('genres'):
+            artist_genres.setdefault(artist['name'].lower(), artist['genres'])
+
+    user_artists = _user_artist_weights(top_tracks, top_artists)
+    if store is not None:
+        names = set(user_artists).union(*(_split_artists(c['artist']) for c in candidates))
+        for name, genres in store.artist_genres_by_name(names - artist_genres.keys()).items():
+            artist_genres.setdefault(name, genres)
+    artist_index = {name: i for i, name in enumerate(user_artists)}
+    artist_vector = np.fromiter(user_artists.values(), dtype=np.float32, count=len(user_artists))
+
+    genre_index = {genre: i for i, genre in enumerate(sorted({g for gs in artist_genres.values() for g in gs}))}
+    user_genres = np.zeros(len(genre_index), dtype=np.float32)
+    for name, weight in user_artists.items():
+        for genre in artist_genres.get(name, []):
+            user_genres[genre_index[genre]] += weight
+    user_genres = _normalize_rows(user_genres[None, :])[0] if len(genre_index) else user_genres
+
+    user_audio = None
+    if audio_features:
+        profile = [audio_features[t['uri']] for t in top_tracks if t.get('uri') in audio_features]
+        if profile:
+            user_audio = _normalize_rows(np.asarray(profile, dtype=np.float32).mean(axis=0, keepdims=True))[0]
+    elif store is not None and store.audio_names:
+        profile = store.audio(store.track_rows([t.get('uri', '') for t in top_tracks]))
+        profile = profile[~np.isnan(profile).any(axis=1)]
+        if len(profile):
+            user_audio = _normalize_rows(profile.mean(axis=0, keepdims=True))[0]
+
+    scores = np.zeros(len(candidates), dtype=np.float32)
+    for start in range(0, len(candidates), batch_size):
+        batch = candidates[start:start + batch_size]
+        batch_artists = [_split_artists(c['artist']) for c in batch]
+
+        if len(artist_index):
+            incidence = np.zeros((len(batch), len(artist_index)), dtype=np.float32)
+            for row, names in enumerate(batch_artists):
+                for name in names:
+                    if name in artist_index:
+                        incidence[row, artist_index[name]] = 1.0
+            scores[start:start + len(batch)] += weights['artist'] * (incidence @ artist_vector)
+
+        if len(genre_index):
+            genres = np.zeros((len(batch), len(genre_index)), dtype=np.float32)
+            for row, names in enumerate(batch_artists):
+                for name in names:
+                    for genre in artist_genres.get(name, []):
+                        genres[row, genre_index[genre]] = 1.0
+            scores[start:start + len(batch)] += weights['genre'] * (_normalize_rows(genres) @ user_genres)
+
+        if user_audio is not None and not audio_features:
+            features = store.audio(store.track_rows([c.get('uri', '') for c in batch]))
+            known = ~np.isnan(features).any(axis=1)
+            batch_scores = scores[start:start + len(batch)]
+            batch_scores[known] += weights['audio'] * (_normalize_rows(features[known]) @ user_audio)
+        elif user_audio is not None:
+            known = [row for row, c in enumerate(batch) if c.get('uri') in audio_features]
+            if known:
+                features = np.asarray([audio_features[batch[row]['uri']] for row in known], dtype=np.float32)
+                similarity = _normalize_rows(features) @ user_audio
+                scores[start + np.asarray(known)] += weights['audio'] * similarity
+
+    return scores
+
+
+def prerank(top_tracks: list, top_artists: list, candidates: list, k: int = 20, **kwargs) -> list:
+    """
+    Return the k best-scoring candidates, best first. Extra keyword arguments go to score_candidates.
+    Candidates the user already has in their top tracks are excluded.
+    """
+    known = {(t['name'].lower(), t['artist'].lower()) for t in top_tracks}
+    candidates = [c for c in candidates if (c['name'].lower(), c['artist'].lower()) not in known]
+    if len(candidates) <= k:
+        return candidates
+
+    scores = score_candidates(top_tracks, top_artists, candidates, **kwargs)
+    top = np.argpartition(-scores, k - 1)[:k]
+    top = top[np.argsort(-scores[top], kind='stable')]
+    return [candidates[i] for i in top]
+
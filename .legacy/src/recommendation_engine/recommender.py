@@ -6,11 +6,83 @@ generating music recommendations based on those tracks, and fetching explanation
 
 Functions:
     get_recommendations: Fetch the user's top tracks, generate recommendations, and fetch explanations.
+    recommend: Run the same pipeline for an access token, outside any request.
+    recommend_async: Coroutine version of recommend for the ASGI app.
+    stream_recommendations: Yield recommendation and explanation tokens as they are generated.
+    retrieve_context: Look up knowledge snippets about the candidate pool for the LLM prompts.
+    fetch_once: Run a Spotify fetch at most once per request, on the shared worker pool.
+
+Classes:
+    PipelineStats: Counts runs, fallbacks and end-to-end latency per LLM pipeline mode.
 """
 
-from spotify.api import fetch_user_top_tracks, fetch_track_recommendations, fetch_top_artists
-from utils.langchain_utils import RecommendationLLM, ExplanationLLM  
-from flask import session
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import os
+import threading
+import time
+
+from spotify.api import (fetch_user_top_tracks, fetch_track_recommendations, fetch_top_artists,
+                         fetch_user_top_tracks_async, fetch_track_recommendations_async, fetch_top_artists_async)
+from spotify.tokens import session_access_token
+from recommendation_engine.prerank import prerank
+from recommendation_engine.feature_store import get_feature_store
+from RAG.index import get_knowledge_index
+from utils.langchain_utils import (RecommendationLLM, ExplanationLLM, SinglePassLLM, IncrementalRecommendationParser,
+                                   ParserError, get_llm)
+from flask import session, g, has_app_context
+
+
+# Shared across requests so Spotify calls reuse warm worker threads.
+SPOTIFY_POOL = ThreadPoolExecutor(max_workers=8, thread_name_prefix="spotify")
+
+# 'single_pass' asks for XRecommendations JSON in one call and falls back to 'two_stage'
+# (recommend, then explain) only when that response cannot be parsed.
+RECOMMENDATION_MODE = os.getenv("RECOMMENDATION_MODE", "single_pass")
+
+# Spotify returns up to 100 candidates per call; only the best PRERANK_TOP_K reach the prompt.
+CANDIDATE_POOL_SIZE = int(os.getenv("CANDIDATE_POOL_SIZE", "100"))
+PRERANK_TOP_K = int(os.getenv("PRERANK_TOP_K", "20"))
+
+# Knowledge snippets given to the LLM. Indexes large enough to have IVF lists are searched
+# approximately by default; RAG_NPROBE overrides how many lists are probed, 0 for exact search.
+RAG_SNIPPETS = int(os.getenv("RAG_SNIPPETS", "5"))
+RAG_NPROBE = int(os.environ["RAG_NPROBE"]) if os.getenv("RAG_NPROBE") else None
+
+
+####################
+## Pipeline Stats ##
+####################
+
+
+class PipelineStats:
+    """
+    Thread-safe counters for how each /home request was served. Modes are 'single_pass',
+    'two_stage' (configured) and 'fallback' (single pass failed to parse, then two stages ran).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = {}
+        self.latency = {}
+
+    def record(self, mode: str, seconds: float):
+        with self._lock:
+            self.counts[mode] = self.counts.get(mode, 0) + 1
+            self.latency[mode] = self.latency.get(mode, 0.0) + seconds
+
+    def stats(self) -> dict:
+        """Return per-mode counts and mean latency, plus the single-pass fallback rate."""
+        with self._lock:
+            attempts = self.counts.get('single_pass', 0) + self.counts.get('fallback', 0)
+            return {
+                'modes': {mode: {'count': count, 'avg_latency': self.latency[mode] / count}
+                          for mode, count in self.counts.items()},
+                'fallback_rate': self.counts.get('fallback', 0) / attempts if attempts else 0.0,
+            }
+
+
+PIPELINE_STATS = PipelineStats()
 
 
 ###########################
@@ -18,6 +90,24 @@ from flask import session
 ###########################
 
 
+def fetch_once(func, *args, **kwargs):
+    """
+    Submit a Spotify fetch to the worker pool, memoized for the current request.
+    Repeated calls with the same arguments during one page load share a single future.
+    Outside a request (e.g. in a background worker) every call is submitted as is.
+
+    Returns:
+        concurrent.futures.Future: The pending result of func(*args, **kwargs).
+    """
+    if not has_app_context():
+        return SPOTIFY_POOL.submit(func, *args, **kwargs)
+    memo = g.setdefault('spotify_memo', {})
+    key = (func.__name__, repr(args), repr(sorted(kwargs.items())))
+    if key not in memo:
+        memo[key] = SPOTIFY_POOL.submit(func, *args, **kwargs)
+    return memo[key]
+
+
 def get_recommendations():
     """
     Fetches the user's top tracks from Spotify, generates recommendations based on those tracks,
@@ -29,32 +119,220 @@ def get_recommendations():
             explanations (list): A list of explanations for the recommendations.
     """
 
-    if not session.get('access_token'):
+    access_token = session_access_token(session)
+    if not access_token:
         return None, "Access token is not available. Please log in."
 
-    access_token = session['access_token']
+    recommendations, error = recommend(access_token)
+    if error: return None, error
 
-    top_tracks = fetch_user_top_tracks(access_token, limit = 20, time_range = 'long_term')
-    top_artists = fetch_top_artists(access_token, limit = 20, time_range = 'long_term')
-    candidates = fetch_track_recommendations(access_token, fetch_user_top_tracks(access_token), fetch_top_artists(access_token))
+    return recommendations
 
-    # print("Top Tracks: ", top_tracks)
-    # print("Top Artists: ", top_artists)
-    # print("Songs: ", candidates)
 
-    if not top_tracks: return None, "Failed to fetch top tracks from Spotify."
-    if not top_artists: return None, "Failed to fetch top artists from Spotify."
-    if not candidates: return None, "Failed to fetch recommendations from Spotify."
+def recommend(access_token):
+    """
+    Run the recommendation pipeline for an access token. Needs no request context, so
+    background snapshot workers call it directly.
+
+    Returns:
+        (recommendations, error): error is None when recommendations were produced.
+    """
+    top_tracks, top_artists, candidates, error = fetch_inputs(access_token)
+    if error: return None, error
 
     try:
-        recommendationLLM = RecommendationLLM()
-        explanationLLM = ExplanationLLM()
+        start = time.perf_counter()
+        mode = 'two_stage'
+        context = retrieve_context(candidates)
+        if RECOMMENDATION_MODE == 'single_pass':
+            try:
+                recommendations = get_llm(SinglePassLLM)(top_tracks, top_artists, candidates, context)
+                PIPELINE_STATS.record('single_pass', time.perf_counter() - start)
+                return recommendations, None
+            except ParserError:
+                mode = 'fallback'
+
+        recommendationLLM = get_llm(RecommendationLLM)
+        explanationLLM = get_llm(ExplanationLLM)
 
         recommendations = explanationLLM(
-            recommendationLLM(top_tracks, top_artists, candidates)
+            recommendationLLM(top_tracks, top_artists, candidates),
+            context
             )
+        PIPELINE_STATS.record(mode, time.perf_counter() - start)
     
     except Exception as e:
         return None, f"Error processing recommendations: {str(e)}"
 
-    return recommendations
\ No newline at end of file
+    return recommendations, None
+
+
+async def recommend_async(access_token):
+    """
+    Coroutine version of recommend. Spotify fetches and LLM calls are awaited, so one event
+    loop can hold many requests that are waiting on them.
+
+    Returns:
+        (recommendations, error): error is None when recommendations were produced.
+    """
+    top_tracks, top_artists, candidates, error = await fetch_inputs_async(access_token)
+    if error: return None, error
+
+    try:
+        start = time.perf_counter()
+        mode = 'two_stage'
+        if RECOMMENDATION_MODE == 'single_pass':
+            context = await asyncio.to_thread(retrieve_context, candidates)
+            try:
+                recommendations = await get_llm(SinglePassLLM).ainvoke(top_tracks, top_artists, candidates, context)
+                PIPELINE_STATS.record('single_pass', time.perf_counter() - start)
+                return recommendations, None
+            except ParserError:
+                mode = 'fallback'
+            reasoning = await get_llm(RecommendationLLM).ainvoke(top_tracks, top_artists, candidates)
+        else:
+            # The search overlaps the recommendation pass, whose output the explanation needs anyway.
+            reasoning, context = await asyncio.gather(
+                get_llm(RecommendationLLM).ainvoke(top_tracks, top_artists, candidates),
+                asyncio.to_thread(retrieve_context, candidates),
+            )
+        recommendations = await get_llm(ExplanationLLM).ainvoke(reasoning, context)
+        PIPELINE_STATS.record(mode, time.perf_counter() - start)
+
+    except Exception as e:
+        return None, f"Error processing recommendations: {str(e)}"
+
+    return recommendations, None
+
+
+def stream_recommendations():
+    """
+    Streaming variant of get_recommendations. Must be consumed inside the request context
+    (e.g. wrapped in flask.stream_with_context).
+
+    Yields:
+        (event, data) tuples. In single-pass mode, ('item', dict) as each recommendation is
+        completed; in two-stage mode (or on fallback), ('recommendation', token) and
+        ('explanation', token) while the two passes generate. Finally ('result', list of
+        recommendation dicts) or ('error', message).
+    """
+    access_token = session_access_token(session)
+    if not access_token:
+        yield 'error', "Access token is not available. Please log in."
+        return
+
+    top_tracks, top_artists, candidates, error = fetch_inputs(access_token)
+    if error:
+        yield 'error', error
+        return
+
+    try:
+        start = time.perf_counter()
+        mode = 'two_stage'
+        context = retrieve_context(candidates)
+        if RECOMMENDATION_MODE == 'single_pass':
+            parser = IncrementalRecommendationParser()
+            for token in get_llm(SinglePassLLM).stream(top_tracks, top_artists, candidates, context):
+                for item in parser.feed(token):
+                    yield 'item', item
+            try:
+                parsed = parser.result()
+                PIPELINE_STATS.record('single_pass', time.perf_counter() - start)
+                yield 'result', [rec._asdict() if hasattr(rec, '_asdict') else rec for rec in parsed.recommendations]
+                return
+            except ParserError:
+                mode = 'fallback'
+
+        recommendationLLM = get_llm(RecommendationLLM)
+        explanationLLM = get_llm(ExplanationLLM)
+
+        reasoning = []
+        for token in recommendationLLM.stream(top_tracks, top_artists, candidates):
+            reasoning.append(token)
+            yield 'recommendation', token
+
+        explanation = []
+        for token in explanationLLM.stream("".join(reasoning), context):
+            explanation.append(token)
+            yield 'explanation', token
+
+        parsed = explanationLLM.output_parser.parse("".join(explanation))
+        PIPELINE_STATS.record(mode, time.perf_counter() - start)
+        yield 'result', [rec._asdict() if hasattr(rec, '_asdict') else rec for rec in parsed.recommendations]
+
+    except Exception as e:
+        yield 'error', f"Error processing recommendations: {str(e)}"
+
+
+def retrieve_context(candidates):
+    """
+    Look up knowledge snippets (Pitchfork reviews, Reddit discussion) about the candidate pool.
+    All candidates are queried in one batch; the best distinct snippets overall are kept.
+
+    Returns:
+        list: Up to RAG_SNIPPETS snippet strings, empty if no index has been built.
+    """
+    index = get_knowledge_index()
+    if index is None or not candidates:
+        return []
+
+    queries = [f"{candidate['artist']} {candidate['name']}" for candidate in candidates]
+    hits = {}
+    for results in index.search(queries, k=2, nprobe=RAG_NPROBE):
+        for hit in results:
+            if hit['score'] > hits.get(hit['id'], {'score': 0.0})['score']:
+                hits[hit['id']] = hit
+    best = sorted(hits.values(), key=lambda hit: hit['score'], reverse=True)[:RAG_SNIPPETS]
+    return [hit['text'] for hit in best]
+
+
+def fetch_inputs(access_token):
+    """
+    Fetch the user's top tracks, top artists and the candidate pool, then pre-rank the pool
+    locally so only the PRERANK_TOP_K best candidates are passed to the LLM.
+
+    Returns:
+        (top_tracks, top_artists, candidates, error): error is None when every fetch succeeded.
+    """
+    # Top tracks and artists are independent, so fetch them concurrently. The recommendation
+    # seeds are taken from these long-term results instead of a second round of fetches.
+    top_tracks_future = fetch_once(fetch_user_top_tracks, access_token, limit = 20, time_range = 'long_term')
+    top_artists_future = fetch_once(fetch_top_artists, access_token, limit = 20, time_range = 'long_term')
+    top_tracks = top_tracks_future.result()
+    top_artists = top_artists_future.result()
+
+    if not top_tracks: return None, None, None, "Failed to fetch top tracks from Spotify."
+    if not top_artists: return None, None, None, "Failed to fetch top artists from Spotify."
+
+    candidates = fetch_once(fetch_track_recommendations, access_token, top_tracks, top_artists,
+                            limit = CANDIDATE_POOL_SIZE).result()
+
+    if not candidates: return None, None, None, "Failed to fetch recommendations from Spotify."
+
+    candidates = prerank(top_tracks, top_artists, candidates, k = PRERANK_TOP_K, store = get_feature_store())
+
+    return top_tracks, top_artists, candidates, None
+
+
+async def fetch_inputs_async(access_token):
+    """
+    Coroutine version of fetch_inputs.
+    """
+    top_tracks, top_artists = await asyncio.gather(
+        fetch_user_top_tracks_async(access_token, limit = 20, time_range = 'long_term'),
+        fetch_top_artists_async(access_token, limit = 20, time_range = 'long_term'),
+    )
+
+    if not top_tracks: return None, None, None, "Failed to fetch top tracks from Spotify."
+    if not top_artists: return None, None, None, "Failed to fetch top artists from Spotify."
+
+    candidates = await fetch_track_recommendations_async(access_token, top_tracks, top_artists,
+                                                         limit = CANDIDATE_POOL_SIZE)
+
+    if not candidates: return None, None, None, "Failed to fetch recommendations from Spotify."
+
+    # Pre-ranking is NumPy work over the feature store (opened on first use); keep it off the event loop.
+    candidates = await asyncio.to_thread(lambda: prerank(top_tracks, top_artists, candidates, k = PRERANK_TOP_K,
+                                                         store = get_feature_store()))
+
+    return top_tracks, top_artists, candidates, None
@@ -0,0 +1,340 @@
+"""
+Background refresh of per-user recommendation snapshots.
+
+/home serves the latest stored snapshot for the logged-in user instead of running the Spotify
+fetches and LLM passes inline. Refreshes are queued in a local SQLite job queue (at most one
+pending job per user) after login, when /home finds a stale snapshot, and on a schedule. Worker
+processes run the pipeline and store each result as a new snapshot version.
+
+Snapshots are off by default. Set SNAPSHOT_WORKERS to turn them on; python app.py and
+python serve.py then start that many workers themselves. Under any other launcher (flask run,
+gunicorn, a bare uvicorn) start the workers next to the web app yourself:
+    SNAPSHOT_WORKERS=2 python -m recommendation_engine.snapshots
+
+Classes:
+    SnapshotStore: Versioned snapshots, the refresh queue and refresh metrics, shared across processes
+
+Functions:
+    request_refresh: Queue a refresh for a user if snapshot workers are enabled
+    serve_snapshot: Return a user's latest recommendations and any refresh failure, queueing a refresh when missing or stale
+    run_worker: Claim and run refresh jobs until stopped
+    start_workers: Start worker processes and the stale-snapshot scheduler
+"""
+
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+
+
+SNAPSHOT_PATH = os.getenv("SNAPSHOT_PATH", "data/snapshots.sqlite3")
+
+# Worker processes started by the web app; 0 disables snapshots and /home computes inline.
+# Only app.py and serve.py start workers, so this stays opt-in: with no worker running, /home
+# would wait on a snapshot that never comes.
+SNAPSHOT_WORKERS = int(os.getenv("SNAPSHOT_WORKERS", "0"))
+
+# A snapshot older than this is still served, but a refresh is queued.
+SNAPSHOT_TTL = int(os.getenv("SNAPSHOT_TTL", str(6 * 60 * 60)))
+
+# How often the scheduler looks for users with stale snapshots.
+SNAPSHOT_SCHEDULE_INTERVAL = int(os.getenv("SNAPSHOT_SCHEDULE_INTERVAL", "300"))
+
+
+####################
+## Snapshot Store ##
+####################
+
+
+class SnapshotStore:
+    """
+    SQLite-backed snapshots and job queue. Every process opens its own connection, so one store
+    path can be shared by the web app and any number of worker processes.
+
+    Access tokens are kept with the queue so workers and the scheduler can call Spotify on the
+    user's behalf; keep the database file private.
+    """
+
+    def __init__(self, path: str = SNAPSHOT_PATH, keep: int = 3, job_timeout: int = 600, log_size: int = 1000):
+        """
+        Args:
+            keep: Snapshot versions kept per user
+            job_timeout: Seconds after which a claimed job is considered abandoned and handed out again
+            log_size: Refresh log entries kept for metrics
+        """
+        self.path = path
+        self.keep = keep
+        self.job_timeout = job_timeout
+        self.log_size = log_size
+        self._lock = threading.Lock()
+        self._db = None
+        self._pid = None
+
+    def __repr__(self) -> str:
+        return f"SnapshotStore(path={self.path!r})"
+
+    @property
+    def db(self) -> sqlite3.Connection:
+        # Connections can't cross a fork, so each process opens its own on first use.
+        if self._db is None or self._pid != os.getpid():
+            if os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._db = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.executescript(
+                "CREATE TABLE IF NOT EXISTS snapshots ("
+                " user_id TEXT NOT NULL, version INTEGER NOT NULL, created_at REAL NOT NULL, payload TEXT NOT NULL,"
+                " PRIMARY KEY (user_id, version));"
+                "CREATE TABLE IF NOT EXISTS users ("
+                " user_id TEXT PRIMARY KEY, access_token TEXT NOT NULL, expires_at REAL NOT NULL);"
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " user_id TEXT PRIMARY KEY, enqueued_at REAL NOT NULL, started_at REAL);"
+                "CREATE TABLE IF NOT EXISTS refresh_log ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT, user_id TEXT NOT NULL, finished_at REAL NOT NULL,"
+                " ok INTEGER NOT NULL, queue_lag REAL NOT NULL, duration REAL NOT NULL, error TEXT);"
+            )
+            self._pid = os.getpid()
+        return self._db
+
+    # Snapshots
+
+    def latest(self, user_id: str):
+        """Return the newest snapshot as {'version', 'created_at', 'age', 'payload'}, or None."""
+        with self._lock:
+            row = self.db.execute("SELECT version, created_at, payload FROM snapshots WHERE user_id = ? "
+                                  "ORDER BY version DESC LIMIT 1", (user_id,)).fetchone()
+        if row is None:
+            return None
+        return {'version': row[0], 'created_at': row[1], 'age': time.time() - row[1], 'payload': row[2]}
+
+    def put(self, user_id: str, payload: str) -> int:
+        """Store a new snapshot version and drop all but the newest `keep`. Returns the version."""
+        with self._lock:
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                version = self.db.execute("SELECT COALESCE(MAX(version), 0) + 1 FROM snapshots WHERE user_id = ?",
+                                          (user_id,)).fetchone()[0]
+                self.db.execute("INSERT INTO snapshots VALUES (?, ?, ?, ?)", (user_id, version, time.time(), payload))
+                self.db.execute("DELETE FROM snapshots WHERE user_id = ? AND version <= ?", (user_id, version - self.keep))
+                self.db.execute("COMMIT")
+            except Exception:
+                self.db.execute("ROLLBACK")
+                raise
+        return version
+
+    # Job queue
+
+    def enqueue(self, user_id: str, access_token: str = None, expires_at: float = None) -> bool:
+        """
+        Queue a refresh for a user, updating their stored token when one is given.
+        Returns False if a refresh is already queued or running.
+        """
+        with self._lock:
+            if access_token:
+                self.db.execute("INSERT INTO users VALUES (?, ?, ?) ON CONFLICT(user_id) DO UPDATE SET "
+                                " access_token = excluded.access_token, expires_at = excluded.expires_at",
+                                (user_id, access_token, expires_at or time.time() + 3600))
+            cursor = self.db.execute("INSERT INTO jobs VALUES (?, ?, NULL) ON CONFLICT(user_id) DO NOTHING",
+                                     (user_id, time.time()))
+        return cursor.rowcount == 1
+
+    def claim(self):
+        """
+        Take the oldest waiting job (or one abandoned by a crashed worker).
+        Returns (user_id, access_token, expires_at, enqueued_at), or None if the queue is empty.
+        """
+        now = time.time()
+        with self._lock:
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self.db.execute(
+                    "SELECT j.user_id, u.access_token, u.expires_at, j.enqueued_at FROM jobs j "
+                    "LEFT JOIN users u ON u.user_id = j.user_id "
+                    "WHERE j.started_at IS NULL OR j.started_at < ? ORDER BY j.enqueued_at LIMIT 1",
+                    (now - self.job_timeout,)).fetchone()
+                if row is not None:
+                    self.db.execute("UPDATE jobs SET started_at = ? WHERE user_id = ?", (now, row[0]))
+                self.db.execute("COMMIT")
+            except Exception:
+                self.db.execute("ROLLBACK")
+                raise
+        return row
+
+    def finish(self, user_id: str, enqueued_at: float, started_at: float, error: str = None):
+        """Remove a finished job and log its queue lag and duration."""
+        now = time.time()
+        with self._lock:
+            self.db.execute("DELETE FROM jobs WHERE user_id = ?", (user_id,))
+            cursor = self.db.execute("INSERT INTO refresh_log (user_id, finished_at, ok, queue_lag, duration, error) "
+                                     "VALUES (?, ?, ?, ?, ?, ?)",
+                                     (user_id, now, error is None, started_at - enqueued_at, now - started_at, error))
+            self.db.execute("DELETE FROM refresh_log WHERE id <= ?", (cursor.lastrowid - self.log_size,))
+
+    def last_error(self, user_id: str):
+        """Return the error of the user's most recent refresh if it failed, else None."""
+        with self._lock:
+            row = self.db.execute("SELECT ok, error FROM refresh_log WHERE user_id = ? ORDER BY id DESC LIMIT 1",
+                                  (user_id,)).fetchone()
+        if row is None or row[0]:
+            return None
+        return row[1] or "Unknown error"
+
+    def stale_users(self, ttl: int = SNAPSHOT_TTL, refreshable: set = None) -> list:
+        """
+        Users whose newest snapshot is older than ttl (or missing) and who have no job queued.
+
+        Args:
+            refreshable: Only consider these users, e.g. TokenManager.refreshable_users(). The stored
+                access token expires long before ttl, so the job's token comes from the token manager.
+        """
+        now = time.time()
+        with self._lock:
+            rows = self.db.execute(
+                "SELECT u.user_id FROM users u LEFT JOIN jobs j ON j.user_id = u.user_id "
+                "WHERE j.user_id IS NULL AND COALESCE("
+                " (SELECT MAX(created_at) FROM snapshots s WHERE s.user_id = u.user_id), 0) < ?",
+                (now - ttl,)).fetchall()
+        return [row[0] for row in rows if refreshable is None or row[0] in refreshable]
+
+    def stats(self) -> dict:
+        """
+        Queue depth, current lag (age of the oldest waiting job), and queue lag and refresh
+        duration over the recent refresh log.
+        """
+        now = time.time()
+        with self._lock:
+            queued, running, oldest = self.db.execute(
+                "SELECT COUNT(*) - COUNT(started_at), COUNT(started_at), MIN(CASE WHEN started_at IS NULL "
+                "THEN enqueued_at END) FROM jobs").fetchone()
+            refreshes, failed, avg_lag, max_lag, avg_duration, max_duration = self.db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(1 - ok), 0), AVG(queue_lag), MAX(queue_lag), AVG(duration), "
+                "MAX(duration) FROM refresh_log").fetchone()
+            last = self.db.execute("SELECT queue_lag, duration, error FROM refresh_log ORDER BY id DESC LIMIT 1").fetchone()
+            users = self.db.execute("SELECT COUNT(DISTINCT user_id) FROM snapshots").fetchone()[0]
+        return {
+            'queued': queued,
+            'running': running,
+            'current_lag': now - oldest if oldest else 0.0,
+            'users_with_snapshots': users,
+            'refreshes': refreshes,
+            'failed': failed,
+            'avg_queue_lag': avg_lag or 0.0,
+            'max_queue_lag': max_lag or 0.0,
+            'avg_refresh_duration': avg_duration or 0.0,
+            'max_refresh_duration': max_duration or 0.0,
+            'last': {'queue_lag': last[0], 'duration': last[1], 'error': last[2]} if last else None,
+        }
+
+
+SNAPSHOTS = SnapshotStore()
+
+
+def request_refresh(user_id: str, access_token: str = None, expires_at: float = None) -> bool:
+    """Queue a refresh for a user; a no-op when snapshot workers are disabled."""
+    if not SNAPSHOT_WORKERS or not user_id:
+        return False
+    return SNAPSHOTS.enqueue(user_id, access_token, expires_at)
+
+
+def serve_snapshot(user_id: str, access_token: str = None, expires_at: float = None):
+    """
+    Return the user's latest snapshot and the error of their last refresh, if it failed.
+    A refresh is queued when the snapshot is missing or older than SNAPSHOT_TTL.
+
+    Returns:
+        tuple: (XRecommendations or None if there is no snapshot yet, error message or None)
+    """
+    from utils.langchain_utils import XRecommendations
+
+    snapshot = SNAPSHOTS.latest(user_id)
+    if snapshot is None or snapshot['age'] > SNAPSHOT_TTL:
+        request_refresh(user_id, access_token, expires_at)
+    error = SNAPSHOTS.last_error(user_id)
+    if snapshot is None:
+        return None, error
+    return XRecommendations.parse_raw(snapshot['payload']), error
+
+
+#############
+## Workers ##
+#############
+
+
+def run_worker(path: str = SNAPSHOT_PATH, poll_interval: float = 1.0, stop: threading.Event = None):
+    """
+    Claim refresh jobs and run the recommendation pipeline for each, storing successful results
+    as new snapshot versions. Runs until `stop` is set (or forever).
+    """
+    from recommendation_engine.recommender import recommend
+    from spotify.tokens import TOKENS
+    from utils.langchain_utils import XRecommendations
+
+    store = SnapshotStore(path)
+    while stop is None or not stop.is_set():
+        job = store.claim()
+        if job is None:
+            time.sleep(poll_interval)
+            continue
+
+        user_id, access_token, expires_at, enqueued_at = job
+        started_at = time.time()
+        error = None
+        try:
+            # The queued token may have expired while waiting; the token manager refreshes it.
+            token = TOKENS.user_token(user_id)
+            if token is not None:
+                access_token, expires_at = token
+            if not access_token or (expires_at or 0) < started_at:
+                error = "Access token expired"
+            else:
+                recommendations, error = recommend(access_token)
+                if error is None and not isinstance(recommendations, XRecommendations):
+                    error = f"Unexpected pipeline result: {str(recommendations)[:200]}"
+                if error is None:
+                    version = store.put(user_id, recommendations.json())
+                    print(f"Snapshot v{version} for {user_id} in {time.time() - started_at:.1f}s "
+                          f"(queued {started_at - enqueued_at:.1f}s)")
+        except Exception as e:
+            error = str(e)
+        if error:
+            print(f"Snapshot refresh for {user_id} failed: {error}")
+        store.finish(user_id, enqueued_at, started_at, error)
+
+
+def _schedule(store: SnapshotStore, interval: int, ttl: int):
+    from spotify.tokens import TOKENS
+
+    while True:
+        try:
+            # Only users the token manager can mint a token for; workers fetch it when the job runs.
+            for user_id in store.stale_users(ttl, TOKENS.refreshable_users()):
+                store.enqueue(user_id)
+        except Exception as e:
+            print(f"Snapshot scheduler failed: {e}")
+        time.sleep(interval)
+
+
+def start_workers(count: int = SNAPSHOT_WORKERS, path: str = SNAPSHOT_PATH, schedule: bool = True) -> list:
+    """
+    Start `count` worker processes and, with schedule=True, a daemon thread in this process that
+    queues refreshes for users whose snapshots have gone stale. Returns the processes.
+    """
+    context = multiprocessing.get_context("spawn")
+    processes = [context.Process(target=run_worker, args=(path,), name=f"snapshot-worker-{i}", daemon=True)
+                 for i in range(count)]
+    for process in processes:
+        process.start()
+    if schedule and count:
+        threading.Thread(target=_schedule, args=(SnapshotStore(path), SNAPSHOT_SCHEDULE_INTERVAL, SNAPSHOT_TTL),
+                         name="snapshot-scheduler", daemon=True).start()
+    print(f"Started {count} snapshot workers on {path}")
+    return processes
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    for process in start_workers(max(1, SNAPSHOT_WORKERS)):
+        process.join()
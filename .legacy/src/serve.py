@@ -0,0 +1,41 @@
+"""
+Production launcher for the async (ASGI) app in asgi.py.
+
+Each web worker is a process running one event loop; snapshot workers (see
+recommendation_engine/snapshots.py) are started once here rather than per web worker.
+
+Usage:
+    python serve.py [--host 0.0.0.0] [--port 8000] [--workers N]
+
+Environment:
+    WEB_CONCURRENCY: Default number of web worker processes (otherwise the CPU count)
+    SNAPSHOT_WORKERS: Snapshot refresh processes to start alongside (0 to refresh inline)
+"""
+
+import argparse
+import os
+
+from dotenv import load_dotenv
+
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Serve the async web app")
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", str(os.cpu_count() or 1))))
+    parser.add_argument("--backlog", type=int, default=2048, help="Pending connections the socket queues")
+    parser.add_argument("--keep-alive", type=int, default=5, help="Seconds idle keep-alive connections stay open")
+    args = parser.parse_args()
+
+    import uvicorn
+    from recommendation_engine.snapshots import SNAPSHOT_WORKERS, start_workers
+
+    if SNAPSHOT_WORKERS:
+        start_workers(SNAPSHOT_WORKERS)
+    uvicorn.run("asgi:app", host=args.host, port=args.port, workers=args.workers, backlog=args.backlog,
+                timeout_keep_alive=args.keep_alive, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,12 @@
-import requests
+import os
+
+from spotify.cache import cached, cached_async
+from spotify.ratelimit import SPOTIFY_LIMITER
+from utils.http_client import get_async_client, get_session
+
+
+# Overridable so load tests can point the app at a local stub.
+API_URL = os.getenv("SPOTIFY_API_URL", "https://api.spotify.com/v1")
 
 
 #################
@@ -9,90 +17,159 @@ import requests
 def get_spotify_access_token(session):
     return session.get('access_token')
 
-def fetch_user_top_tracks(access_token, time_range = 'short_term', limit = 5):
-    headers = {
+def _headers(access_token):
+    return {
         'Authorization': f'Bearer {access_token}',
         'Content-Type': 'application/json'
     }
+
+def _parse_top_tracks(top_tracks_data):
+    top_tracks = []
+    for item in top_tracks_data['items']:
+        track_name = item['name']
+        artists = ', '.join(artist['name'] for artist in item['artists'])
+        track_uri = item['uri']
+        top_tracks.append({'name': track_name, 'artist': artists, 'uri': track_uri})
+    return top_tracks
+
+def _parse_top_artists(top_artists_data):
+    top_artists = []
+    for item in top_artists_data['items']:
+        artist_name = item['name']
+        artist_uri = item['uri']
+        top_artists.append({'name': artist_name, 'uri': artist_uri, 'genres': item.get('genres', [])})
+    return top_artists
+
+def _recommendation_params(seed_tracks, seed_artists, limit):
+    seed_track_uris = [track['uri'].split(':')[-1] for track in seed_tracks][:2]
+    seed_artist_uris = [artist['uri'].split(':')[-1] for artist in seed_artists][:3]
+    return {
+        'seed_tracks': ','.join(seed_track_uris),
+        'seed_artists': ','.join(seed_artist_uris),
+        'limit': limit
+    }
+
+def _parse_recommendations(recommendations_data):
+    recommendations = []
+    for item in recommendations_data['tracks']:
+        track_name = item['name']
+        artists = ', '.join(artist['name'] for artist in item['artists'])
+        recommendations.append({'name': track_name, 'artist': artists, 'uri': item['uri']})
+    return recommendations
+
+def _parse_user_profile(profile):
+    return {'id': profile['id'], 'display_name': profile.get('display_name')}
+
+@cached('me/top/tracks')
+def fetch_user_top_tracks(access_token, time_range = 'short_term', limit = 5):
     params = {
         'time_range': time_range,
         'limit': limit
     }
-    url = 'https://api.spotify.com/v1/me/top/tracks'
-    
-    response = requests.get(url, headers=headers, params=params)
-    
+    url = f'{API_URL}/me/top/tracks'
+
+    response = SPOTIFY_LIMITER.request(get_session().get, url, headers=_headers(access_token), params=params)
+
     if response.status_code == 200:
-        top_tracks_data = response.json()
-        top_tracks = []
-        for item in top_tracks_data['items']:
-            track_name = item['name']
-            artists = ', '.join(artist['name'] for artist in item['artists'])
-            track_uri = item['uri'] 
-            top_tracks.append({'name': track_name, 'artist': artists, 'uri': track_uri})
+        top_tracks = _parse_top_tracks(response.json())
         print("Top Tracks: ", top_tracks)
         return top_tracks
     else:
         print(f"Failed to fetch top tracks: {response.status_code}")
         return []
-    
+
+@cached('me/top/artists')
 def fetch_top_artists(access_token, time_range='short_term', limit=5):
-    headers = {
-        'Authorization': f'Bearer {access_token}',
-        'Content-Type': 'application/json'
-    }
     params = {
         'time_range': time_range,
         'limit': limit
     }
-    url = 'https://api.spotify.com/v1/me/top/artists'
-    
-    response = requests.get(url, headers=headers, params=params)
-    
+    url = f'{API_URL}/me/top/artists'
+
+    response = SPOTIFY_LIMITER.request(get_session().get, url, headers=_headers(access_token), params=params)
+
     if response.status_code == 200:
-        top_artists_data = response.json()
-        top_artists = []
-        for item in top_artists_data['items']:
-            artist_name = item['name']
-            artist_uri = item['uri']
-            top_artists.append({'name': artist_name, 'uri': artist_uri})
+        top_artists = _parse_top_artists(response.json())
         print("Top Artists: ", top_artists)
         return top_artists
     else:
         print(f"Failed to fetch top artists: {response.status_code}")
         return []
 
+@cached('recommendations')
 def fetch_track_recommendations(access_token, seed_tracks, seed_artists, limit=20):
-    headers = {
-        'Authorization': f'Bearer {access_token}',
-        'Content-Type': 'application/json'
-    }
+    params = _recommendation_params(seed_tracks, seed_artists, limit)
 
-    seed_track_uris = [track['uri'].split(':')[-1] for track in seed_tracks][:2]
-    seed_artist_uris = [artist['uri'].split(':')[-1] for artist in seed_artists][:3]
+    print("Seed Tracks: ", params['seed_tracks'])
+    print("Seed Artists: ", params['seed_artists'])
 
-    print("Seed Tracks: ", ','.join(seed_track_uris))
-    print("Seed Artists: ", ','.join(seed_artist_uris))
+    url = f'{API_URL}/recommendations'
 
-    params = {
-        'seed_tracks': ','.join(seed_track_uris),
-        'seed_artists': ','.join(seed_artist_uris),
-        'limit': limit
-    }
-    url = 'https://api.spotify.com/v1/recommendations'
 
-    
-    response = requests.get(url, headers=headers, params=params)
+    response = SPOTIFY_LIMITER.request(get_session().get, url, headers=_headers(access_token), params=params)
     print(response.url)
-    
+
     if response.status_code == 200:
-        recommendations_data = response.json()
-        recommendations = []
-        for item in recommendations_data['tracks']:
-            track_name = item['name']
-            artists = ', '.join(artist['name'] for artist in item['artists'])
-            recommendations.append({'name': track_name, 'artist': artists})
-        return recommendations
+        return _parse_recommendations(response.json())
     else:
         print(f"Failed to fetch recommendations: {response.status_code}")
-        return []
\ No newline at end of file
+        return []
+
+@cached('me')
+def fetch_user_profile(access_token):
+    url = f'{API_URL}/me'
+
+    response = SPOTIFY_LIMITER.request(get_session().get, url, headers=_headers(access_token))
+
+    if response.status_code == 200:
+        return _parse_user_profile(response.json())
+    else:
+        print(f"Failed to fetch user profile: {response.status_code}")
+        return None
+
+
+#######################
+## Async Spotify API ##
+#######################
+
+# Coroutine versions of the fetches above for the ASGI app. They share the response cache and
+# the rate limiter's budget with the sync versions, and send through the pooled httpx client.
+
+@cached_async('me/top/tracks')
+async def fetch_user_top_tracks_async(access_token, time_range = 'short_term', limit = 5):
+    params = {'time_range': time_range, 'limit': limit}
+    response = await SPOTIFY_LIMITER.request_async(get_async_client().get, f'{API_URL}/me/top/tracks',
+                                                   headers=_headers(access_token), params=params)
+    if response.status_code == 200:
+        return _parse_top_tracks(response.json())
+    print(f"Failed to fetch top tracks: {response.status_code}")
+    return []
+
+@cached_async('me/top/artists')
+async def fetch_top_artists_async(access_token, time_range='short_term', limit=5):
+    params = {'time_range': time_range, 'limit': limit}
+    response = await SPOTIFY_LIMITER.request_async(get_async_client().get, f'{API_URL}/me/top/artists',
+                                                   headers=_headers(access_token), params=params)
+    if response.status_code == 200:
+        return _parse_top_artists(response.json())
+    print(f"Failed to fetch top artists: {response.status_code}")
+    return []
+
+@cached_async('recommendations')
+async def fetch_track_recommendations_async(access_token, seed_tracks, seed_artists, limit=20):
+    params = _recommendation_params(seed_tracks, seed_artists, limit)
+    response = await SPOTIFY_LIMITER.request_async(get_async_client().get, f'{API_URL}/recommendations',
+                                                   headers=_headers(access_token), params=params)
+    if response.status_code == 200:
+        return _parse_recommendations(response.json())
+    print(f"Failed to fetch recommendations: {response.status_code}")
+    return []
+
+@cached_async('me')
+async def fetch_user_profile_async(access_token):
+    response = await SPOTIFY_LIMITER.request_async(get_async_client().get, f'{API_URL}/me',
+                                                   headers=_headers(access_token))
+    if response.status_code == 200:
+        return _parse_user_profile(response.json())
+    print(f"Failed to fetch user profile: {response.status_code}")
+    return None
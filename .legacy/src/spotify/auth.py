@@ -1,26 +1,30 @@
 import os
-import requests
 from flask import redirect, request, jsonify, session
 from urllib.parse import urlencode
 from datetime import datetime
 
+from spotify.api import fetch_user_profile
+from spotify.ratelimit import SPOTIFY_LIMITER
+from spotify.tokens import CLIENT_ID, CLIENT_SECRET, TOKEN_URL, TOKENS
+from recommendation_engine.snapshots import request_refresh
+from utils.http_client import get_async_client, get_session
+
 
 ##################
 ## Spotify Auth ##
 ##################
 
 
-CLIENT_ID = 'bcf292b2fa9f43fe8d6d8b5824231dcc'
-CLIENT_SECRET = os.getenv("SPOTIFY_CLIENT_SECRET")
-REDIRECT_URI = 'http://localhost:5000/callback'
+REDIRECT_URI = os.getenv("SPOTIFY_REDIRECT_URI", 'http://localhost:5000/callback')
 AUTH_URL = 'https://accounts.spotify.com/authorize'
-TOKEN_URL = 'https://accounts.spotify.com/api/token'
 
-def login():
+def authorize_url():
     scope = 'user-read-private user-read-email user-top-read'
     params = {'client_id': CLIENT_ID, 'response_type': 'code', 'scope': scope, 'redirect_uri': REDIRECT_URI, 'show_dialog': True}
-    url = f"{AUTH_URL}?{urlencode(params)}"
-    return redirect(url)
+    return f"{AUTH_URL}?{urlencode(params)}"
+
+def login():
+    return redirect(authorize_url())
 
 def callback():
     error = request.args.get('error')
@@ -31,11 +35,31 @@ def callback():
         return exchange_code_for_token(code)
     return jsonify({'error': 'No code provided'})
 
+def _token_request_body(code):
+    return {'grant_type': 'authorization_code', 'code': code, 'redirect_uri': REDIRECT_URI, 'client_id': CLIENT_ID, 'client_secret': CLIENT_SECRET}
+
 def exchange_code_for_token(code):
-    req_body = {'grant_type': 'authorization_code', 'code': code, 'redirect_uri': REDIRECT_URI, 'client_id': CLIENT_ID, 'client_secret': CLIENT_SECRET}
-    response = requests.post(TOKEN_URL, data=req_body)
+    # Authorization codes are single-use: a retry after a 5xx would be refused even if the first POST succeeded.
+    response = SPOTIFY_LIMITER.send_once(get_session().post, TOKEN_URL, data=_token_request_body(code))
     if response.status_code != 200:
         return jsonify({'error': 'Failed to retrieve tokens', 'details': response.json()})
     token_info = response.json()
     session.update({'access_token': token_info['access_token'], 'refresh_token': token_info['refresh_token'], 'expires_at': datetime.now().timestamp() + token_info['expires_in']})
-    return redirect('/home')
\ No newline at end of file
+    profile = fetch_user_profile(token_info['access_token'])
+    if profile:
+        session['user_id'] = profile['id']
+        TOKENS.remember(profile['id'], session['access_token'], session['refresh_token'], session['expires_at'])
+        # Start computing recommendations while the browser follows the redirect.
+        request_refresh(profile['id'], session['access_token'], session['expires_at'])
+    return redirect('/home')
+
+async def exchange_code_for_token_async(code):
+    """
+    Exchange an authorization code for tokens without blocking the event loop.
+    Returns (session_values, error_details); the ASGI app stores session_values in its own session.
+    """
+    response = await SPOTIFY_LIMITER.send_once_async(get_async_client().post, TOKEN_URL, data=_token_request_body(code))
+    if response.status_code != 200:
+        return None, response.json()
+    token_info = response.json()
+    return {'access_token': token_info['access_token'], 'refresh_token': token_info['refresh_token'], 'expires_at': datetime.now().timestamp() + token_info['expires_in']}, None
@@ -0,0 +1,234 @@
+"""
+A persistent response cache for Spotify metadata.
+
+Entries are keyed by endpoint and ID. Lookups go to an in-process LRU first and then to a
+local SQLite file, so repeat requests within a process cost a dict lookup and requests across
+restarts skip the network. Each endpoint has its own TTL, and both tiers are size-bounded.
+The database is opened on first use, so importing this module creates no files.
+
+This is the only implementation: the graph crawler loads this file as its spotify.cache, so
+the crawler's cache and the web app's share one format. The crawler stores every artist, album
+and track it fetches under 'artist', 'album' and 'track', keyed by Spotify ID, and the feature
+store is built from those entries (recommendation_engine.feature_store.build_from_cache).
+
+Classes:
+    ResponseCache: Two-tier (memory LRU + SQLite) cache with per-endpoint TTLs
+
+Functions:
+    cached: Decorator caching a fetch function's result under an endpoint, keyed by its arguments
+    cached_async: The same for coroutine functions, sharing entries with their sync counterparts
+
+Attributes:
+    SPOTIFY_CACHE: The process-wide cache used by the Spotify API helpers
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+
+DAY = 24 * 60 * 60
+
+# Catalog metadata barely changes; per-user listening data goes stale quickly.
+DEFAULT_TTLS = {
+    'artist': 7 * DAY,
+    'album': 30 * DAY,
+    'track': 30 * DAY,
+    'album_tracks': 30 * DAY,
+    'me/top/tracks': 60 * 60,
+    'me/top/artists': 60 * 60,
+    'recommendations': 10 * 60,
+}
+
+
+####################
+## Response Cache ##
+####################
+
+
+class ResponseCache:
+    def __init__(self, path: str = "data/spotify_cache.sqlite3", ttls: dict = None, default_ttl: int = DAY,
+                 max_memory_items: int = 4096, max_disk_items: int = 500_000):
+        """
+        Args:
+            path: SQLite file backing the cache, or ":memory:" for a process-local store
+            ttls: Seconds to keep entries for each endpoint, overriding DEFAULT_TTLS
+            default_ttl: Seconds to keep entries for endpoints without their own TTL
+            max_memory_items: Entries kept in the in-process LRU
+            max_disk_items: Entries kept on disk; the least recently used are evicted beyond this
+        """
+        self.ttls = {**DEFAULT_TTLS, **(ttls or {})}
+        self.default_ttl = default_ttl
+        self.max_memory_items = max_memory_items
+        self.max_disk_items = max_disk_items
+
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()
+        self._writes = 0
+
+        self.path = path
+        self._db = None
+        self._pid = None
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def __repr__(self) -> str:
+        return f"ResponseCache(memory={len(self._memory)}, hits={self.memory_hits + self.disk_hits}, misses={self.misses})"
+
+    @property
+    def db(self) -> sqlite3.Connection:
+        # Opened on first use, so importing the module touches no files, and reopened after a fork.
+        if self._db is None or self._pid != os.getpid():
+            if self.path != ":memory:" and os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " endpoint TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL,"
+                " expires_at REAL NOT NULL, accessed_at REAL NOT NULL,"
+                " PRIMARY KEY (endpoint, key))"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at)")
+            self._db.commit()
+            self._pid = os.getpid()
+        return self._db
+
+    def stats(self) -> dict:
+        """Return hit/miss counters and the overall hit rate."""
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            total = hits + self.misses
+            return {
+                'memory_hits': self.memory_hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_rate': hits / total if total else 0.0,
+            }
+
+    def get(self, endpoint: str, key: str):
+        """Return the cached value for (endpoint, key), or None if missing or expired."""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get((endpoint, key))
+            if entry is not None and entry[1] > now:
+                self._memory.move_to_end((endpoint, key))
+                self.memory_hits += 1
+                return entry[0]
+
+            row = self.db.execute(
+                "SELECT value, expires_at FROM responses WHERE endpoint = ? AND key = ?", (endpoint, key)
+            ).fetchone()
+            if row is None or row[1] <= now:
+                self._memory.pop((endpoint, key), None)
+                self.misses += 1
+                return None
+
+            value = json.loads(row[0])
+            self.db.execute(
+                "UPDATE responses SET accessed_at = ? WHERE endpoint = ? AND key = ?", (now, endpoint, key)
+            )
+            self.db.commit()
+            self._remember((endpoint, key), value, row[1])
+            self.disk_hits += 1
+            return value
+
+    def set(self, endpoint: str, key: str, value):
+        """Store a JSON-serializable value under (endpoint, key) with the endpoint's TTL."""
+        now = time.time()
+        expires_at = now + self.ttls.get(endpoint, self.default_ttl)
+        with self._lock:
+            self._remember((endpoint, key), value, expires_at)
+            self.db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+                (endpoint, key, json.dumps(value), expires_at, now)
+            )
+            self._writes += 1
+            # Checking the table size on every write would dominate; amortize it.
+            if self._writes % 1000 == 0:
+                self._evict(now)
+            self.db.commit()
+
+    def get_or_fetch(self, endpoint: str, key: str, fetch):
+        """
+        Return the cached value for (endpoint, key), calling fetch() and caching its result on a miss.
+        Empty results (failed fetches) are returned but not cached.
+        """
+        value = self.get(endpoint, key)
+        if value is None:
+            value = fetch()
+            if value:
+                self.set(endpoint, key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self.db.execute("DELETE FROM responses")
+            self.db.commit()
+
+    def _remember(self, cache_key, value, expires_at):
+        self._memory[cache_key] = (value, expires_at)
+        self._memory.move_to_end(cache_key)
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+
+    def _evict(self, now):
+        """Drop expired entries, then the least recently used ones beyond max_disk_items."""
+        self.db.execute("DELETE FROM responses WHERE expires_at <= ?", (now,))
+        count = self.db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        if count > self.max_disk_items:
+            self.db.execute(
+                "DELETE FROM responses WHERE rowid IN "
+                "(SELECT rowid FROM responses ORDER BY accessed_at LIMIT ?)",
+                (count - self.max_disk_items,)
+            )
+
+
+def _call_key(args, kwargs) -> str:
+    return hashlib.sha256(json.dumps([args, kwargs], sort_keys=True, default=str).encode()).hexdigest()
+
+
+def cached(endpoint: str, cache: ResponseCache = None):
+    """
+    Cache a fetch function's result under an endpoint. The key is a hash of the call's
+    arguments, so access tokens passed as arguments are never stored in clear text.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            key = _call_key(args, kwargs)
+            return (cache or SPOTIFY_CACHE).get_or_fetch(endpoint, key, lambda: func(*args, **kwargs))
+        return wrapper
+    return decorator
+
+
+def cached_async(endpoint: str, cache: ResponseCache = None):
+    """
+    Async variant of cached. Keys are computed the same way, so a sync and an async fetch
+    with the same endpoint and arguments share one entry. The cache is SQLite, so lookups
+    and writes run in a thread instead of blocking the event loop.
+    """
+    def decorator(func):
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            store, key = cache or SPOTIFY_CACHE, _call_key(args, kwargs)
+            value = await asyncio.to_thread(store.get, endpoint, key)
+            if value is None:
+                value = await func(*args, **kwargs)
+                if value:
+                    await asyncio.to_thread(store.set, endpoint, key, value)
+            return value
+        return wrapper
+    return decorator
+
+
+SPOTIFY_CACHE = ResponseCache(os.getenv("SPOTIFY_CACHE_PATH", "data/spotify_cache.sqlite3"))
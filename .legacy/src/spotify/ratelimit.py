@@ -0,0 +1,196 @@
+"""
+A shared rate limiter for outbound Spotify calls.
+
+Every caller in the process draws from one token bucket, so concurrent threads and
+coroutines together stay under the configured request budget. A 429 response pauses
+the whole bucket for the Retry-After period rather than only the caller that saw it,
+and retries back off with full jitter.
+
+The graph crawler loads this file directly (src/graph/spotify/shared.py), so it needs nothing
+outside the standard library; httpx is only used when it is installed.
+
+Classes:
+    RateLimiter: Token bucket with Retry-After-aware retries and throttling counters
+
+Attributes:
+    SPOTIFY_LIMITER: The process-wide limiter used by the Spotify API helpers
+"""
+
+import asyncio
+import os
+import random
+import threading
+import time
+
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Errors worth retrying. httpx (used by the async paths) doesn't derive its errors from OSError.
+TRANSIENT_ERRORS = (ConnectionError, TimeoutError, OSError)
+try:
+    import httpx
+    ASYNC_TRANSIENT_ERRORS = TRANSIENT_ERRORS + (httpx.TransportError,)
+except ImportError:
+    ASYNC_TRANSIENT_ERRORS = TRANSIENT_ERRORS
+
+
+##################
+## Rate Limiter ##
+##################
+
+
+class RateLimiter:
+    def __init__(self, rate: float = 10.0, burst: int = 20, max_retries: int = 5,
+                 backoff_base: float = 0.5, backoff_cap: float = 30.0):
+        """
+        Args:
+            rate: Sustained requests per second
+            burst: Maximum requests allowed back to back after an idle period
+            max_retries: Retries per call on 429/5xx before giving up
+            backoff_base: First backoff step in seconds when no Retry-After is sent
+            backoff_cap: Upper bound on a single backoff in seconds
+        """
+        self.rate = rate
+        self.burst = burst
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+
+        self._lock = threading.Lock()
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+
+        self.throttled = 0
+        self.retried = 0
+        self.failed = 0
+
+    def __repr__(self) -> str:
+        return f"RateLimiter(rate={self.rate}, burst={self.burst})"
+
+    def stats(self) -> dict:
+        """Return the throttled/retried/failed counters."""
+        with self._lock:
+            return {'throttled': self.throttled, 'retried': self.retried, 'failed': self.failed}
+
+    def _reserve(self) -> float:
+        """
+        Take one token and return how long the caller must wait before using it.
+        Holding the lock only for bookkeeping keeps this safe for threads and coroutines alike.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            return max(wait, self._blocked_until - now)
+
+    def acquire(self):
+        """Block the calling thread until a request may be sent."""
+        wait = self._reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        """Suspend the calling coroutine until a request may be sent."""
+        wait = self._reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def _backoff(self, response, attempt: int) -> float:
+        """
+        Work out the delay before the next attempt. A 429 blocks every caller for its
+        Retry-After period; otherwise use exponential backoff with full jitter.
+        """
+        retry_after = None
+        if response is not None:
+            try:
+                retry_after = float(response.headers.get('Retry-After'))
+            except (TypeError, ValueError):
+                retry_after = None
+
+        with self._lock:
+            if response is not None and response.status_code == 429:
+                self.throttled += 1
+            self.retried += 1
+            if retry_after is not None:
+                self._blocked_until = max(self._blocked_until, time.monotonic() + retry_after)
+                return retry_after
+
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+
+    def _should_retry(self, response, attempt: int) -> bool:
+        if response is not None and response.status_code not in RETRY_STATUSES:
+            return False
+        if attempt < self.max_retries:
+            return True
+        with self._lock:
+            self.failed += 1
+        return False
+
+    def request(self, send, *args, **kwargs):
+        """
+        Call send(*args, **kwargs) under the rate limit, retrying throttled and failed attempts.
+
+        Args:
+            send: A function returning a response object with status_code and headers (e.g. requests.get)
+
+        Returns:
+            The last response received. Connection errors are re-raised once retries run out.
+        """
+        attempt = 0
+        while True:
+            self.acquire()
+            try:
+                response = send(*args, **kwargs)
+            except TRANSIENT_ERRORS:
+                response = None
+                if not self._should_retry(None, attempt):
+                    raise
+            else:
+                if not self._should_retry(response, attempt):
+                    return response
+            time.sleep(self._backoff(response, attempt))
+            attempt += 1
+
+    async def request_async(self, send, *args, **kwargs):
+        """
+        Await send(*args, **kwargs) under the rate limit, retrying throttled and failed attempts.
+
+        Args:
+            send: A coroutine function returning a response with status_code and headers
+        """
+        attempt = 0
+        while True:
+            await self.acquire_async()
+            try:
+                response = await send(*args, **kwargs)
+            except ASYNC_TRANSIENT_ERRORS:
+                response = None
+                if not self._should_retry(None, attempt):
+                    raise
+            else:
+                if not self._should_retry(response, attempt):
+                    return response
+            await asyncio.sleep(self._backoff(response, attempt))
+            attempt += 1
+
+    def send_once(self, send, *args, **kwargs):
+        """
+        Call send(*args, **kwargs) once under the rate limit, without retrying. For requests
+        that must not be repeated, such as redeeming a single-use authorization code.
+        """
+        self.acquire()
+        return send(*args, **kwargs)
+
+    async def send_once_async(self, send, *args, **kwargs):
+        """Await send(*args, **kwargs) once under the rate limit, without retrying."""
+        await self.acquire_async()
+        return await send(*args, **kwargs)
+
+
+SPOTIFY_LIMITER = RateLimiter(
+    rate=float(os.getenv("SPOTIFY_RATE_LIMIT", "10")),
+    burst=int(os.getenv("SPOTIFY_RATE_BURST", "20")),
+)
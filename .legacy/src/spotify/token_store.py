@@ -0,0 +1,111 @@
+"""
+The SQLite token table shared by every process that talks to Spotify.
+
+Tokens are stored one row per key ('user:<id>', 'client:<client id>'). A row's refresh is
+coalesced across processes with a short lease: the process that takes the lease calls the token
+endpoint, and the others keep using the current token while it is still valid, or wait for the
+new one when it is not. The lease is always released, whatever the refresh does.
+
+This is the only implementation: the web app's TokenManager and the graph crawler's
+SharedClientCredentials (which loads this file directly) both build on it, so it imports nothing
+outside the standard library.
+
+Classes:
+    TokenStore: Token rows and their refresh lease, shared across processes
+"""
+
+import os
+import sqlite3
+import threading
+import time
+
+
+class TokenStore:
+    """
+    Every process opens its own connection, so one path can be shared by the web app, the
+    snapshot workers and the crawler. Refresh tokens are stored in clear text; keep the file private.
+    """
+
+    def __init__(self, path: str, lease: int = 15):
+        """
+        Args:
+            path: SQLite file shared by every process using the tokens
+            lease: Seconds a process may hold a token's refresh before others may take it over
+        """
+        self.path = path
+        self.lease = lease
+        self._lock = threading.Lock()
+        self._db = None
+        self._pid = None
+
+    def __repr__(self) -> str:
+        return f"TokenStore(path={self.path!r})"
+
+    @property
+    def db(self) -> sqlite3.Connection:
+        # Connections can't cross a fork, so each process opens its own on first use.
+        if self._db is None or self._pid != os.getpid():
+            if os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._db = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS tokens ("
+                " key TEXT PRIMARY KEY, access_token TEXT, refresh_token TEXT, expires_at REAL NOT NULL,"
+                " lease_until REAL NOT NULL DEFAULT 0, used_at REAL NOT NULL DEFAULT 0)"
+            )
+            self._pid = os.getpid()
+        return self._db
+
+    def execute(self, sql: str, parameters: tuple = ()) -> list:
+        """Run one statement on this process's connection and return its rows."""
+        with self._lock:
+            return self.db.execute(sql, parameters).fetchall()
+
+    def ensure(self, key: str):
+        """Create an empty, expired row for key if there is none, so it can be leased and refreshed."""
+        self.execute("INSERT INTO tokens (key, expires_at) VALUES (?, 0) ON CONFLICT(key) DO NOTHING", (key,))
+
+    def save(self, key: str, access_token: str, expires_at: float, refresh_token: str = None):
+        """Store a refreshed token. The refresh token is kept unless a new one is given."""
+        self.execute("UPDATE tokens SET access_token = ?, refresh_token = COALESCE(?, refresh_token), "
+                     "expires_at = ? WHERE key = ?", (access_token, refresh_token, expires_at, key))
+
+    def delete(self, key: str):
+        self.execute("DELETE FROM tokens WHERE key = ?", (key,))
+
+    def refresh(self, key: str, refresh_margin: float, request):
+        """
+        Return key's (access_token, expires_at), refreshing it first under the row's lease when it
+        is within refresh_margin of expiry.
+
+        Args:
+            key: Row to refresh
+            refresh_margin: Seconds before expiry at which the token is due
+            request: Called as request(refresh_token, access_token, expires_at) by the process
+                holding the lease; stores the new token (see save) and returns what to hand out
+
+        Returns:
+            tuple: (access_token, expires_at), or whatever request returned; None for an unknown key.
+        """
+        while True:
+            now = time.time()
+            with self._lock:
+                row = self.db.execute("SELECT access_token, refresh_token, expires_at FROM tokens WHERE key = ?",
+                                      (key,)).fetchone()
+                if row is None:
+                    return None
+                access_token, refresh_token, expires_at = row
+                if expires_at - refresh_margin > now:
+                    return access_token, expires_at
+                leased = self.db.execute("UPDATE tokens SET lease_until = ?, used_at = ? WHERE key = ? AND lease_until < ?",
+                                         (now + self.lease, now, key, now)).rowcount == 1
+
+            if leased:
+                try:
+                    return request(refresh_token, access_token, expires_at)
+                finally:
+                    self.execute("UPDATE tokens SET lease_until = 0 WHERE key = ?", (key,))
+            if access_token and expires_at > now:
+                return access_token, expires_at
+            time.sleep(0.1)
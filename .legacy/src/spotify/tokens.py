@@ -0,0 +1,307 @@
+"""
+OAuth token management for Spotify.
+
+Spotify access tokens last an hour. TokenManager keeps each logged-in user's tokens in a local
+SQLite file shared by every web and snapshot worker process, hands out the current access token
+and refreshes it ahead of expiry: on demand once a token is within `refresh_margin` of expiring,
+and from a background thread for recently active users, so requests neither wait on a refresh
+nor send an expired token.
+
+Concurrent refreshes of one token are coalesced into a single request. Threads in a process wait
+on the first caller's result, and processes share the refresh through the row lease of
+spotify.token_store.TokenStore, so only one of them calls the token endpoint.
+
+Classes:
+    TokenManager: Shared user tokens with coalesced, proactive refresh
+
+Functions:
+    session_access_token: Return a session's current access token, refreshing it when near expiry
+    session_access_token_async: Coroutine version for the ASGI app
+
+Attributes:
+    TOKENS: The process-wide token manager
+"""
+
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import Future
+
+from spotify.ratelimit import SPOTIFY_LIMITER, TRANSIENT_ERRORS
+from spotify.token_store import TokenStore
+from utils.http_client import get_session
+
+
+CLIENT_ID = 'bcf292b2fa9f43fe8d6d8b5824231dcc'
+CLIENT_SECRET = os.getenv("SPOTIFY_CLIENT_SECRET")
+TOKEN_URL = os.getenv("SPOTIFY_TOKEN_URL", 'https://accounts.spotify.com/api/token')
+TOKEN_PATH = os.getenv("SPOTIFY_TOKEN_PATH", "data/spotify_tokens.sqlite3")
+
+
+###################
+## Token Manager ##
+###################
+
+
+class TokenManager:
+    """
+    User tokens are stored under 'user:<id>' keys in a TokenStore, which the graph crawler shares
+    for its client-credentials token.
+    """
+
+    def __init__(self, path: str = TOKEN_PATH, refresh_margin: int = 300, lease: int = 15,
+                 active_window: int = 24 * 60 * 60):
+        """
+        Args:
+            refresh_margin: Seconds before expiry at which a token is refreshed
+            lease: Seconds a process may hold a token's refresh before others may take it over
+            active_window: Users seen within this many seconds are refreshed in the background
+        """
+        self.store = TokenStore(path, lease)
+        self.refresh_margin = refresh_margin
+        self.active_window = active_window
+        self._lock = threading.Lock()
+        self._memory = {}
+        self._touched = {}
+        self._inflight = {}
+        self._refresher = None
+        self._refresher_pid = None
+
+        self.refreshes = 0
+        self.coalesced = 0
+        self.failures = 0
+
+    def __repr__(self) -> str:
+        return f"TokenManager(path={self.store.path!r}, refreshes={self.refreshes}, coalesced={self.coalesced})"
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'refreshes': self.refreshes, 'coalesced': self.coalesced, 'failures': self.failures}
+
+    # Tokens
+
+    def remember(self, user_id: str, access_token: str, refresh_token: str, expires_at: float):
+        """Store a user's tokens, e.g. right after the authorization code exchange."""
+        key = f"user:{user_id}"
+        now = time.time()
+        self.store.execute("INSERT INTO tokens VALUES (?, ?, ?, ?, 0, ?) ON CONFLICT(key) DO UPDATE SET "
+                           " access_token = excluded.access_token, refresh_token = excluded.refresh_token,"
+                           " expires_at = excluded.expires_at, used_at = excluded.used_at",
+                           (key, access_token, refresh_token, expires_at, now))
+        with self._lock:
+            self._memory[key] = (access_token, expires_at)
+            self._touched[key] = now
+
+    def forget(self, user_id: str):
+        key = f"user:{user_id}"
+        self.store.delete(key)
+        with self._lock:
+            self._memory.pop(key, None)
+
+    def user_token(self, user_id: str):
+        """
+        Return the user's (access_token, expires_at), refreshing first if the token is near expiry.
+        None if the user is unknown or their refresh token was revoked.
+        """
+        return self._current(f"user:{user_id}")
+
+    async def user_token_async(self, user_id: str):
+        """user_token without blocking the event loop; SQLite reads and writes run in a thread."""
+        key = f"user:{user_id}"
+        token = self._fresh(key, record=False)
+        if token is not None:
+            now = time.time()
+            if self._use_due(key, now):
+                await asyncio.to_thread(self._record_use, key, now)
+            return token
+        return await asyncio.to_thread(self._current, key)
+
+    def refreshable_users(self) -> set:
+        """IDs of the users whose refresh token is held, so a fresh access token can be minted for them."""
+        return {row[0][len("user:"):] for row in self.store.execute(
+            "SELECT key FROM tokens WHERE key LIKE 'user:%' AND refresh_token IS NOT NULL")}
+
+    # Refresh
+
+    def refresh_due(self, horizon: float = 0) -> int:
+        """
+        Refresh every recently used token that will be within refresh_margin of expiry in `horizon`
+        seconds. Returns the number refreshed.
+        """
+        now = time.time()
+        keys = [row[0] for row in self.store.execute(
+            "SELECT key FROM tokens WHERE key LIKE 'user:%' AND refresh_token IS NOT NULL "
+            "AND expires_at - ? < ? AND used_at > ?",
+            (self.refresh_margin, now + horizon, now - self.active_window))]
+        refreshed = 0
+        for key in keys:
+            try:
+                if self._refresh(key) is not None:
+                    refreshed += 1
+            except Exception as e:
+                print(f"Token refresh for {key} failed: {e}")
+        return refreshed
+
+    def start_refresher(self, interval: int = 60) -> threading.Thread:
+        """Refresh due tokens every `interval` seconds from a daemon thread (once per process)."""
+        with self._lock:
+            if self._refresher is not None and self._refresher.is_alive() and self._refresher_pid == os.getpid():
+                return self._refresher
+
+            def run():
+                while True:
+                    time.sleep(interval)
+                    try:
+                        self.refresh_due(horizon=interval)
+                    except Exception as e:
+                        print(f"Token refresher failed: {e}")
+
+            self._refresher = threading.Thread(target=run, name="token-refresher", daemon=True)
+            self._refresher.start()
+            self._refresher_pid = os.getpid()
+            return self._refresher
+
+    def _fresh(self, key: str, record: bool = True):
+        """The in-memory token if it is not yet due for a refresh. With record, the use is stored."""
+        now = time.time()
+        entry = self._memory.get(key)
+        if entry is None or entry[1] - self.refresh_margin <= now:
+            return None
+        if record and self._use_due(key, now):
+            self._record_use(key, now)
+        return entry
+
+    def _use_due(self, key: str, now: float) -> bool:
+        """
+        Whether this use of a token should be written to the store. The background refresher only
+        keeps recently used tokens warm, so a use is stored at most once a minute per token.
+        """
+        with self._lock:
+            if now - self._touched.get(key, 0) <= 60:
+                return False
+            self._touched[key] = now
+            return True
+
+    def _record_use(self, key: str, now: float):
+        self.store.execute("UPDATE tokens SET used_at = ? WHERE key = ?", (now, key))
+
+    def _current(self, key: str):
+        token = self._fresh(key)
+        if token is not None:
+            return token
+        return self._refresh(key)
+
+    def _refresh(self, key: str):
+        """Refresh a token, joining a refresh of the same token already running in this process."""
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+            else:
+                self.coalesced += 1
+        if not leader:
+            return future.result()
+
+        try:
+            token = self.store.refresh(key, self.refresh_margin,
+                                       lambda refresh_token, *current: self._request(key, refresh_token, *current))
+            with self._lock:
+                if token is None:
+                    self._memory.pop(key, None)
+                else:
+                    self._memory[key] = token
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(token)
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+        return token
+
+    def _request(self, key: str, refresh_token: str, access_token: str, expires_at: float):
+        """Call the token endpoint while holding the row's lease and store the result."""
+        data = {'grant_type': 'refresh_token', 'refresh_token': refresh_token,
+                'client_id': CLIENT_ID, 'client_secret': CLIENT_SECRET}
+
+        try:
+            response = SPOTIFY_LIMITER.request(get_session().post, TOKEN_URL, data=data)
+        except TRANSIENT_ERRORS as e:
+            response, error = None, str(e)
+        else:
+            error = None if response.status_code == 200 else f"{response.status_code} {response.text[:200]}"
+
+        if error is None:
+            token_info = response.json()
+            access_token = token_info['access_token']
+            expires_at = time.time() + token_info['expires_in']
+            # Spotify only sometimes rotates the refresh token.
+            self.store.save(key, access_token, expires_at, token_info.get('refresh_token'))
+            with self._lock:
+                self.refreshes += 1
+            return access_token, expires_at
+
+        with self._lock:
+            self.failures += 1
+        print(f"Token refresh for {key} failed: {error}")
+        if response is not None and response.status_code in (400, 401):
+            # The grant was revoked or is invalid; the user has to log in again.
+            self.store.delete(key)
+            return None
+        # A transient failure: keep serving the old token until it actually expires.
+        if access_token and expires_at > time.time():
+            return access_token, expires_at
+        return None
+
+
+TOKENS = TokenManager()
+
+
+def session_access_token(session):
+    """
+    Return the logged-in user's current access token from a Flask or Quart session, refreshing it
+    through TOKENS when near expiry and writing the new one back. None when logged out or expired;
+    the session's tokens are then cleared, so a revoked refresh token is not offered again.
+    """
+    user_id = session.get('user_id')
+    if user_id:
+        token = TOKENS.user_token(user_id)
+        if token is None and session.get('refresh_token'):
+            # Logged in before the token manager knew this user.
+            TOKENS.remember(user_id, session.get('access_token'), session['refresh_token'], session.get('expires_at', 0))
+            token = TOKENS.user_token(user_id)
+        return _update_session(session, token)
+    return _session_fallback(session)
+
+
+async def session_access_token_async(session):
+    """session_access_token for the ASGI app."""
+    user_id = session.get('user_id')
+    if user_id:
+        token = await TOKENS.user_token_async(user_id)
+        if token is None and session.get('refresh_token'):
+            await asyncio.to_thread(TOKENS.remember, user_id, session.get('access_token'), session['refresh_token'],
+                                    session.get('expires_at', 0))
+            token = await TOKENS.user_token_async(user_id)
+        return _update_session(session, token)
+    return _session_fallback(session)
+
+
+def _update_session(session, token):
+    if token is None:
+        for name in ('access_token', 'refresh_token', 'expires_at'):
+            session.pop(name, None)
+        return None
+    if session.get('access_token') != token[0]:
+        session['access_token'], session['expires_at'] = token
+    return token[0]
+
+
+def _session_fallback(session):
+    # Without a user ID there is nothing to refresh under; use the session's token while it lasts.
+    if session.get('access_token') and session.get('expires_at', 0) > time.time():
+        return session['access_token']
+    return None
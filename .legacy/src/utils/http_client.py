@@ -0,0 +1,103 @@
+"""
+Shared HTTP clients for outbound Spotify and scraping calls.
+
+Module-level requests.get/post open a new connection (and TLS handshake) for every call.
+The clients here are created once per process and keep connections alive in sized pools,
+with default timeouts and compressed responses.
+
+Functions:
+    get_session: Return the process-wide pooled requests.Session
+    get_async_client: Return the pooled httpx.AsyncClient for the running event loop
+    close_async_client: Close the async client for the running event loop
+"""
+
+import asyncio
+import os
+import threading
+import weakref
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+POOL_CONNECTIONS = int(os.getenv("HTTP_POOL_CONNECTIONS", "16"))
+POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "64"))
+TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "10"))
+DEFAULT_HEADERS = {'Accept-Encoding': 'gzip, deflate', 'User-Agent': 'XAI-MRS'}
+
+
+#################
+## Sync Client ##
+#################
+
+
+class PooledSession(requests.Session):
+    """A requests.Session with sized keep-alive pools and a default timeout."""
+
+    def __init__(self, pool_connections: int = POOL_CONNECTIONS, pool_maxsize: int = POOL_MAXSIZE,
+                 timeout: float = TIMEOUT):
+        super().__init__()
+        self.timeout = timeout
+        self.headers.update(DEFAULT_HEADERS)
+        adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+        self.mount('https://', adapter)
+        self.mount('http://', adapter)
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        return super().request(method, url, **kwargs)
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> PooledSession:
+    """Return the process-wide pooled session, creating it on first use."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = PooledSession()
+    return _session
+
+
+##################
+## Async Client ##
+##################
+
+
+# httpx clients are bound to the event loop that created them, so keep one per loop. Entries go
+# away with their loop, and are dropped once it closes in case the client keeps the loop alive.
+_async_clients = weakref.WeakKeyDictionary()
+_async_clients_lock = threading.Lock()
+
+
+def get_async_client():
+    """
+    Return the pooled httpx.AsyncClient for the running event loop, creating it on first use.
+    httpx is only needed by the async code paths, so it is imported lazily.
+    """
+    import httpx
+
+    loop = asyncio.get_running_loop()
+    with _async_clients_lock:
+        client = _async_clients.get(loop)
+        if client is None or client.is_closed:
+            for closed in [other for other in _async_clients if other.is_closed()]:
+                del _async_clients[closed]
+            client = httpx.AsyncClient(
+                headers=DEFAULT_HEADERS,
+                timeout=TIMEOUT,
+                limits=httpx.Limits(max_connections=POOL_MAXSIZE, max_keepalive_connections=POOL_CONNECTIONS),
+            )
+            _async_clients[loop] = client
+    return client
+
+
+async def close_async_client():
+    """Close the async client for the running event loop, if one was created."""
+    with _async_clients_lock:
+        client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
@@ -6,19 +6,39 @@ The LLM class provides a wrapper for the Ollama class from the langchain_communi
 Classes:
     ParserError: Custom exception for parser errors
     XRecommendations: Parser class for parsing LLM string output to JSON
+    IncrementalRecommendationParser: Parses recommendation objects out of a streamed JSON response
+    LLMResponseCache: Persistent cache of LLM outputs keyed on model, system prompt and input
     LLM: A wrapper class for the LLM
     RecommendationLLM: A wrapper class for the LLM for music recommendations
     ExplanationLLM: A wrapper class for the LLM for explaining music recommendations
+    SinglePassLLM: A wrapper class for the LLM that recommends and explains in one structured call
+    KnowledgeLLM: A wrapper class for the LLM for converting scraped posts into knowledge notes
+
+Functions:
+    get_llm: Return the shared instance of an LLM wrapper class, building it on first use
+    warm_up: Build the LLM wrappers used by the recommender ahead of the first request
 """
 
 from langchain_community.llms import Ollama
 from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.exceptions import OutputParserException
 from langchain_core.output_parsers import StrOutputParser
 from langchain.output_parsers import PydanticOutputParser
 from langchain_core.pydantic_v1 import BaseModel, Field, validator
 from langchain_core.prompts import MessagesPlaceholder
 from collections import namedtuple
 from datetime import datetime
+from functools import lru_cache
+import asyncio
+import hashlib
+import inspect
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from utils.llm_scheduler import BACKGROUND, LLM_SCHEDULER
 
 
 ###################
@@ -33,12 +53,27 @@ class ParserError(Exception):
 def validate_response_format(func):
     """
     This decorator handles parser errors and raises a custom exception if the parser fails.
+    Any other error is raised unchanged.
     """
+    def is_format_error(e):
+        return isinstance(e, OutputParserException) or "Input to ChatPromptTemplate is missing variables" in str(e)
+
+    if inspect.iscoroutinefunction(func):
+        async def async_wrapper(self, *args, **kwargs):
+            try:
+                return await func(self, *args, **kwargs)
+            except Exception as e:
+                if is_format_error(e):
+                    raise ParserError(f"Response is not in the expected JSON format: {e}")
+                else:
+                    raise
+        return async_wrapper
+
     def wrapper(self, *args, **kwargs):
         try:
             return func(self, *args, **kwargs)
         except Exception as e:
-            if "Input to ChatPromptTemplate is missing variables" in str(e):
+            if is_format_error(e):
                 raise ParserError(f"Response is not in the expected JSON format: {e}")
             else:
                 raise
@@ -56,16 +91,265 @@ class XRecommendations(BaseModel):
     recommendations: list[Recommendation] = Field(..., title="Recommendations", 
                                                   description="List of songs with artists and reasons.")
 
+    @validator("recommendations", pre=True, each_item=True)
+    def _from_object(cls, value):
+        # The prompts ask for {"song", "artist", "explanation"} objects; the tuple type only takes arrays.
+        if isinstance(value, dict):
+            return tuple(value.get(field) for field in cls.Recommendation._fields)
+        return value
+
+
+class IncrementalRecommendationParser:
+    """
+    Parses a streamed XRecommendations JSON response as it arrives.
+
+    feed() returns every element of the first JSON array whose closing brace has been seen, so
+    each recommendation is available as soon as the model finishes writing it, long before the
+    whole document is complete. Text outside the array (preambles, code fences, trailing
+    remarks) is ignored.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self._pos = 0
+        self._in_array = False
+        self._closed = False
+        self._depth = 0
+        self._start = None
+        self._in_string = False
+        self._escaped = False
+
+    def feed(self, chunk: str) -> list:
+        """Add a chunk of streamed text and return the recommendations it completed."""
+        self.text += chunk
+        completed = []
+        while self._pos < len(self.text) and not self._closed:
+            char = self.text[self._pos]
+            if self._in_string:
+                if self._escaped: self._escaped = False
+                elif char == '\\': self._escaped = True
+                elif char == '"': self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif not self._in_array:
+                self._in_array = char == '['
+            elif char == ']' and self._depth == 0:
+                # Only the first array holds recommendations; braces after it are not elements.
+                self._in_array = False
+                self._closed = True
+            elif char == '{':
+                if self._depth == 0: self._start = self._pos
+                self._depth += 1
+            elif char == '}' and self._depth:
+                self._depth -= 1
+                if self._depth == 0:
+                    try:
+                        completed.append(json.loads(self.text[self._start:self._pos + 1]))
+                    except json.JSONDecodeError:
+                        pass
+            self._pos += 1
+        return completed
+
+    def result(self) -> XRecommendations:
+        """Parse the complete response. Raises ParserError if it is not valid XRecommendations JSON."""
+        start, end = self.text.find('{'), self.text.rfind('}')
+        try:
+            return XRecommendations.parse_raw(self.text[start:end + 1])
+        except Exception as e:
+            raise ParserError(f"Response is not in the expected JSON format: {e}")
+
+
+########################
+## LLM Response Cache ##
+########################
+
+
+def _canonical(value) -> str:
+    """
+    Serialize a structured input so equal inputs give equal strings: dict keys are sorted
+    and list order is ignored, since reordering tracks or candidates doesn't change the task.
+    """
+    if isinstance(value, dict):
+        return "{" + ",".join(f"{json.dumps(str(k))}:{_canonical(v)}" for k, v in sorted(value.items())) + "}"
+    if isinstance(value, (list, tuple, set)):
+        return "[" + ",".join(sorted(_canonical(v) for v in value)) + "]"
+    return json.dumps(value, sort_keys=True, default=str)
+
+
+def _digest(*parts) -> str:
+    return hashlib.sha256("\x1f".join(parts).encode()).hexdigest()
+
+
+class LLMResponseCache:
+    """
+    Persistent cache of LLM outputs in SQLite.
+
+    Exact lookups are keyed on a hash of the model name, system prompt and canonicalized input.
+    With near_duplicate_threshold set, a miss falls back to entries whose input matches in every
+    field except the candidate pool, reusing the best one whose candidate set overlaps by at least
+    the threshold (Jaccard similarity). The database is opened on first use in each process.
+    """
+
+    def __init__(self, path: str = "data/llm_cache.sqlite3", ttl: int = 24 * 60 * 60, max_items: int = 10_000,
+                 near_duplicate_threshold: float = None, candidates_field: str = "Candidate Pool"):
+        self.ttl = ttl
+        self.max_items = max_items
+        self.near_duplicate_threshold = near_duplicate_threshold
+        self.candidates_field = candidates_field
+
+        self._lock = threading.Lock()
+        self._writes = 0
+
+        self.path = path
+        self._db = None
+        self._pid = None
+
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self.latency_saved = 0.0
+
+    def __repr__(self) -> str:
+        return f"LLMResponseCache(hits={self.hits}, near_hits={self.near_hits}, misses={self.misses})"
+
+    @property
+    def db(self) -> sqlite3.Connection:
+        # Opened on first use, so importing the module touches no files, and reopened after a fork.
+        if self._db is None or self._pid != os.getpid():
+            if self.path != ":memory:" and os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " key TEXT PRIMARY KEY, profile_key TEXT NOT NULL, candidates TEXT NOT NULL,"
+                " response TEXT NOT NULL, latency REAL NOT NULL,"
+                " expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS responses_profile ON responses (profile_key)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at)")
+            self._db.commit()
+            self._pid = os.getpid()
+        return self._db
+
+    def stats(self) -> dict:
+        """Return hit/miss counters, hit rate and the generation time saved in seconds."""
+        with self._lock:
+            total = self.hits + self.near_hits + self.misses
+            return {
+                'hits': self.hits,
+                'near_hits': self.near_hits,
+                'misses': self.misses,
+                'hit_rate': (self.hits + self.near_hits) / total if total else 0.0,
+                'latency_saved': self.latency_saved,
+            }
+
+    def _keys(self, model: str, system_prompt: str, payload):
+        """Return (exact key, profile key, candidate set) for an input."""
+        if isinstance(payload, dict) and self.candidates_field in payload:
+            candidates = {_canonical(c) for c in payload[self.candidates_field]}
+            profile = {k: v for k, v in payload.items() if k != self.candidates_field}
+        else:
+            candidates, profile = set(), payload
+        key = _digest(model, system_prompt, _canonical(payload))
+        profile_key = _digest(model, system_prompt, _canonical(profile))
+        return key, profile_key, candidates
+
+    def get(self, model: str, system_prompt: str, payload):
+        """Return the cached response text for an input, or None on a miss."""
+        key, profile_key, candidates = self._keys(model, system_prompt, payload)
+        now = time.time()
+        with self._lock:
+            row = self.db.execute(
+                "SELECT key, response, latency FROM responses WHERE key = ? AND expires_at > ?", (key, now)
+            ).fetchone()
+            if row is not None:
+                self.hits += 1
+            elif self.near_duplicate_threshold and candidates:
+                row = self._nearest(profile_key, candidates, now)
+                if row is not None:
+                    self.near_hits += 1
+
+            if row is None:
+                self.misses += 1
+                return None
+
+            self.latency_saved += row[2]
+            self.db.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, row[0]))
+            self.db.commit()
+            return row[1]
+
+    def _nearest(self, profile_key: str, candidates: set, now: float):
+        best, best_score = None, self.near_duplicate_threshold
+        rows = self.db.execute(
+            "SELECT key, response, latency, candidates FROM responses WHERE profile_key = ? AND expires_at > ?",
+            (profile_key, now)
+        )
+        for key, response, latency, stored in rows:
+            stored = set(json.loads(stored))
+            union = len(candidates | stored)
+            score = len(candidates & stored) / union if union else 0.0
+            if score >= best_score:
+                best, best_score = (key, response, latency), score
+        return best
+
+    def put(self, model: str, system_prompt: str, payload, response: str, latency: float):
+        """Store the response text for an input along with how long it took to generate."""
+        key, profile_key, candidates = self._keys(model, system_prompt, payload)
+        now = time.time()
+        with self._lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, profile_key, json.dumps(sorted(candidates)), response, latency, now + self.ttl, now)
+            )
+            self._writes += 1
+            if self._writes % 100 == 0:
+                self._evict(now)
+            self.db.commit()
+
+    def _evict(self, now: float):
+        """Drop expired entries, then the least recently used ones beyond max_items."""
+        self.db.execute("DELETE FROM responses WHERE expires_at <= ?", (now,))
+        count = self.db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        if count > self.max_items:
+            self.db.execute(
+                "DELETE FROM responses WHERE key IN "
+                "(SELECT key FROM responses ORDER BY accessed_at LIMIT ?)",
+                (count - self.max_items,)
+            )
+
+
+LLM_CACHE = LLMResponseCache(
+    os.getenv("LLM_CACHE_PATH", "data/llm_cache.sqlite3"),
+    ttl=int(os.getenv("LLM_CACHE_TTL", str(24 * 60 * 60))),
+    near_duplicate_threshold=float(os.getenv("LLM_CACHE_NEAR_DUPLICATE", "0")) or None,
+)
+
 
 #########################
 ## LLM Wrapper Classes ##
 #########################
 
+
+# Overridable so load tests can point the wrappers at a local stub.
+OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+
+
+@lru_cache(maxsize=None)
+def read_prompt(path: str) -> str:
+    """
+    Read a system prompt file once per process.
+    """
+    with open(path, "r") as f:
+        return f.read().strip()
+
+
 class LLM():
-    def __init__(self, model_type: str = "llama3", debug: bool = True):
+    def __init__(self, model_type: str = "llama3", debug: bool = True, cache: LLMResponseCache = LLM_CACHE):
         self.debug = debug
+        self.cache = cache
         try:
-            self.llm = Ollama(model = model_type)
+            self.llm = Ollama(model = model_type, base_url = OLLAMA_BASE_URL)
             if self.debug: self._debug(f"Initialized {self.__class__.__name__} with model: {self.llm.model}")
         
         except Exception as e:
@@ -73,6 +357,7 @@ class LLM():
         
         self.output_parser = StrOutputParser()
         self.system_prompt = ""
+        self._build_chain()
     
     def __repr__(self) -> str:
         return f"LLM(model={self.llm.model})"
@@ -81,13 +366,26 @@ class LLM():
         return f"LLM(model={self.llm.model})"
     
     def __call__(self, prompt: str) -> str:
-        return self._query(prompt)
+        return self._cached_query(prompt)
+
+    def stream(self, prompt: str):
+        """
+        Query the LLM model and yield the response text token by token.
+        """
+        return self._cached_stream(prompt)
+
+    async def ainvoke(self, prompt: str) -> str:
+        """
+        Async variant of __call__: awaits the generation instead of blocking the calling thread.
+        """
+        return await self._acached_query(prompt)
 
     def _set_system_prompt(self, system_prompt: str):
         """
         Set the system prompt for the LLM model.
         """
         self.system_prompt = system_prompt
+        self._build_chain()
         if self.debug: 
             self._debug(f"Setting system prompt:\n{self._indent(system_prompt, 2)}")
 
@@ -96,31 +394,178 @@ class LLM():
         Set the output parser for the LLM model.
         """
         self.output_parser = output_parser
+        self._build_chain()
         if self.debug: 
             self._debug(f"Setting output parser:\n{self._indent(output_parser, 2)}")
+
+    def _build_chain(self):
+        """
+        Compile the prompt template and chain once. Chains hold no per-call state, so the
+        compiled chain is shared by every query, including concurrent ones.
+        """
+        template = ChatPromptTemplate.from_messages([
+            ("system", self.system_prompt),
+            ("user", "{input}")
+        ])
+        self.chain = template | self.llm | self.output_parser
+        # Structured parsers only emit once the generation is complete, so streaming uses raw text.
+        self.stream_chain = template | self.llm | StrOutputParser()
     
     def _query(self, prompt: str) -> str:
         """
-        Query the LLM model with a given prompt.
+        Query the LLM model with a given prompt. Errors are returned as "Error: ..." text.
         """
+        try:
+            return self._generate(prompt)
+        
+        except Exception as e:
+            self._debug(f"Error querying LLM:\n{self._indent(str(e), 2)}")
+            return f"Error: {e}"
 
+    def _generate(self, prompt: str):
+        """
+        Run the chain on a prompt, raising whatever it raises. The call goes through the shared
+        scheduler, which caps concurrent generations and batches prompts queued for the same chain.
+        """
         if self.debug: 
             self._debug(f"Querying LLM with User Prompt:\n{self._indent(str(prompt), 2)}")
 
+        result = LLM_SCHEDULER.invoke(self.chain, {"input": prompt})
+        if self.debug: self._debug(f"Query result:\n{self._indent(str(result), 2)}")
+        return result
+    
+    def _cached_query(self, prompt: str, payload = None):
+        """
+        Query the LLM model through the response cache. The cache key uses the structured
+        payload when one is given, otherwise the prompt text. Error results are not cached.
+        """
+        if self.cache is None:
+            return self._query(prompt)
+
+        if payload is None: payload = {"input": prompt}
+        cached = self.cache.get(self.llm.model, self.system_prompt, payload)
+        if cached is not None:
+            if self.debug: self._debug("Serving cached response")
+            return self._deserialize(cached)
+
+        start = time.perf_counter()
+        result = self._query(prompt)
+        if not (isinstance(result, str) and result.startswith("Error:")):
+            self.cache.put(self.llm.model, self.system_prompt, payload,
+                           self._serialize(result), time.perf_counter() - start)
+        return result
+
+    async def _aquery(self, prompt: str) -> str:
+        """
+        Async variant of _query, awaiting the scheduler instead of blocking on it.
+        """
         try:
-            prompt = ChatPromptTemplate.from_messages([
-                ("system", self.system_prompt),
-                ("user", "{input}")
-            ])
-            chain = prompt | self.llm | self.output_parser
-            result = chain.invoke({"input": prompt})
-            if self.debug: self._debug(f"Query result:\n{self._indent(str(result), 2)}")
-            return result
-        
+            return await self._agenerate(prompt)
+
         except Exception as e:
             self._debug(f"Error querying LLM:\n{self._indent(str(e), 2)}")
             return f"Error: {e}"
-    
+
+    async def _agenerate(self, prompt: str):
+        """
+        Async variant of _generate.
+        """
+        if self.debug: 
+            self._debug(f"Querying LLM with User Prompt:\n{self._indent(str(prompt), 2)}")
+
+        result = await LLM_SCHEDULER.ainvoke(self.chain, {"input": prompt})
+        if self.debug: self._debug(f"Query result:\n{self._indent(str(result), 2)}")
+        return result
+
+    async def _acached_query(self, prompt: str, payload = None):
+        """
+        Async variant of _cached_query. The cache is SQLite, so lookups and writes run in a thread
+        rather than on the event loop.
+        """
+        if self.cache is None:
+            return await self._aquery(prompt)
+
+        if payload is None: payload = {"input": prompt}
+        cached = await asyncio.to_thread(self.cache.get, self.llm.model, self.system_prompt, payload)
+        if cached is not None:
+            if self.debug: self._debug("Serving cached response")
+            return self._deserialize(cached)
+
+        start = time.perf_counter()
+        result = await self._aquery(prompt)
+        if not (isinstance(result, str) and result.startswith("Error:")):
+            await asyncio.to_thread(self.cache.put, self.llm.model, self.system_prompt, payload,
+                                    self._serialize(result), time.perf_counter() - start)
+        return result
+
+    def _stream(self, prompt: str):
+        """
+        Query the LLM model with a given prompt, yielding text chunks as they are generated.
+        The stream holds one scheduler slot until it finishes.
+        """
+        if self.debug: 
+            self._debug(f"Streaming LLM with User Prompt:\n{self._indent(str(prompt), 2)}")
+
+        with LLM_SCHEDULER.slot():
+            for chunk in self.stream_chain.stream({"input": prompt}):
+                yield chunk
+
+    def _cached_stream(self, prompt: str, payload = None):
+        """
+        Stream the LLM model's response through the response cache. A cached response is
+        yielded as a single chunk; a fresh one is cached once the generation completes and,
+        for structured wrappers, parses. Raw text is cached under the stream chain's own key,
+        separate from parsed results.
+        """
+        if payload is None: payload = {"input": prompt}
+        payload = {"stream": True, "payload": payload}
+        if self.cache is not None:
+            cached = self.cache.get(self.llm.model, self.system_prompt, payload)
+            if cached is not None:
+                yield cached
+                return
+
+        start = time.perf_counter()
+        chunks = []
+        for chunk in self._stream(prompt):
+            chunks.append(chunk)
+            yield chunk
+        text = "".join(chunks)
+        if self.cache is not None and self._parses(text):
+            self.cache.put(self.llm.model, self.system_prompt, payload, text, time.perf_counter() - start)
+
+    def _parses(self, text: str) -> bool:
+        """
+        Whether streamed text is a valid response for this wrapper's output parser, so a
+        malformed generation is not cached and replayed to every later request.
+        """
+        try:
+            self.output_parser.parse(text)
+            return True
+        except Exception:
+            return False
+
+    def _with_context(self, prompt: str, context: list = None) -> str:
+        """
+        Prepend retrieved snippets (reviews, community discussion) to the prompt.
+        """
+        if not context:
+            return prompt
+        snippets = "\n".join(f"- {snippet}" for snippet in context)
+        return f"Background knowledge about these artists and songs:\n{snippets}\n\n{prompt}"
+
+    def _serialize(self, result) -> str:
+        """
+        Convert a query result to the text stored in the response cache.
+        """
+        return result
+
+    def _deserialize(self, text: str):
+        """
+        Convert text from the response cache back into a query result.
+        """
+        return text
+
     def _debug(self, message):
         """
         Print debug messages to terminal if debug is enabled.
@@ -140,19 +585,42 @@ class LLM():
 
 
 class RecommendationLLM(LLM):
+    instruction = (
+        "Based on the provided information, please recommend 7 songs from the candidate pool, ensuring a balance of variety and alignment with the user's preferences. "
+        "Explain your selection process step-by-step."
+    )
+
     def __init__(self, model: str = "llama3", debug: bool = True):
         super().__init__(model, debug)
 
-        with open("src/utils/prompts/recommendation_prompt.txt", "r") as f: 
-            system_prompt = f.read().strip() 
-        
-        self._set_system_prompt(system_prompt)
+        self._set_system_prompt(read_prompt("src/utils/prompts/recommendation_prompt.txt"))
     
 
     def __call__(self, top_tracks: str = None, top_artists: str = None, candidate_pool: str = None) -> str:
         """
         Combine multiple inputs into a single prompt and query the LLM model.
         """
+        prompt, data = self._build_prompt(top_tracks, top_artists, candidate_pool)
+        return self._cached_query(prompt, data)
+
+    async def ainvoke(self, top_tracks: str = None, top_artists: str = None, candidate_pool: str = None) -> str:
+        """
+        Async variant of __call__.
+        """
+        prompt, data = self._build_prompt(top_tracks, top_artists, candidate_pool)
+        return await self._acached_query(prompt, data)
+
+    def stream(self, top_tracks: str = None, top_artists: str = None, candidate_pool: str = None):
+        """
+        Combine multiple inputs into a single prompt and yield the response token by token.
+        """
+        prompt, data = self._build_prompt(top_tracks, top_artists, candidate_pool)
+        return self._cached_stream(prompt, data)
+
+    def _build_prompt(self, top_tracks = None, top_artists = None, candidate_pool = None):
+        """
+        Build the user prompt and its structured input (used as the cache key).
+        """
         if top_tracks is None: top_tracks = []
         if top_artists is None: top_artists = []
         if candidate_pool is None: candidate_pool = []
@@ -165,14 +633,19 @@ class RecommendationLLM(LLM):
 
         prompt = (
             f"User Preferences:\n"
-            f"Top Tracks: {data['Top Tracks']}\n"
-            f"Top Artists: {data['Top Artists']}\n"
-            f"Candidate Pool: {data['Candidate Pool']}\n"
-            f"Based on the provided information, please recommend 7 songs from the candidate pool, ensuring a balance of variety and alignment with the user's preferences. "
-            f"Explain your selection process step-by-step."
+            f"Top Tracks: {self._compact(data['Top Tracks'])}\n"
+            f"Top Artists: {self._compact(data['Top Artists'])}\n"
+            f"Candidate Pool: {self._compact(data['Candidate Pool'])}\n"
+            f"{self.instruction}"
         )
 
-        return self._query(prompt)
+        return prompt, data
+
+    def _compact(self, items: list) -> str:
+        """
+        Serialize a list of tracks or artists as JSON without whitespace to keep the prompt short.
+        """
+        return json.dumps(items, ensure_ascii=False, separators=(',', ':'))
 
 class ExplanationLLM(LLM):
     def __init__(self, model: str = "llama3", debug: bool = True):
@@ -180,12 +653,26 @@ class ExplanationLLM(LLM):
 
         self._set_output_parser(PydanticOutputParser(pydantic_object = XRecommendations))
         
-        with open("src/utils/prompts/explanation_prompt.txt", "r") as f:
-            system_prompt = f.read().strip()  
+        self._set_system_prompt(read_prompt("src/utils/prompts/explanation_prompt.txt"))
+
+    def __call__(self, prompt: str, context: list = None):
+        """
+        Explain the recommendations in prompt, optionally grounded in retrieved knowledge snippets.
+        """
+        return self._cached_query(self._with_context(prompt, context))
+
+    async def ainvoke(self, prompt: str, context: list = None):
+        """
+        Async variant of __call__.
+        """
+        return await self._acached_query(self._with_context(prompt, context))
+
+    def stream(self, prompt: str, context: list = None):
+        """
+        Streaming variant of __call__, yielding the raw response text token by token.
+        """
+        return self._cached_stream(self._with_context(prompt, context))
 
-        self._set_system_prompt(system_prompt)
-        
-    
     @validate_response_format
     def _query(self, prompt: str) -> str:
         """
@@ -193,7 +680,134 @@ class ExplanationLLM(LLM):
         """
 
         return super()._query(prompt)
-        
+
+    @validate_response_format
+    async def _aquery(self, prompt: str) -> str:
+        return await super()._aquery(prompt)
+
+    def _serialize(self, result) -> str:
+        return result.json()
+
+    def _deserialize(self, text: str):
+        return XRecommendations.parse_raw(text)
+
+
+class SinglePassLLM(RecommendationLLM):
+    """
+    Selects and explains recommendations in one call that answers directly in the
+    XRecommendations schema, instead of feeding free-text reasoning into a second generation.
+    """
+    instruction = (
+        "Based on the provided information, please recommend 7 songs from the candidate pool, ensuring a balance of variety and alignment with the user's preferences. "
+        "Respond only with the JSON object described in your instructions."
+    )
+
+    def __init__(self, model: str = "llama3", debug: bool = True):
+        LLM.__init__(self, model, debug)
+
+        self._set_output_parser(PydanticOutputParser(pydantic_object = XRecommendations))
+
+        self._set_system_prompt(read_prompt("src/utils/prompts/single_pass_prompt.txt"))
+
+    def __call__(self, top_tracks: str = None, top_artists: str = None, candidate_pool: str = None,
+                 context: list = None):
+        """
+        Recommend and explain in one call, optionally grounded in retrieved knowledge snippets.
+        Raises ParserError when the response is not valid XRecommendations JSON.
+        """
+        prompt, data = self._build_prompt(top_tracks, top_artists, candidate_pool)
+        # Snippets are retrieved for the candidate pool, which is already part of the cache key.
+        return self._cached_query(self._with_context(prompt, context), data)
+
+    async def ainvoke(self, top_tracks: str = None, top_artists: str = None, candidate_pool: str = None,
+                      context: list = None):
+        """
+        Async variant of __call__.
+        """
+        prompt, data = self._build_prompt(top_tracks, top_artists, candidate_pool)
+        return await self._acached_query(self._with_context(prompt, context), data)
+
+    def stream(self, top_tracks: str = None, top_artists: str = None, candidate_pool: str = None,
+               context: list = None):
+        """
+        Streaming variant of __call__, yielding the raw response text token by token.
+        """
+        prompt, data = self._build_prompt(top_tracks, top_artists, candidate_pool)
+        return self._cached_stream(self._with_context(prompt, context), data)
+
+    @validate_response_format
+    def _query(self, prompt: str) -> str:
+        """
+        Query the LLM model with a given prompt. Unlike the other wrappers, errors are raised
+        rather than returned as text: a response that doesn't parse raises ParserError, so the
+        caller can fall back to two stages, and a failed call raises its own error.
+        """
+
+        return self._generate(prompt)
+
+    @validate_response_format
+    async def _aquery(self, prompt: str) -> str:
+        return await self._agenerate(prompt)
+
+    def _serialize(self, result) -> str:
+        return result.json()
+
+    def _deserialize(self, text: str):
+        return XRecommendations.parse_raw(text)
+
+
+class KnowledgeLLM(LLM):
+    """
+    Rewrites a batch of scraped posts as plain-text knowledge notes for the RAG index.
+    Used by offline ingestion, so its calls run at background priority.
+    """
+
+    def __init__(self, model: str = "llama3", debug: bool = True):
+        super().__init__(model, debug)
+
+        self._set_system_prompt(read_prompt("src/utils/prompts/knowledge_prompt.txt"))
+
+    def _query(self, prompt: str) -> str:
+        with LLM_SCHEDULER.priority(BACKGROUND):
+            return super()._query(prompt)
+
+
+##################
+## LLM Registry ##
+##################
+
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+def get_llm(cls: type = LLM, model: str = "llama3", debug: bool = True) -> LLM:
+    """
+    Return the process-wide instance of an LLM wrapper class for a model, building it on first use.
+    Wrappers only hold their client and compiled chain, so one instance safely serves
+    concurrent requests.
+    """
+    key = (cls, model, debug)
+    llm = _registry.get(key)
+    if llm is None:
+        with _registry_lock:
+            llm = _registry.get(key)
+            if llm is None:
+                llm = cls(model, debug)
+                _registry[key] = llm
+    return llm
+
+
+def warm_up(model: str = "llama3", debug: bool = True, ping: bool = False):
+    """
+    Build the recommendation and explanation wrappers before the first request.
+    With ping=True, also send a short query so the model server loads the weights.
+    """
+    llms = [get_llm(RecommendationLLM, model, debug), get_llm(ExplanationLLM, model, debug)]
+    if ping:
+        llms[0].llm.invoke("Reply with OK.")
+    return llms
+
 
 # test = RecommendationLLM()
 # test._set_system_prompt("You are a music recommender and curator")
@@ -0,0 +1,275 @@
+"""
+A scheduler in front of the LLM backend.
+
+Flask requests hand their generations to a small pool of scheduler workers instead of calling
+the model directly. This caps how many generations are in flight against the local model server,
+queues the rest in priority order (interactive page loads before background jobs) with a bounded
+queue and per-call timeouts. For backends that really batch, queued prompts for the same chain
+can be coalesced into one batched call; Ollama runs a chain.batch() one prompt after another,
+so by default every prompt runs, and counts against max_in_flight, on its own.
+
+Classes:
+    SchedulerFull: Raised when the queue is at capacity
+    LLMScheduler: Priority queue, in-flight cap, batching and metrics for LLM calls
+
+Attributes:
+    INTERACTIVE, BACKGROUND: Priorities, lower runs first
+    LLM_SCHEDULER: The process-wide scheduler used by the LLM wrappers
+"""
+
+from concurrent.futures import Future, InvalidStateError, TimeoutError as FutureTimeoutError
+import asyncio
+from contextlib import contextmanager
+import heapq
+import itertools
+import os
+import threading
+import time
+
+
+INTERACTIVE = 0
+BACKGROUND = 10
+
+
+class SchedulerFull(Exception):
+    """Raised when an LLM call is rejected because the queue is full."""
+    pass
+
+
+class _Job:
+    def __init__(self, chain, payload, priority, deadline, exclusive=False):
+        self.chain = chain
+        self.payload = payload
+        self.priority = priority
+        self.deadline = deadline
+        self.exclusive = exclusive
+        self.enqueued = time.monotonic()
+        self.future = Future()
+
+
+###################
+## LLM Scheduler ##
+###################
+
+
+class LLMScheduler:
+    def __init__(self, max_in_flight: int = 2, max_queue: int = 64, max_batch: int = 1,
+                 batch_window: float = 0.02, timeout: float = 120.0):
+        """
+        Args:
+            max_in_flight: Generations (or batches) running against the backend at once
+            max_queue: Calls allowed to wait; further calls raise SchedulerFull
+            max_batch: Queued prompts for the same chain coalesced into one chain.batch() call. Leave
+                at 1 unless the backend generates a batch together: Ollama runs the prompts of a
+                batch in turn, so grouping them only queues them behind one slot
+            batch_window: Seconds a worker waits for more prompts to fill a batch
+            timeout: Default seconds a call may wait in the queue and run before timing out
+        """
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.max_batch = max_batch
+        self.batch_window = batch_window
+        self.timeout = timeout
+
+        self._cond = threading.Condition()
+        self._queue = []
+        self._seq = itertools.count()
+        self._local = threading.local()
+
+        self.in_flight = 0
+        self.started = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.batches = 0
+        self.batched_calls = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+        for i in range(max_in_flight):
+            threading.Thread(target=self._worker, name=f"llm-scheduler-{i}", daemon=True).start()
+
+    def __repr__(self) -> str:
+        return f"LLMScheduler(max_in_flight={self.max_in_flight}, queued={len(self._queue)})"
+
+    def stats(self) -> dict:
+        """Return queue depth, in-flight count, wait times and batching counters."""
+        with self._cond:
+            return {
+                'queue_depth': len(self._queue),
+                'in_flight': self.in_flight,
+                'completed': self.completed,
+                'rejected': self.rejected,
+                'timed_out': self.timed_out,
+                'batches': self.batches,
+                'batched_calls': self.batched_calls,
+                'avg_wait': self.total_wait / self.started if self.started else 0.0,
+                'max_wait': self.max_wait,
+            }
+
+    @contextmanager
+    def priority(self, priority: int):
+        """Run LLM calls made by this thread inside the block at the given priority."""
+        previous = getattr(self._local, 'priority', INTERACTIVE)
+        self._local.priority = priority
+        try:
+            yield
+        finally:
+            self._local.priority = previous
+
+    def invoke(self, chain, payload, priority: int = None, timeout: float = None):
+        """
+        Run chain.invoke(payload) on a scheduler worker and wait for the result.
+        Raises SchedulerFull if the queue is full and TimeoutError if the call doesn't finish in time.
+        """
+        job = self._submit(chain, payload, priority, timeout)
+        try:
+            return job.future.result(timeout=max(0.0, job.deadline - time.monotonic()))
+        except FutureTimeoutError:
+            self._timed_out(job)
+
+    async def ainvoke(self, chain, payload, priority: int = None, timeout: float = None):
+        """
+        Awaitable invoke for async callers. The call still runs on a scheduler worker, under the
+        same in-flight cap, queue and batching; the coroutine is suspended rather than a thread blocked.
+        """
+        job = self._submit(chain, payload, priority, timeout)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(job.future),
+                                          timeout=max(0.0, job.deadline - time.monotonic()))
+        except asyncio.TimeoutError:
+            self._timed_out(job)
+
+    @contextmanager
+    def slot(self, priority: int = None, timeout: float = None):
+        """
+        Hold one in-flight slot for the duration of the block, e.g. while streaming a response.
+        Streams can't be batched, but they still count against max_in_flight and wait in the queue.
+        The timeout bounds the wait for the slot; once granted, it is held until the block exits.
+        """
+        job = self._submit(None, None, priority, timeout, exclusive=True)
+        try:
+            done = job.future.result(timeout=max(0.0, job.deadline - time.monotonic()))
+        except FutureTimeoutError:
+            self._timed_out(job)
+        try:
+            yield
+        finally:
+            done.set()
+
+    def _timed_out(self, job):
+        if not job.future.cancel() and job.exclusive:
+            # The slot was granted just as the caller gave up; hand it straight back.
+            job.future.add_done_callback(lambda future: future.exception() or future.result().set())
+        with self._cond:
+            self.timed_out += 1
+        raise TimeoutError("LLM call timed out")
+
+    def _submit(self, chain, payload, priority, timeout, exclusive=False):
+        if priority is None:
+            priority = getattr(self._local, 'priority', INTERACTIVE)
+        deadline = time.monotonic() + (self.timeout if timeout is None else timeout)
+        job = _Job(chain, payload, priority, deadline, exclusive)
+        with self._cond:
+            if len(self._queue) >= self.max_queue:
+                self.rejected += 1
+                raise SchedulerFull(f"LLM queue is full ({self.max_queue} waiting)")
+            heapq.heappush(self._queue, (priority, next(self._seq), job))
+            self._cond.notify()
+        return job
+
+    def _take(self):
+        """Pop the next live job, plus queued jobs for the same chain to batch with it."""
+        with self._cond:
+            while True:
+                while not self._queue:
+                    self._cond.wait()
+                job = heapq.heappop(self._queue)[2]
+                if self._expired(job):
+                    continue
+                break
+
+            batch = [job]
+            if not job.exclusive and self.max_batch > 1:
+                deadline = time.monotonic() + self.batch_window
+                while len(batch) < self.max_batch:
+                    same = [entry for entry in self._queue if entry[2].chain is job.chain and not entry[2].exclusive]
+                    for entry in same[:self.max_batch - len(batch)]:
+                        self._queue.remove(entry)
+                        if not self._expired(entry[2]):
+                            batch.append(entry[2])
+                    heapq.heapify(self._queue)
+                    # Only linger for more prompts under load; an idle scheduler runs the call at once.
+                    remaining = deadline - time.monotonic()
+                    if len(batch) >= self.max_batch or remaining <= 0 or not self._queue:
+                        break
+                    self._cond.wait(remaining)
+
+            now = time.monotonic()
+            for queued in batch:
+                wait = now - queued.enqueued
+                self.total_wait += wait
+                self.max_wait = max(self.max_wait, wait)
+            self.started += len(batch)
+            self.in_flight += 1
+            return batch
+
+    def _expired(self, job) -> bool:
+        """Drop jobs whose caller gave up or whose deadline passed while queued. Caller holds the lock."""
+        if job.future.cancelled():
+            return True
+        if time.monotonic() >= job.deadline:
+            try:
+                job.future.set_exception(TimeoutError("LLM call timed out in the queue"))
+            except InvalidStateError:
+                # The caller cancelled it between the check above and now.
+                pass
+            return True
+        return False
+
+    def _worker(self):
+        while True:
+            batch = self._take()
+            live = [job for job in batch if job.future.set_running_or_notify_cancel()]
+            try:
+                if live:
+                    self._run(live)
+            finally:
+                with self._cond:
+                    self.in_flight -= 1
+                    self.completed += len(live)
+
+    def _run(self, live):
+
+        if live[0].exclusive:
+            # The worker is the slot: it stays busy until the caller's block exits.
+            done = threading.Event()
+            live[0].future.set_result(done)
+            done.wait()
+            return
+
+        try:
+            if len(live) == 1:
+                results = [live[0].chain.invoke(live[0].payload)]
+            else:
+                results = live[0].chain.batch([job.payload for job in live], return_exceptions=True)
+                with self._cond:
+                    self.batches += 1
+                    self.batched_calls += len(live)
+        except Exception as e:
+            for job in live:
+                job.future.set_exception(e)
+            return
+
+        for job, result in zip(live, results):
+            if isinstance(result, Exception):
+                job.future.set_exception(result)
+            else:
+                job.future.set_result(result)
+
+
+LLM_SCHEDULER = LLMScheduler(
+    max_in_flight=int(os.getenv("LLM_MAX_IN_FLIGHT", "2")),
+    max_queue=int(os.getenv("LLM_MAX_QUEUE", "64")),
+    max_batch=int(os.getenv("LLM_MAX_BATCH", "1")),
+)
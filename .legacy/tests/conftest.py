@@ -0,0 +1,10 @@
+import os
+import tempfile
+
+# Several modules open their SQLite stores from module-level defaults; keep them out of the tree.
+_SCRATCH = tempfile.mkdtemp(prefix="xai-tests-")
+for name, filename in [("SPOTIFY_CACHE_PATH", "spotify_cache.sqlite3"), ("SPOTIFY_TOKEN_PATH", "spotify_tokens.sqlite3"),
+                       ("LLM_CACHE_PATH", "llm_cache.sqlite3"), ("SNAPSHOT_PATH", "snapshots.sqlite3"),
+                       ("RAG_INDEX_DIR", "index"), ("FEATURE_STORE_DIR", "features")]:
+    os.environ.setdefault(name, os.path.join(_SCRATCH, filename))
+os.environ.setdefault("SECRET_KEY", "tests")
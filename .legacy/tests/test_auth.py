@@ -0,0 +1,52 @@
+import asyncio
+import time
+
+import pytest
+
+httpx = pytest.importorskip("httpx")
+pytest.importorskip("flask")
+
+from spotify import auth
+
+
+@pytest.fixture
+def token_endpoint(monkeypatch):
+    """Serve the token endpoint from a queue of (status, body) responses, recording the requests."""
+    responses, requests = [], []
+
+    def handler(request):
+        requests.append(request)
+        status, body = responses.pop(0)
+        return httpx.Response(status, json=body)
+
+    monkeypatch.setattr(auth, "get_async_client", lambda: httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    return responses, requests
+
+
+def test_async_exchange_returns_session_values(token_endpoint):
+    responses, requests = token_endpoint
+    responses.append((200, {"access_token": "access", "refresh_token": "refresh", "expires_in": 3600}))
+
+    tokens, details = asyncio.run(auth.exchange_code_for_token_async("the-code"))
+
+    assert details is None
+    assert tokens["access_token"] == "access" and tokens["refresh_token"] == "refresh"
+    assert tokens["expires_at"] == pytest.approx(time.time() + 3600, abs=5)
+    assert str(requests[0].url) == auth.TOKEN_URL
+    assert b"code=the-code" in requests[0].content and b"grant_type=authorization_code" in requests[0].content
+
+
+def test_async_exchange_reports_a_refused_code(token_endpoint):
+    responses, _ = token_endpoint
+    responses.append((400, {"error": "invalid_grant"}))
+
+    assert asyncio.run(auth.exchange_code_for_token_async("used-code")) == (None, {"error": "invalid_grant"})
+
+
+def test_async_exchange_does_not_retry_a_server_error(token_endpoint):
+    # A retry would redeem the single-use code twice.
+    responses, requests = token_endpoint
+    responses.extend([(503, {"error": "unavailable"}), (200, {})])
+
+    assert asyncio.run(auth.exchange_code_for_token_async("the-code")) == (None, {"error": "unavailable"})
+    assert len(requests) == 1
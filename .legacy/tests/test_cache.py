@@ -0,0 +1,59 @@
+import asyncio
+import threading
+
+from spotify.cache import ResponseCache, cached, cached_async
+
+
+def test_async_and_sync_fetches_share_entries(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite3"))
+    calls = []
+
+    @cached('me', cache)
+    def fetch(token):
+        calls.append(("sync", token))
+        return {"id": token}
+
+    @cached_async('me', cache)
+    async def fetch_async(token):
+        calls.append(("async", token))
+        return {"id": token}
+
+    assert asyncio.run(fetch_async("a")) == {"id": "a"}
+    assert fetch("a") == {"id": "a"}
+    assert fetch("b") == {"id": "b"}
+    assert asyncio.run(fetch_async("b")) == {"id": "b"}
+    assert calls == [("async", "a"), ("sync", "b")]
+
+
+def test_async_empty_results_are_not_cached(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite3"))
+    calls = []
+
+    @cached_async('me/top/tracks', cache)
+    async def fetch_async(token):
+        calls.append(token)
+        return []
+
+    asyncio.run(fetch_async("a"))
+    asyncio.run(fetch_async("a"))
+    assert calls == ["a", "a"]
+
+
+def test_async_lookups_run_off_the_event_loop(tmp_path):
+    threads = []
+
+    class RecordingCache(ResponseCache):
+        def get(self, endpoint, key):
+            threads.append(threading.current_thread())
+            return super().get(endpoint, key)
+
+        def set(self, endpoint, key, value):
+            threads.append(threading.current_thread())
+            return super().set(endpoint, key, value)
+
+    @cached_async('me', RecordingCache(str(tmp_path / "cache.sqlite3")))
+    async def fetch_async(token):
+        return {"id": token}
+
+    asyncio.run(fetch_async("a"))
+    assert len(threads) == 2 and threading.main_thread() not in threads
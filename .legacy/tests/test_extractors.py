@@ -0,0 +1,48 @@
+import importlib.util
+
+import pytest
+
+from RAG.sources import extractors
+from RAG.sources.extractors import EXTRACTORS, get_extractor
+
+PAGE = ('<html><body><nav><p class="Rating-nav">ignored</p></nav>'
+        '<h1 data-testid="ContentHeaderHed">Album A</h1>'
+        '<div class="SplitScreenContentHeaderArtist-ftloCc">Artist A</div>'
+        '<p class="Rating-iATjmx">8.4</p><p class="InfoSliceValue-abc">Rock</p>'
+        '<div class="SplitScreenContentHeaderDekDown-q1">A record.</div></body></html>')
+
+
+def _hide(monkeypatch, *modules):
+    find_spec = importlib.util.find_spec
+    monkeypatch.setattr(extractors.importlib.util, "find_spec",
+                        lambda name, *args: None if name in modules else find_spec(name, *args))
+
+
+@pytest.mark.parametrize("name", list(EXTRACTORS))
+def test_extractors_agree(name):
+    pytest.importorskip({"soup": "bs4", "strained-soup": "lxml", "lxml": "cssselect",
+                         "selectolax": "selectolax"}[name])
+    details = get_extractor(name).extract(PAGE, "https://example.com/a")
+    assert details == {"URL": "https://example.com/a", "Rating": "8.4", "Title": "Album A", "Artist": "Artist A",
+                       "Genre": "Rock", "Description": "A record."}
+
+
+def test_pages_without_required_fields_are_skipped():
+    assert get_extractor("soup").extract("<html><p>Not a review</p></html>") is None
+
+
+def test_auto_selection_skips_extractors_whose_parser_is_missing(monkeypatch):
+    _hide(monkeypatch, "selectolax")
+    assert get_extractor().name == "lxml"
+
+    _hide(monkeypatch, "selectolax", "cssselect")
+    assert get_extractor().name == "strained-soup"
+
+    _hide(monkeypatch, "selectolax", "lxml")
+    assert get_extractor().name == "soup"
+
+
+def test_missing_parser_fails_at_construction(monkeypatch):
+    _hide(monkeypatch, "selectolax")
+    with pytest.raises(ImportError, match="selectolax"):
+        get_extractor("selectolax")
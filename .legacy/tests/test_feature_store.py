@@ -0,0 +1,109 @@
+import numpy as np
+
+from recommendation_engine.feature_store import (FeatureStore, build_feature_store, build_from_cache,
+                                                 iter_cached_responses)
+from recommendation_engine.prerank import prerank, score_candidates
+from spotify.cache import ResponseCache
+
+ARTISTS = [{"id": "ar1", "name": "Björk", "genres": ["art pop", "electronica"]},
+           {"id": "ar2", "name": "Sigur Rós", "genres": ["post-rock"]},
+           {"id": "ar1", "name": "Björk", "genres": ["art pop", "electronica", "trip hop"]}]
+TRACKS = [{"id": "t1", "name": "Jóga", "artists": [{"id": "ar1", "name": "Björk"}]},
+          {"id": "t2", "name": "Hoppípolla", "artists": [{"id": "ar2", "name": "Sigur Rós"}]},
+          {"id": "t3", "name": "Duet", "artists": [{"id": "ar1", "name": "Björk"}, {"id": "ar3", "name": "Guest"}]},
+          {"id": "t4", "name": "Quiet", "artists": [{"id": "ar2", "name": "Sigur Rós"}]}]
+AUDIO = [{"id": "t1", "danceability": 0.2, "energy": 0.4, "valence": 0.1, "acousticness": 0.5, "instrumentalness": 0.1,
+          "speechiness": 0.05, "liveness": 0.1, "loudness": -8.0, "tempo": 90.0},
+         {"id": "t2", "danceability": 0.3, "energy": 0.6, "valence": 0.2, "acousticness": 0.3, "instrumentalness": 0.8,
+          "speechiness": 0.03, "liveness": 0.2, "loudness": -10.0, "tempo": 120.0},
+         {"id": "t4", "danceability": 0.0, "energy": 0.0, "valence": 0.0, "acousticness": 0.0, "instrumentalness": 0.0,
+          "speechiness": 0.0, "liveness": 0.0, "loudness": -30.0, "tempo": 60.0}]
+
+
+def _store(tmp_path):
+    meta = build_feature_store(TRACKS, ARTISTS, AUDIO, str(tmp_path))
+    return meta, FeatureStore(str(tmp_path))
+
+
+def test_round_trip(tmp_path):
+    meta, store = _store(tmp_path)
+
+    assert (meta['tracks'], meta['artists'], meta['tracks_with_audio']) == (4, 3, 3)
+    assert store.track(store.track_rows(["spotify:track:t3"])[0]) == {
+        'id': "t3", 'name': "Duet", 'artists': ["Björk", "Guest"], 'audio': None}
+    # Repeated IDs keep their last object; artists only seen on tracks have no genres.
+    assert store.artist(store.artist_rows(["ar1"])[0])['genres'] == ["art pop", "electronica", "trip hop"]
+    assert store.artist(store.artist_rows(["ar3"])[0]) == {'id': "ar3", 'name': "Guest", 'genres': []}
+    assert store.track(store.track_rows(["t1"])[0])['audio']['tempo'] == 90.0
+
+
+def test_lookups_of_unknown_keys(tmp_path):
+    _, store = _store(tmp_path)
+
+    assert store.track_rows(["t2", "missing", "spotify:track:t1"]).tolist()[1] == -1
+    assert store.artist_rows_by_name(["sigur rós", "BJÖRK", "nobody"]).tolist()[2] == -1
+    assert store.artist_genres_by_name(["SIGUR RÓS", "nobody"]) == {"sigur rós": ["post-rock"]}
+
+
+def test_audio_is_scaled_and_nan_when_unknown(tmp_path):
+    _, store = _store(tmp_path)
+    audio = store.audio(store.track_rows(["t4", "t2", "t3", "missing"]))
+
+    assert audio.shape == (4, len(store.audio_names))
+    assert np.allclose(audio[0], 0.0) and audio[1, 1] == 1.0
+    assert np.isnan(audio[2:]).all()
+    assert store.audio(store.track_rows(["t2"]), scaled=False)[0, -1] == 120.0
+
+
+def test_empty_store_loads(tmp_path):
+    build_feature_store(store_dir=str(tmp_path))
+    store = FeatureStore(str(tmp_path))
+
+    assert store.track_rows(["t1"]).tolist() == [-1]
+    assert store.audio_names == []
+
+
+def test_store_is_built_from_a_response_cache(tmp_path):
+    # Filled the way the graph crawler fills it: one entry per ID under 'artist' and 'track'.
+    cache = ResponseCache(str(tmp_path / "cache.sqlite3"))
+    for artist in ARTISTS:
+        cache.set("artist", artist["id"], artist)
+    for track in TRACKS:
+        cache.set("track", track["id"], track)
+    cache.set("album_tracks", "al1", [{"id": "t1", "name": "Jóga (simplified)", "artists": []}])
+
+    assert [t["id"] for t in iter_cached_responses(cache.path, "album_tracks")] == ["t1"]
+    meta = build_from_cache(cache.path, store_dir=str(tmp_path / "features"))
+    store = FeatureStore(str(tmp_path / "features"))
+
+    assert (meta["tracks"], meta["artists"]) == (4, 3)
+    # Full track objects win over an album's simplified listing.
+    assert store.track(store.track_rows(["t1"])[0])["artists"] == ["Björk"]
+    assert store.artist(store.artist_rows(["ar1"])[0])["genres"] == ["art pop", "electronica", "trip hop"]
+
+
+TOP_TRACKS = [{"name": "Jóga", "artist": "Björk", "uri": "spotify:track:t1"}]
+TOP_ARTISTS = [{"name": "Björk", "genres": ["art pop", "electronica"]}]
+CANDIDATES = [{"name": "Hoppípolla", "artist": "Sigur Rós", "uri": "spotify:track:t2"},
+              {"name": "Unknown", "artist": "Somebody", "uri": "spotify:track:t9"},
+              {"name": "Duet", "artist": "Guest", "uri": "spotify:track:t3"}]
+
+
+def test_prerank_takes_genres_and_audio_from_the_store(tmp_path):
+    _, store = _store(tmp_path)
+    weights = {"artist": 0.0}
+
+    assert score_candidates(TOP_TRACKS, TOP_ARTISTS, CANDIDATES, weights=weights).tolist() == [0.0, 0.0, 0.0]
+    scores = score_candidates(TOP_TRACKS, TOP_ARTISTS, CANDIDATES, weights=weights, store=store)
+    # Without the store nothing scores; with it, the candidate with stored audio features does.
+    assert scores[0] > 0.0 and scores[1] == 0.0
+
+
+def test_prerank_fills_candidate_genres_from_the_store(tmp_path):
+    _, store = _store(tmp_path)
+    candidates = [{"name": "Y", "artist": "Somebody", "uri": "spotify:track:y"},
+                  {"name": "X", "artist": "Sigur Rós", "uri": "spotify:track:x"}]
+    top_artists = [{"name": "Someone Else", "genres": ["post-rock"]}]
+
+    assert [c["name"] for c in prerank([], top_artists, candidates, k=1, store=store)] == ["X"]
+    assert score_candidates([], top_artists, candidates).tolist() == [0.0, 0.0]
@@ -0,0 +1,34 @@
+import asyncio
+import gc
+
+import pytest
+
+pytest.importorskip("httpx")
+
+from utils import http_client
+
+
+async def _client():
+    return http_client.get_async_client()
+
+
+def test_one_client_per_running_loop():
+    async def twice():
+        return await _client(), await _client()
+
+    first, second = asyncio.run(twice())
+    assert first is second
+    assert asyncio.run(_client()) is not first
+
+
+def test_clients_of_finished_loops_are_dropped():
+    for _ in range(5):
+        asyncio.run(_client())
+    gc.collect()
+
+    loop = asyncio.new_event_loop()
+    try:
+        loop.run_until_complete(_client())
+        assert list(http_client._async_clients) == [loop]
+    finally:
+        loop.close()
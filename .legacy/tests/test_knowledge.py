@@ -0,0 +1,122 @@
+import os
+import threading
+
+import pytest
+
+pytest.importorskip("praw")
+
+from knowledge import chunk_posts, save_reddit_posts
+from RAG.sources.reddit import iter_posts
+
+
+def _post(subreddit, n, body="x" * 50):
+    return {"subreddit": subreddit, "title": f"{subreddit} {n}", "url": f"https://r/{subreddit}/{n}", "selftext": body}
+
+
+def test_chunks_stay_per_subreddit_and_under_the_limit():
+    posts = [_post(sub, n) for n in range(6) for sub in ("jazz", "rnb")]
+    chunks = list(chunk_posts(posts, max_chars=300))
+
+    assert sum(len(chunk) for _, chunk, _ in chunks) == len(posts)
+    for subreddit, chunk, text in chunks:
+        assert {post["subreddit"] for post in chunk} == {subreddit}
+        assert len(text) <= 300
+    assert [p["title"] for sub, chunk, _ in chunks if sub == "jazz" for p in chunk] == [f"jazz {n}" for n in range(6)]
+
+
+def test_oversized_post_is_truncated_into_its_own_chunk():
+    chunks = list(chunk_posts([_post("jazz", 0, body="y" * 1000), _post("jazz", 1)], max_chars=200))
+
+    assert [len(chunk) for _, chunk, _ in chunks] == [1, 1]
+    assert len(chunks[0][2]) == 200
+
+
+class FlakyConverter:
+    """Stub conversion call that fails for the subreddits listed in `failing`."""
+
+    def __init__(self, failing=()):
+        self.failing = set(failing)
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def __call__(self, text):
+        with self._lock:
+            self.calls.append(text)
+        if any(f"https://r/{sub}/" in text for sub in self.failing):
+            return "Error: backend unavailable"
+        return f"notes for {text.count('Title:')} posts"
+
+
+def test_rerun_converts_only_failed_and_edited_posts(tmp_path):
+    posts = [_post(sub, n) for n in range(3) for sub in ("jazz", "rnb")]
+    state_path = str(tmp_path / "state.sqlite3")
+    run = dict(output_dir=str(tmp_path), state_path=state_path, workers=2, max_chars=10000)
+
+    first = FlakyConverter(failing={"rnb"})
+    assert save_reddit_posts(posts, convert=first, **run) == 1
+    assert (tmp_path / "REDDIT-jazz.txt").read_text() == "notes for 3 posts\n\n"
+    assert not os.path.exists(tmp_path / "REDDIT-rnb.txt")
+
+    second = FlakyConverter()
+    assert save_reddit_posts(posts, convert=second, **run) == 1
+    assert len(second.calls) == 1 and "https://r/rnb/" in second.calls[0]
+    assert (tmp_path / "REDDIT-rnb.txt").read_text() == "notes for 3 posts\n\n"
+
+    edited = posts[:1] + [dict(posts[1], selftext="edited")] + posts[2:]
+    third = FlakyConverter()
+    assert save_reddit_posts(edited, convert=third, **run) == 1
+    assert third.calls == ["Title: rnb 0\nURL: https://r/rnb/0\nContent: edited"]
+
+
+def test_duplicate_posts_in_one_run_are_converted_once(tmp_path):
+    converter = FlakyConverter()
+    save_reddit_posts({"jazz": [_post("jazz", 0), _post("jazz", 0)]}, output_dir=str(tmp_path),
+                      state_path=str(tmp_path / "state.sqlite3"), convert=converter)
+
+    assert converter.calls == [f"Title: jazz 0\nURL: https://r/jazz/0\nContent: {'x' * 50}"]
+
+
+class FakeSubreddit:
+    def __init__(self, name, count):
+        self.name, self.count = name, count
+
+    def hot(self, limit):
+        if self.name == "broken":
+            raise RuntimeError("403")
+        for n in range(min(limit, self.count)):
+            yield type("Post", (), {"title": f"{self.name} {n}", "url": f"https://r/{self.name}/{n}", "selftext": ""})()
+
+
+class FakeReddit:
+    instances = []
+
+    def __init__(self):
+        self.thread = threading.get_ident()
+        FakeReddit.instances.append(self)
+
+    def subreddit(self, name):
+        # PRAW instances must stay on the thread that built them.
+        assert threading.get_ident() == self.thread
+        return FakeSubreddit(name, 5)
+
+
+def test_iter_posts_interleaves_subreddits_and_skips_failures():
+    posts = list(iter_posts(["jazz", "broken", "rnb"], FakeReddit, posts_per_sub=4, buffer=2))
+
+    assert sorted(p["title"] for p in posts) == sorted(f"{sub} {n}" for sub in ("jazz", "rnb") for n in range(4))
+    assert all(p["selftext"] == "No content" for p in posts)
+
+
+def test_each_worker_builds_its_own_reddit_instance():
+    FakeReddit.instances = []
+    posts = list(iter_posts([f"sub{n}" for n in range(8)], FakeReddit, posts_per_sub=2, workers=3))
+
+    assert len(posts) == 16
+    assert 1 <= len(FakeReddit.instances) <= 3
+    assert len({reddit.thread for reddit in FakeReddit.instances}) == len(FakeReddit.instances)
+
+
+def test_closing_iter_posts_early_does_not_hang():
+    stream = iter_posts(["jazz", "rnb"], FakeReddit, buffer=1)
+    next(stream)
+    stream.close()
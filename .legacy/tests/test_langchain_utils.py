@@ -0,0 +1,100 @@
+import json
+
+import pytest
+
+pytest.importorskip("langchain")
+
+from langchain_core.exceptions import OutputParserException
+
+from utils import langchain_utils
+from utils.langchain_utils import (IncrementalRecommendationParser, LLMResponseCache, ParserError, SinglePassLLM,
+                                   XRecommendations)
+
+ITEMS = [{"song": "Song A", "artist": "Artist A", "explanation": "Because."},
+         {"song": "Song B", "artist": "Artist B", "explanation": "Has a {brace} and a ] in it."}]
+DOCUMENT = json.dumps({"recommendations": ITEMS})
+
+
+def test_parser_yields_each_item_as_it_completes():
+    parser = IncrementalRecommendationParser()
+    seen = []
+    for i in range(0, len(DOCUMENT), 5):
+        seen.extend(parser.feed(DOCUMENT[i:i + 5]))
+    assert seen == ITEMS
+    assert [rec._asdict() for rec in parser.result().recommendations] == ITEMS
+
+
+def test_parser_ignores_braces_after_the_array_closes():
+    parser = IncrementalRecommendationParser()
+    items = parser.feed("Here you go:\n" + DOCUMENT)
+    items += parser.feed('\nNote: {"song": "Not a pick", "artist": "x", "explanation": "y"} [{"song": "z"}]')
+    assert items == ITEMS
+
+
+def test_parser_result_rejects_malformed_text():
+    parser = IncrementalRecommendationParser()
+    parser.feed("I can't help with that.")
+    with pytest.raises(ParserError):
+        parser.result()
+
+
+def test_recommendations_accept_objects_and_arrays():
+    parsed = XRecommendations.parse_raw(json.dumps({"recommendations": [ITEMS[0], ["S", "A", "E"]]}))
+    assert [tuple(rec) for rec in parsed.recommendations] == [("Song A", "Artist A", "Because."), ("S", "A", "E")]
+    assert XRecommendations.parse_raw(parsed.json()) == parsed
+
+
+@pytest.fixture
+def single_pass(tmp_path):
+    llm = SinglePassLLM(debug=False)
+    llm.cache = LLMResponseCache(str(tmp_path / "llm_cache.sqlite3"))
+    return llm
+
+
+INPUTS = ([{"name": "t", "artist": "x"}], [{"name": "x"}], [{"name": "c", "artist": "y"}])
+
+
+def _stream_from(llm, chunks):
+    calls = []
+
+    def stream(prompt):
+        calls.append(prompt)
+        yield from chunks
+    llm._stream = stream
+    return calls
+
+
+def test_parseable_stream_is_cached(single_pass):
+    calls = _stream_from(single_pass, [DOCUMENT[:20], DOCUMENT[20:]])
+    assert "".join(single_pass.stream(*INPUTS)) == DOCUMENT
+    assert list(single_pass.stream(*INPUTS)) == [DOCUMENT]
+    assert len(calls) == 1
+
+
+def test_unparseable_stream_is_not_cached(single_pass):
+    calls = _stream_from(single_pass, ["Sorry, ", "no JSON today."])
+    for _ in range(2):
+        assert "".join(single_pass.stream(*INPUTS)) == "Sorry, no JSON today."
+    assert len(calls) == 2
+
+
+@pytest.mark.parametrize("error, raised", [(OutputParserException("Invalid json output"), ParserError),
+                                           (ConnectionError("Connection refused"), ConnectionError)])
+def test_single_pass_raises_instead_of_returning_error_text(single_pass, monkeypatch, error, raised):
+    def invoke(chain, inputs):
+        raise error
+    monkeypatch.setattr(langchain_utils.LLM_SCHEDULER, "invoke", invoke)
+
+    with pytest.raises(raised):
+        single_pass(*INPUTS)
+    assert single_pass.cache.stats()["misses"] == 1
+
+
+def test_response_cache_is_opened_on_first_use(tmp_path):
+    path = tmp_path / "nested" / "llm_cache.sqlite3"
+    cache = LLMResponseCache(str(path))
+    assert not path.parent.exists()
+
+    cache.put("llama3", "system", {"Top Tracks": ["a"]}, "response", 1.5)
+    assert path.exists()
+    assert LLMResponseCache(str(path)).get("llama3", "system", {"Top Tracks": ["a"]}) == "response"
@@ -0,0 +1,185 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from utils.llm_scheduler import LLMScheduler, SchedulerFull
+
+
+class FakeChain:
+    """A chain whose calls take `delay` seconds and record how they were made."""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.invoked = []
+        self.batched = []
+        self.running = 0
+        self.max_running = 0
+        self.lock = threading.Lock()
+
+    def _call(self, payloads):
+        with self.lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        time.sleep(self.delay)
+        with self.lock:
+            self.running -= 1
+
+    def invoke(self, payload):
+        self._call([payload])
+        self.invoked.append(payload)
+        return f"result {payload}"
+
+    def batch(self, payloads, return_exceptions=False):
+        self._call(payloads)
+        self.batched.append(list(payloads))
+        return [f"result {payload}" for payload in payloads]
+
+
+def _in_threads(func, args):
+    results = {}
+    threads = [threading.Thread(target=lambda arg=arg: results.__setitem__(arg, func(arg))) for arg in args]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_prompts_run_one_at_a_time_by_default():
+    scheduler, chain = LLMScheduler(max_in_flight=2), FakeChain(delay=0.02)
+    results = _in_threads(lambda i: scheduler.invoke(chain, i), range(6))
+
+    assert results == {i: f"result {i}" for i in range(6)}
+    assert sorted(chain.invoked) == list(range(6))
+    assert chain.batched == []
+    assert chain.max_running <= 2
+
+
+def test_prompts_are_grouped_only_when_batching_is_enabled():
+    scheduler, chain = LLMScheduler(max_in_flight=1, max_batch=4, batch_window=0.05), FakeChain(delay=0.05)
+    results = _in_threads(lambda i: scheduler.invoke(chain, i), range(5))
+
+    assert results == {i: f"result {i}" for i in range(5)}
+    assert chain.batched
+    assert sorted(chain.invoked + [p for batch in chain.batched for p in batch]) == list(range(5))
+
+
+def test_slot_is_held_until_the_block_exits():
+    scheduler, chain = LLMScheduler(max_in_flight=1), FakeChain()
+    entered, release = threading.Event(), threading.Event()
+
+    def stream():
+        # The slot's timeout covers the wait for it, not how long the stream runs.
+        with scheduler.slot(timeout=0.05):
+            entered.set()
+            release.wait()
+    streamer = threading.Thread(target=stream)
+    streamer.start()
+    entered.wait()
+
+    caller = threading.Thread(target=lambda: scheduler.invoke(chain, "queued"))
+    caller.start()
+    time.sleep(0.2)
+    assert chain.invoked == []
+    assert scheduler.stats()['in_flight'] == 1
+
+    release.set()
+    streamer.join()
+    caller.join()
+    assert chain.invoked == ["queued"]
+
+
+def test_slot_wait_times_out_while_the_backend_is_busy():
+    scheduler = LLMScheduler(max_in_flight=1)
+    with scheduler.slot():
+        with pytest.raises(TimeoutError):
+            with scheduler.slot(timeout=0.05):
+                pass
+    # The abandoned request does not keep the slot: a new one gets it.
+    with scheduler.slot(timeout=1):
+        pass
+    assert scheduler.stats()['timed_out'] == 1
+
+
+def test_cancellation_racing_the_queue_deadline_keeps_workers_alive():
+    scheduler, chain = LLMScheduler(max_in_flight=1), FakeChain()
+    job = scheduler._submit(chain, "late", None, timeout=0)
+    job.future.cancel()
+    # The caller's cancel lands after _expired checked for it.
+    job.future.cancelled = lambda: False
+    with scheduler._cond:
+        assert scheduler._expired(job)
+
+    assert scheduler.invoke(chain, "next", timeout=1) == "result next"
+
+
+def test_expired_queued_calls_time_out():
+    scheduler, chain = LLMScheduler(max_in_flight=1), FakeChain(delay=0.2)
+    first = threading.Thread(target=lambda: scheduler.invoke(chain, "slow"))
+    first.start()
+    time.sleep(0.05)
+    with pytest.raises(TimeoutError):
+        scheduler.invoke(chain, "waits too long", timeout=0.05)
+    first.join()
+    assert chain.invoked == ["slow"]
+
+
+def test_full_queue_rejects_calls():
+    scheduler = LLMScheduler(max_in_flight=1, max_queue=1)
+    with scheduler.slot():
+        waiting = threading.Thread(target=lambda: pytest.raises(TimeoutError, scheduler.invoke, FakeChain(), 1,
+                                                                timeout=0.2))
+        waiting.start()
+        time.sleep(0.05)
+        with pytest.raises(SchedulerFull):
+            scheduler.invoke(FakeChain(), 2)
+        waiting.join()
+    assert scheduler.stats()['rejected'] == 1
+
+
+def test_ainvoke_suspends_instead_of_blocking_the_loop():
+    scheduler, chain = LLMScheduler(max_in_flight=2), FakeChain(delay=0.1)
+
+    async def main():
+        ticks = 0
+
+        async def tick():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.01)
+        ticker = asyncio.create_task(tick())
+        results = await asyncio.gather(scheduler.ainvoke(chain, 1), scheduler.ainvoke(chain, 2))
+        ticker.cancel()
+        return results, ticks
+
+    results, ticks = asyncio.run(main())
+    assert results == ["result 1", "result 2"]
+    assert ticks >= 5
+
+
+def test_ainvoke_times_out_and_drops_the_queued_call():
+    scheduler, chain = LLMScheduler(max_in_flight=1), FakeChain(delay=0.2)
+
+    async def main():
+        running = asyncio.ensure_future(scheduler.ainvoke(chain, "slow"))
+        await asyncio.sleep(0.05)
+        with pytest.raises(TimeoutError):
+            await scheduler.ainvoke(chain, "waits too long", timeout=0.05)
+        return await running
+
+    assert asyncio.run(main()) == "result slow"
+    # The abandoned call never reaches the backend, and the scheduler keeps serving.
+    assert scheduler.invoke(chain, "next", timeout=1) == "result next"
+    assert chain.invoked == ["slow", "next"]
+    assert scheduler.stats()['timed_out'] == 1
+
+
+def test_ainvoke_times_out_a_call_that_runs_too_long():
+    scheduler, chain = LLMScheduler(max_in_flight=1), FakeChain(delay=0.3)
+
+    with pytest.raises(TimeoutError):
+        asyncio.run(scheduler.ainvoke(chain, "slow", timeout=0.05))
+    assert scheduler.stats()['timed_out'] == 1
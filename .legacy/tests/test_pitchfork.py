@@ -0,0 +1,109 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+import pytest
+
+from RAG.sources.pitchfork import crawl_reviews
+
+REVIEWS = ["a", "b", "c"]
+
+
+def _listing():
+    items = "".join(f'<div class="review"><a class="review__link" href="/reviews/albums/{slug}/">{slug}</a></div>'
+                    for slug in REVIEWS)
+    return f'<html><body><div class="review-collection-fragment">{items}</div></body></html>'
+
+
+def _review(slug):
+    return (f'<html><body><h1 data-testid="ContentHeaderHed">Album {slug}</h1>'
+            f'<div class="SplitScreenContentHeaderArtist-x1">Artist {slug}</div>'
+            f'<p class="Rating-y2">8.{len(slug)}</p><p class="InfoSliceValue-z3">Rock</p>'
+            f'<div class="SplitScreenContentHeaderDekDown-w4">About {slug}.</div></body></html>')
+
+
+class FixtureSite(BaseHTTPRequestHandler):
+    """A listing page with an ETag and three reviews; review "b" fails until failures run out."""
+    failures = {}
+    requests = []
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        path = urlsplit(self.path).path
+        FixtureSite.requests.append(path)
+        if path == "/reviews/albums/":
+            if self.headers.get("If-None-Match") == '"listing-v1"':
+                self.send_response(304)
+                self.end_headers()
+                return
+            self._send(200, _listing(), {"ETag": '"listing-v1"'})
+            return
+
+        slug = path.strip("/").split("/")[-1]
+        if FixtureSite.failures.get(slug, 0) > 0:
+            FixtureSite.failures[slug] -= 1
+            self._send(500, "Server error")
+        else:
+            self._send(200, _review(slug), {"ETag": f'"{slug}"'})
+
+    def _send(self, status, body, headers=None):
+        data = body.encode()
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+@pytest.fixture
+def site():
+    FixtureSite.failures = {"b": 1}
+    FixtureSite.requests = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FixtureSite)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}/reviews/albums/"
+    server.shutdown()
+    server.server_close()
+
+
+def _crawl(site, tmp_path):
+    return crawl_reviews(site, 1, 1, output=str(tmp_path / "reviews.jsonl"),
+                         state_path=str(tmp_path / "state.sqlite3"), workers=2, per_host_interval=0)
+
+
+def _written(tmp_path):
+    with open(tmp_path / "reviews.jsonl", encoding="utf-8") as file:
+        return [json.loads(line) for line in file]
+
+
+def test_reviews_are_scraped_from_listing_links(site, tmp_path):
+    FixtureSite.failures = {}
+    assert _crawl(site, tmp_path) == 3
+    reviews = sorted(_written(tmp_path), key=lambda review: review["Title"])
+    assert [review["Title"] for review in reviews] == ["Album a", "Album b", "Album c"]
+    assert reviews[0]["URL"] == site + "a/"
+    assert reviews[0]["Artist"] == "Artist a"
+
+
+def test_failed_review_is_retried_when_the_listing_is_unchanged(site, tmp_path):
+    assert _crawl(site, tmp_path) == 2
+
+    FixtureSite.requests = []
+    assert _crawl(site, tmp_path) == 1
+    # The listing answered 304, yet the review that failed was fetched again.
+    assert sorted(FixtureSite.requests) == ["/reviews/albums/", "/reviews/albums/b/"]
+    assert sorted(review["Title"] for review in _written(tmp_path)) == ["Album a", "Album b", "Album c"]
+
+
+def test_rerun_without_changes_fetches_no_reviews(site, tmp_path):
+    FixtureSite.failures = {}
+    _crawl(site, tmp_path)
+
+    FixtureSite.requests = []
+    assert _crawl(site, tmp_path) == 0
+    assert FixtureSite.requests == ["/reviews/albums/"]
@@ -0,0 +1,32 @@
+import numpy as np
+
+from recommendation_engine.prerank import prerank, score_candidates
+
+TOP_TRACKS = [{"name": "Mine", "artist": "Artist A", "uri": "spotify:track:mine"}]
+TOP_ARTISTS = [{"name": "Artist A", "genres": ["indie"]}, {"name": "Artist B"}]
+CANDIDATES = [{"name": "Other", "artist": "Artist Z", "uri": "spotify:track:z"},
+              {"name": "By B", "artist": "Artist B", "uri": "spotify:track:b"},
+              {"name": "By A", "artist": "Artist A, Artist Q", "uri": "spotify:track:a"},
+              {"name": "Mine", "artist": "Artist A", "uri": "spotify:track:mine"}]
+
+
+def test_artist_overlap_ranks_candidates():
+    assert [c["name"] for c in prerank(TOP_TRACKS, TOP_ARTISTS, CANDIDATES, k=2)] == ["By A", "By B"]
+
+
+def test_genre_signal_needs_candidate_genres():
+    without = score_candidates(TOP_TRACKS, TOP_ARTISTS, CANDIDATES[:1])
+    with_genres = score_candidates(TOP_TRACKS, TOP_ARTISTS, CANDIDATES[:1], artist_genres={"artist z": ["indie"]})
+    assert without[0] == 0.0
+    assert with_genres[0] > 0.0
+
+
+def test_audio_signal_uses_supplied_features():
+    features = {"spotify:track:mine": [1.0, 0.0], "spotify:track:z": [1.0, 0.1], "spotify:track:b": [0.0, 1.0]}
+    scores = score_candidates(TOP_TRACKS, [], CANDIDATES[:2], audio_features=features, weights={"artist": 0.0})
+    assert scores[0] > scores[1]
+    assert np.isclose(scores[1], 0.0)
+
+
+def test_top_tracks_are_never_recommended():
+    assert "Mine" not in [c["name"] for c in prerank(TOP_TRACKS, TOP_ARTISTS, CANDIDATES, k=10)]
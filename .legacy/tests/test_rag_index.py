@@ -0,0 +1,74 @@
+import json
+
+import numpy as np
+import pytest
+
+from RAG import index as rag
+from RAG.index import VectorIndex, build_index, chunk_text
+
+
+def _documents(count):
+    return [(f"doc{i}", "pitchfork", f"artist{i} plays genre{i % 7} songs about topic{i % 13}") for i in range(count)]
+
+
+def test_chunks_overlap_and_cover_the_text():
+    words = [f"w{i}" for i in range(25)]
+    chunks = chunk_text(" ".join(words), size=10, overlap=3)
+    assert [chunk.split()[0] for chunk in chunks] == ["w0", "w7", "w14", "w21"]
+    assert chunks[-1].split()[-1] == "w24"
+    assert all(len(chunk.split()) <= 10 for chunk in chunks)
+    assert chunk_text("") == []
+
+
+def test_small_indexes_use_exact_search(tmp_path):
+    build_index(_documents(50), index_dir=str(tmp_path))
+    index = VectorIndex(str(tmp_path))
+    assert index.centroids is None
+    assert index.search(["artist7 plays genre0"], k=1)[0][0]["id"] == "doc7#0"
+
+
+def test_large_indexes_get_ivf_and_search_it_by_default(tmp_path, monkeypatch):
+    monkeypatch.setattr(rag, "IVF_MIN_CHUNKS", 400)
+    build_index(_documents(400), index_dir=str(tmp_path))
+    meta = json.loads((tmp_path / "meta.json").read_text())
+    assert meta["ivf_lists"] == 20
+    assert meta["nprobe"] == 8
+
+    index = VectorIndex(str(tmp_path))
+    calls = []
+    search_ivf = index._search_ivf
+    monkeypatch.setattr(index, "_search_ivf", lambda *args: calls.append(args) or search_ivf(*args))
+    approximate = index.search(["artist123 plays genre4 songs about topic6"], k=3)
+    assert len(calls) == 1
+    assert approximate[0][0]["id"] == "doc123#0"
+
+    exact = index.search(["artist123 plays genre4 songs about topic6"], k=3, nprobe=0)
+    assert len(calls) == 1
+    assert exact[0][0]["id"] == "doc123#0"
+
+
+def test_ivf_can_be_disabled(tmp_path, monkeypatch):
+    monkeypatch.setattr(rag, "IVF_MIN_CHUNKS", 10)
+    build_index(_documents(50), index_dir=str(tmp_path), ivf_lists=0)
+    assert VectorIndex(str(tmp_path)).centroids is None
+
+
+def test_ivf_rows_are_grouped_by_list(tmp_path, monkeypatch):
+    monkeypatch.setattr(rag, "IVF_MIN_CHUNKS", 400)
+    build_index(_documents(400), index_dir=str(tmp_path))
+    index = VectorIndex(str(tmp_path))
+
+    # Every row sits in the slice of the list whose centroid is closest to it.
+    nearest = np.argmax(np.asarray(index.vectors) @ index.centroids.T, axis=1)
+    assert np.array_equal(nearest, np.repeat(np.arange(len(index.bounds) - 1), np.diff(index.bounds)))
+
+    # Probing every list is exact search, and each row still reads its own chunk.
+    queries = [f"artist{i} plays genre{i % 7} songs about topic{i % 13}" for i in (3, 150, 399)]
+    probed = index.search(queries, k=5, nprobe=len(index.bounds) - 1)
+    exact = index.search(queries, k=5, nprobe=0)
+    assert [[hit["score"] for hit in hits] for hits in probed] == [[hit["score"] for hit in hits] for hits in exact]
+    assert [hits[0]["id"] for hits in probed] == ["doc3#0", "doc150#0", "doc399#0"]
+
+
+def test_default_nprobe_stays_small():
+    assert [rag._default_nprobe(lists) for lists in (4, 316, 1000, 2000)] == [4, 8, 8, 16]
@@ -0,0 +1,71 @@
+import asyncio
+
+from spotify.ratelimit import RateLimiter
+
+
+class Response:
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+def _sender(*statuses):
+    calls = []
+    responses = iter(statuses)
+
+    def send(*args, **kwargs):
+        calls.append((args, kwargs))
+        return Response(next(responses))
+    return send, calls
+
+
+def _limiter():
+    return RateLimiter(rate=1000, burst=1000, max_retries=3, backoff_base=0.001, backoff_cap=0.001)
+
+
+def test_request_retries_server_errors():
+    send, calls = _sender(503, 500, 200)
+    limiter = _limiter()
+    assert limiter.request(send, "url").status_code == 200
+    assert len(calls) == 3
+    assert limiter.stats()['retried'] == 2
+
+
+def test_request_gives_up_after_max_retries():
+    send, calls = _sender(*[500] * 10)
+    limiter = _limiter()
+    assert limiter.request(send).status_code == 500
+    assert len(calls) == 4
+    assert limiter.stats()['failed'] == 1
+
+
+def test_retry_after_blocks_the_bucket():
+    statuses = []
+    responses = iter([Response(429, {'Retry-After': '0.05'}), Response(200)])
+
+    def send():
+        response = next(responses)
+        statuses.append(response.status_code)
+        return response
+    limiter = _limiter()
+    assert limiter.request(send).status_code == 200
+    assert statuses == [429, 200]
+    assert limiter.stats()['throttled'] == 1
+
+
+def test_send_once_does_not_retry():
+    send, calls = _sender(500, 200)
+    limiter = _limiter()
+    assert limiter.send_once(send, "url", data={'code': 'abc'}).status_code == 500
+    assert calls == [(("url",), {'data': {'code': 'abc'}})]
+    assert limiter.stats()['retried'] == 0
+
+
+def test_send_once_async_does_not_retry():
+    calls = []
+
+    async def send(url):
+        calls.append(url)
+        return Response(502)
+    assert asyncio.run(_limiter().send_once_async(send, "url")).status_code == 502
+    assert calls == ["url"]
@@ -0,0 +1,141 @@
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("langchain")
+
+from recommendation_engine import snapshots
+from recommendation_engine.snapshots import SnapshotStore, serve_snapshot
+from utils.langchain_utils import XRecommendations
+
+PAYLOAD = XRecommendations(recommendations=[{"song": "So What", "artist": "Miles Davis",
+                                             "explanation": "Modal jazz"}]).json()
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = SnapshotStore(str(tmp_path / "snapshots.sqlite3"))
+    monkeypatch.setattr(snapshots, "SNAPSHOTS", store)
+    monkeypatch.setattr(snapshots, "SNAPSHOT_WORKERS", 1)
+    return store
+
+
+def _fail(store, user_id, error):
+    store.enqueue(user_id, "token", time.time() + 3600)
+    _, _, _, enqueued_at = store.claim()
+    store.finish(user_id, enqueued_at, time.time(), error)
+
+
+def test_one_pending_job_per_user(store):
+    assert store.enqueue("u1", "token", time.time() + 3600)
+    assert not store.enqueue("u1")
+    assert store.claim()[0] == "u1"
+    assert store.claim() is None
+
+
+def test_missing_snapshot_queues_a_refresh(store):
+    assert serve_snapshot("u1", "token", time.time() + 3600) == (None, None)
+    assert store.stats()['queued'] == 1
+
+
+def test_failed_refresh_is_reported_until_one_succeeds(store):
+    _fail(store, "u1", "Access token expired")
+    assert serve_snapshot("u1") == (None, "Access token expired")
+
+    store.put("u1", PAYLOAD)
+    _, _, _, enqueued_at = store.claim()
+    store.finish("u1", enqueued_at, time.time())
+    recommendations, error = serve_snapshot("u1")
+    assert recommendations.recommendations[0].song == "So What" and error is None
+
+
+def test_stale_snapshot_is_served_with_the_failure(store):
+    store.put("u1", PAYLOAD)
+    _fail(store, "u1", "Spotify returned 503")
+
+    recommendations, error = serve_snapshot("u1")
+    assert recommendations is not None and error == "Spotify returned 503"
+    assert store.last_error("someone-else") is None
+
+
+class Response:
+    status_code = 200
+
+    def json(self):
+        return {"access_token": "fresh", "expires_in": 3600}
+
+
+def test_stale_user_is_refreshed_after_their_access_token_expired(store, tmp_path, monkeypatch):
+    from recommendation_engine import recommender
+    from spotify import tokens
+
+    manager = tokens.TokenManager(str(tmp_path / "tokens.sqlite3"))
+    requests = []
+    monkeypatch.setattr(tokens, "TOKENS", manager)
+    monkeypatch.setattr(tokens, "SPOTIFY_LIMITER", type("Limiter", (), {
+        "request": lambda self, send, url, data=None: requests.append(data) or Response()})())
+    now = time.time()
+    manager.remember("u1", "login", "refresh", now + 3600)
+    store.enqueue("u1", "login", now + 3600)
+    store.put("u1", PAYLOAD)
+    store.finish("u1", *store.claim()[3:], now)
+    store.enqueue("u2", "login", now + 3600)  # Not known to the token manager: nothing to mint a token from.
+    store.finish("u2", *store.claim()[3:], now)
+
+    # Seven hours on, the snapshot is stale and the hour-long access token long expired.
+    later = now + 7 * 60 * 60
+    monkeypatch.setattr(time, "time", lambda: later)
+    assert store.stale_users(6 * 60 * 60, manager.refreshable_users()) == ["u1"]
+
+    store.enqueue("u1")
+    stop = threading.Event()
+    served = []
+    monkeypatch.setattr(recommender, "recommend",
+                        lambda token: served.append(token) or stop.set() or (XRecommendations.parse_raw(PAYLOAD), None))
+    worker = threading.Thread(target=snapshots.run_worker, args=(store.path, 0.01, stop))
+    worker.start()
+    worker.join(10)
+    stop.set()
+    worker.join()
+
+    assert served == ["fresh"] and requests[0]["refresh_token"] == "refresh"
+    assert store.latest("u1")["version"] == 2 and store.last_error("u1") is None
+
+
+@pytest.fixture
+def client(monkeypatch):
+    pytest.importorskip("flask")
+    import app as web
+
+    monkeypatch.setattr(web, "SNAPSHOT_WORKERS", 1)
+    monkeypatch.setattr(web, "session_access_token", lambda session: "token")
+    client = web.app.test_client()
+    with client.session_transaction() as session:
+        session['user_id'] = "u1"
+    return web, client
+
+
+def test_home_renders_a_failed_refresh(client, monkeypatch):
+    web, client = client
+    monkeypatch.setattr(web, "serve_snapshot", lambda *args: (None, "Access token expired"))
+    page = client.get("/home").get_data(as_text=True)
+
+    assert "Preparing your recommendations failed: Access token expired" in page
+    assert 'http-equiv="refresh"' not in page
+
+
+def test_home_keeps_refreshing_while_a_snapshot_is_prepared(client, monkeypatch):
+    web, client = client
+    monkeypatch.setattr(web, "serve_snapshot", lambda *args: (None, None))
+
+    assert 'http-equiv="refresh"' in client.get("/home").get_data(as_text=True)
+
+
+def test_home_notes_a_failed_refresh_over_an_old_snapshot(client, monkeypatch):
+    web, client = client
+    monkeypatch.setattr(web, "serve_snapshot", lambda *args: (XRecommendations.parse_raw(PAYLOAD), "Spotify returned 503"))
+    page = client.get("/home").get_data(as_text=True)
+
+    assert "the latest refresh failed: Spotify returned 503" in page
+    assert "So What" in page
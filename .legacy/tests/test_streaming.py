@@ -0,0 +1,148 @@
+import asyncio
+import json
+
+import pytest
+
+pytest.importorskip("flask")
+pytest.importorskip("langchain")
+
+from recommendation_engine import recommender
+from utils.langchain_utils import ExplanationLLM, ParserError, RecommendationLLM, SinglePassLLM, XRecommendations
+
+RECOMMENDATIONS = [{"song": "Song A", "artist": "Artist A", "explanation": "Because."},
+                   {"song": "Song B", "artist": "Artist B", "explanation": "Also because."}]
+DOCUMENT = json.dumps({"recommendations": RECOMMENDATIONS})
+
+
+class FakeLLM:
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.calls = []
+        self.output_parser = self
+
+    def stream(self, *args):
+        self.calls.append(args)
+        yield from self.tokens
+
+    def parse(self, text):
+        return XRecommendations.parse_raw(text)
+
+
+class CallableLLM:
+    """Answers recommend's blocking and async calls with one result, or raises it."""
+
+    def __init__(self, result):
+        self.result = result
+        self.calls = []
+
+    def __call__(self, *args):
+        self.calls.append(args)
+        if isinstance(self.result, Exception):
+            raise self.result
+        return self.result
+
+    async def ainvoke(self, *args):
+        return self(*args)
+
+
+def _chunks(text, size=7):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+@pytest.fixture
+def pipeline(monkeypatch):
+    llms = {}
+    monkeypatch.setattr(recommender, "session_access_token", lambda session: "token")
+    monkeypatch.setattr(recommender, "fetch_inputs", lambda token: (["t"], ["a"], [{"name": "c", "artist": "x"}], None))
+    monkeypatch.setattr(recommender, "retrieve_context", lambda candidates: ["A snippet."])
+    monkeypatch.setattr(recommender, "get_llm", lambda cls: llms[cls])
+    return llms
+
+
+def test_single_pass_streams_items_then_the_result(pipeline, monkeypatch):
+    monkeypatch.setattr(recommender, "RECOMMENDATION_MODE", "single_pass")
+    pipeline[SinglePassLLM] = FakeLLM(_chunks(DOCUMENT))
+
+    events = list(recommender.stream_recommendations())
+
+    assert [event for event, _ in events] == ["item", "item", "result"]
+    assert [data for event, data in events if event == "item"] == RECOMMENDATIONS
+    assert [dict(rec) for rec in events[-1][1]] == RECOMMENDATIONS
+    # Retrieved snippets reach the single-pass prompt, not just the explanation pass.
+    assert pipeline[SinglePassLLM].calls[0][-1] == ["A snippet."]
+
+
+def test_two_stage_streams_recommendation_then_explanation_tokens(pipeline, monkeypatch):
+    monkeypatch.setattr(recommender, "RECOMMENDATION_MODE", "two_stage")
+    pipeline[RecommendationLLM] = FakeLLM(["Pick ", "Song A"])
+    pipeline[ExplanationLLM] = FakeLLM(_chunks(DOCUMENT))
+
+    events = list(recommender.stream_recommendations())
+    kinds = [event for event, _ in events]
+
+    assert kinds[:2] == ["recommendation", "recommendation"]
+    assert set(kinds[2:-1]) == {"explanation"}
+    assert kinds[-1] == "result"
+    assert "".join(data for event, data in events if event == "explanation") == DOCUMENT
+    # The explanation pass sees the full recommendation text.
+    assert pipeline[ExplanationLLM].calls == [("Pick Song A", ["A snippet."])]
+
+
+def test_unparseable_single_pass_falls_back_to_two_stages(pipeline, monkeypatch):
+    monkeypatch.setattr(recommender, "RECOMMENDATION_MODE", "single_pass")
+    pipeline[SinglePassLLM] = FakeLLM(["Sorry, I can't help with that."])
+    pipeline[RecommendationLLM] = FakeLLM(["Pick"])
+    pipeline[ExplanationLLM] = FakeLLM([DOCUMENT])
+
+    kinds = [event for event, _ in recommender.stream_recommendations()]
+
+    assert kinds == ["recommendation", "explanation", "result"]
+
+
+def test_unparseable_single_pass_call_falls_back_to_two_stages(pipeline, monkeypatch):
+    monkeypatch.setattr(recommender, "RECOMMENDATION_MODE", "single_pass")
+    pipeline[SinglePassLLM] = CallableLLM(ParserError("Response is not in the expected JSON format"))
+    pipeline[RecommendationLLM] = CallableLLM("Pick Song A")
+    pipeline[ExplanationLLM] = CallableLLM(XRecommendations.parse_raw(DOCUMENT))
+
+    recommendations, error = recommender.recommend("token")
+
+    assert error is None and recommendations == XRecommendations.parse_raw(DOCUMENT)
+    assert pipeline[ExplanationLLM].calls == [("Pick Song A", ["A snippet."])]
+
+
+@pytest.mark.parametrize("call", ["sync", "async"])
+def test_failed_single_pass_call_is_reported_without_falling_back(pipeline, monkeypatch, call):
+    monkeypatch.setattr(recommender, "RECOMMENDATION_MODE", "single_pass")
+
+    async def fetch_inputs_async(token):
+        return recommender.fetch_inputs(token)
+    monkeypatch.setattr(recommender, "fetch_inputs_async", fetch_inputs_async)
+    pipeline[SinglePassLLM] = CallableLLM(ConnectionError("Connection refused"))
+    pipeline[RecommendationLLM] = CallableLLM("Pick Song A")
+
+    if call == "sync":
+        result = recommender.recommend("token")
+    else:
+        result = asyncio.run(recommender.recommend_async("token"))
+
+    assert result == (None, "Error processing recommendations: Connection refused")
+    assert pipeline[RecommendationLLM].calls == []
+
+
+def test_missing_token_yields_a_single_error(pipeline, monkeypatch):
+    monkeypatch.setattr(recommender, "session_access_token", lambda session: None)
+    assert [event for event, _ in recommender.stream_recommendations()] == ["error"]
+
+
+def test_route_frames_events_in_order_and_ends_with_done(monkeypatch):
+    import app as web
+
+    monkeypatch.setattr(web, "stream_recommendations",
+                        lambda: iter([("item", RECOMMENDATIONS[0]), ("result", RECOMMENDATIONS)]))
+    response = web.app.test_client().get("/home/stream")
+
+    assert response.mimetype == "text/event-stream"
+    frames = response.get_data(as_text=True).split("\n\n")[:-1]
+    assert [frame.split("\n")[0] for frame in frames] == ["event: item", "event: result", "event: done"]
+    assert json.loads(frames[0].split("\n")[1][len("data: "):]) == RECOMMENDATIONS[0]
@@ -0,0 +1,149 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from spotify import tokens
+from spotify.tokens import TokenManager
+
+
+class Response:
+    def __init__(self, status_code, body=None):
+        self.status_code = status_code
+        self.body = body
+        self.text = str(body)
+
+    def json(self):
+        if self.body is None:
+            raise ValueError("Expecting value")
+        return self.body
+
+
+class TokenEndpoint:
+    """Stands in for the rate limiter in front of the token endpoint, answering from a list."""
+
+    def __init__(self, *responses, delay=0.0):
+        self.responses = list(responses)
+        self.delay = delay
+        self.calls = []
+
+    def request(self, send, url, data=None):
+        self.calls.append(data)
+        time.sleep(self.delay)
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+@pytest.fixture
+def manager(tmp_path):
+    return TokenManager(str(tmp_path / "tokens.sqlite3"), refresh_margin=300)
+
+
+def _lease(manager, user_id):
+    return manager.store.execute("SELECT lease_until FROM tokens WHERE key = ?", (f"user:{user_id}",))[0][0]
+
+
+def test_fresh_token_is_served_without_a_request(manager, monkeypatch):
+    endpoint = TokenEndpoint()
+    monkeypatch.setattr(tokens, "SPOTIFY_LIMITER", endpoint)
+    manager.remember("u1", "access", "refresh", time.time() + 3600)
+
+    assert manager.user_token("u1")[0] == "access"
+    assert endpoint.calls == []
+
+
+def test_due_token_is_refreshed_once_for_concurrent_callers(manager, monkeypatch):
+    endpoint = TokenEndpoint(Response(200, {"access_token": "new", "expires_in": 3600}), delay=0.1)
+    monkeypatch.setattr(tokens, "SPOTIFY_LIMITER", endpoint)
+    manager.remember("u1", "old", "refresh", time.time() + 60)
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(manager.user_token("u1"))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert [token for token, _ in results] == ["new"] * 4
+    assert len(endpoint.calls) == 1 and endpoint.calls[0]["refresh_token"] == "refresh"
+    assert manager.stats()['coalesced'] >= 1
+    # The refresh token is kept when Spotify doesn't rotate it, and another process sees the new token.
+    other = TokenManager(manager.store.path)
+    assert other.user_token("u1")[0] == "new"
+    assert other.store.execute("SELECT refresh_token, lease_until FROM tokens")[0] == ("refresh", 0)
+
+
+@pytest.mark.parametrize("response", [Response(200, None), Response(200, {"access_token": "new"})])
+def test_lease_is_released_when_the_response_is_unusable(manager, monkeypatch, response):
+    monkeypatch.setattr(tokens, "SPOTIFY_LIMITER", TokenEndpoint(response))
+    manager.remember("u1", "old", "refresh", time.time() + 60)
+
+    with pytest.raises((ValueError, KeyError)):
+        manager.user_token("u1")
+    assert _lease(manager, "u1") == 0
+
+
+def test_transient_failure_keeps_the_old_token(manager, monkeypatch):
+    monkeypatch.setattr(tokens, "SPOTIFY_LIMITER", TokenEndpoint(Response(503, {"error": "unavailable"})))
+    manager.remember("u1", "old", "refresh", time.time() + 60)
+
+    assert manager.user_token("u1")[0] == "old"
+    assert _lease(manager, "u1") == 0
+    assert manager.stats()['failures'] == 1
+
+
+def test_revoked_grant_forgets_the_user(manager, monkeypatch):
+    monkeypatch.setattr(tokens, "SPOTIFY_LIMITER", TokenEndpoint(Response(400, {"error": "invalid_grant"})))
+    manager.remember("u1", "old", "refresh", time.time() + 60)
+
+    assert manager.user_token("u1") is None
+    assert manager.store.execute("SELECT COUNT(*) FROM tokens")[0][0] == 0
+
+
+def test_another_process_holding_the_lease_is_not_raced(manager, monkeypatch):
+    endpoint = TokenEndpoint()
+    monkeypatch.setattr(tokens, "SPOTIFY_LIMITER", endpoint)
+    manager.remember("u1", "old", "refresh", time.time() + 60)
+    manager.store.execute("UPDATE tokens SET lease_until = ?", (time.time() + 15,))
+
+    assert TokenManager(manager.store.path).user_token("u1")[0] == "old"
+    assert endpoint.calls == []
+
+
+def test_refresher_only_refreshes_recent_users(manager, monkeypatch):
+    endpoint = TokenEndpoint(Response(200, {"access_token": "new", "expires_in": 3600}))
+    monkeypatch.setattr(tokens, "SPOTIFY_LIMITER", endpoint)
+    manager.remember("recent", "old", "refresh", time.time() + 60)
+    manager.remember("idle", "old", "refresh", time.time() + 60)
+    manager.store.execute("UPDATE tokens SET used_at = 0 WHERE key = 'user:idle'")
+    manager.store.ensure("client:someone-else")
+
+    assert manager.refresh_due() == 1
+    assert len(endpoint.calls) == 1
+
+
+@pytest.mark.parametrize("call", ["sync", "async"])
+def test_revoked_session_tokens_are_cleared(manager, monkeypatch, call):
+    endpoint = TokenEndpoint(Response(400, {"error": "invalid_grant"}))
+    monkeypatch.setattr(tokens, "SPOTIFY_LIMITER", endpoint)
+    monkeypatch.setattr(tokens, "TOKENS", manager)
+    remembered_on = []
+    remember = manager.remember
+    monkeypatch.setattr(manager, "remember", lambda *args: remembered_on.append(threading.get_ident()) or remember(*args))
+    # Logged in before the token manager knew the user, with a refresh token Spotify has since revoked.
+    session = {"user_id": "u1", "access_token": "old", "refresh_token": "revoked", "expires_at": time.time() - 60}
+
+    for _ in range(2):
+        if call == "sync":
+            assert tokens.session_access_token(session) is None
+        else:
+            assert asyncio.run(tokens.session_access_token_async(session)) is None
+
+    assert session == {"user_id": "u1"}
+    assert len(endpoint.calls) == 1 and len(remembered_on) == 1
+    assert manager.store.execute("SELECT COUNT(*) FROM tokens")[0][0] == 0
+    # The async variant keeps the SQLite write off the event loop's thread.
+    assert (remembered_on[0] == threading.get_ident()) == (call == "sync")
@@ -1,25 +1,33 @@
 from connection.neo4j import Neo4jConnection
-from utils.nodes import create_node
-from utils.nodes import create_node
-from utils.relationships import create_relationship
+from utils.schema import create_schema
 from utils.query import get_all_nodes, get_all_relationships
+from utils.sync import SyncWriter
+from spotify.crawler import GraphWriter
 from config.settings import NEO4J_URI, NEO4J_USER, NEO4J_PASSWORD
 
 
-def build_knowledge_graph():
+def build_knowledge_graph(batch_size=1000, incremental=False, reset=False):
+    """
+    :param batch_size: Rows per UNWIND statement
+    :param incremental: Write only rows that changed since the last incremental build (see utils.sync)
+    :param reset: With incremental, clear the sync state first and write everything again
+    """
     conn = Neo4jConnection(uri=NEO4J_URI, user=NEO4J_USER, pwd=NEO4J_PASSWORD)
-
-    create_node(conn, "Song", {"song_id": "1", "name": "Song A", "duration_ms": 210000})
-    create_node(conn, "Artist", {"artist_id": "1", "name": "Artist X"})
-    create_node(conn, "Album", {"album_id": "1", "name": "Album 1", "release_date": "2020-05-01"})
-    create_node(conn, "Genre", {"name": "Pop"})
-
-    create_relationship(conn, "Song", "Artist", {"song_id": "1"}, {"artist_id": "1"}, "PERFORMED_BY")
-    create_relationship(conn, "Song", "Album", {"song_id": "1"}, {"album_id": "1"}, "PART_OF_ALBUM")
-    create_relationship(conn, "Song", "Genre", {"song_id": "1"}, {"name": "Pop"}, "HAS_GENRE")
-
-    create_node(conn, "Feature", {"name": "Strong Bassline"})
-    create_relationship(conn, "Song", "Feature", {"song_id": "1"}, {"name": "Strong Bassline"}, "HAS_FEATURE")
+    create_schema(conn)
+    writer = SyncWriter(conn, batch_size=batch_size, reset=reset) if incremental else GraphWriter(conn, batch_size)
+
+    writer.nodes("Song", [{"song_id": "1", "name": "Song A", "duration_ms": 210000}])
+    writer.nodes("Artist", [{"artist_id": "1", "name": "Artist X"}])
+    writer.nodes("Album", [{"album_id": "1", "name": "Album 1", "release_date": "2020-05-01"}])
+    writer.nodes("Genre", [{"name": "Pop"}])
+    writer.nodes("Feature", [{"name": "Strong Bassline"}])
+
+    writer.relationships("Song", "Artist", [({"song_id": "1"}, {"artist_id": "1"})], "PERFORMED_BY")
+    writer.relationships("Song", "Album", [({"song_id": "1"}, {"album_id": "1"})], "PART_OF_ALBUM")
+    writer.relationships("Song", "Genre", [({"song_id": "1"}, {"name": "Pop"})], "HAS_GENRE")
+    writer.relationships("Song", "Feature", [({"song_id": "1"}, {"name": "Strong Bassline"})], "HAS_FEATURE")
+    if incremental:
+        writer.finish()
 
     print("Nodes in the DB:")
     get_all_nodes(conn)
@@ -30,5 +38,8 @@ def build_knowledge_graph():
     conn.close()
 
 if __name__ == "__main__":
-    build_knowledge_graph()
+    import logging
+    import sys
 
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    build_knowledge_graph(incremental="--incremental" in sys.argv[1:], reset="--reset" in sys.argv[1:])
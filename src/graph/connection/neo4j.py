@@ -1,4 +1,56 @@
-from neo4j import GraphDatabase
+from contextlib import contextmanager
+
+from neo4j import GraphDatabase, READ_ACCESS, WRITE_ACCESS
+
+
+def _consume(tx, statements):
+    """Run every buffered statement inside one managed transaction."""
+    results = []
+    for query, parameters in statements:
+        results.append(list(tx.run(query, parameters)))
+    return results
+
+
+class UnitOfWork:
+    """
+    A group of statements sharing one session.
+
+    Write units buffer their statements and send them as a single managed transaction on
+    commit(); the driver retries the whole transaction on transient errors and routes it to
+    the leader. Read units run each statement as its own managed read transaction, routed
+    to a follower when the database is clustered.
+    """
+
+    def __init__(self, session, access_mode):
+        self.__session = session
+        self.__access_mode = access_mode
+        self.__statements = []
+
+    def run(self, query, parameters=None):
+        """
+        Queue a write statement, or run a read statement and return its records.
+        :param query: Cypher query
+        :param parameters: Dictionary of query parameters
+        """
+        if self.__access_mode == WRITE_ACCESS:
+            self.__statements.append((query, parameters))
+            return None
+        return self.__session.execute_read(lambda tx: list(tx.run(query, parameters)))
+
+    def commit(self):
+        """
+        Send the buffered write statements in one transaction and clear the buffer.
+        :return: List of record lists, one per statement
+        """
+        if not self.__statements:
+            return []
+        statements, self.__statements = self.__statements, []
+        return self.__session.execute_write(_consume, statements)
+
+    def rollback(self):
+        """Drop any statements that have not been committed yet."""
+        self.__statements = []
+
 
 class Neo4jConnection:
 
@@ -29,4 +81,71 @@ class Neo4jConnection:
         finally:
             if session is not None:
                 session.close()
-        return response
\ No newline at end of file
+        return response
+
+    def stream(self, query, parameters=None, db='neo4j', fetch_size=1000, project=None):
+        """
+        Run a read query and yield its records lazily, fetch_size records at a time, so
+        large results never sit in memory all at once. The session stays open until the
+        generator is exhausted or closed.
+        :param project: None to yield Record objects, 'dict' for plain dicts keyed by column
+                        or 'tuple' for plain tuples in column order. Both plain modes convert
+                        nodes and relationships to property dicts.
+        """
+        assert self.__driver is not None, "Driver not initialized!"
+        if project not in (None, 'dict', 'tuple'):
+            raise ValueError(f"Unknown projection: {project}")
+
+        session = self.__driver.session(database=db, default_access_mode=READ_ACCESS, fetch_size=fetch_size)
+        try:
+            for record in session.run(query, parameters):
+                if project == 'dict':
+                    yield record.data()
+                elif project == 'tuple':
+                    yield tuple(record.data().values())
+                else:
+                    yield record
+        finally:
+            session.close()
+
+    @contextmanager
+    def write_tx(self, db='neo4j'):
+        """
+        Open a write unit of work on one session. Statements queued with tx.run() are
+        committed together when the block exits (or earlier via tx.commit()), and are
+        discarded if the block raises.
+
+            with conn.write_tx() as tx:
+                tx.run("CREATE (n:Genre {name: $name})", {"name": "Pop"})
+        """
+        with self.__unit_of_work(db, WRITE_ACCESS) as tx:
+            yield tx
+            try:
+                tx.commit()
+            except Exception as e:
+                print(f"Transaction failed: {e}")
+                raise
+
+    @contextmanager
+    def read_tx(self, db='neo4j'):
+        """
+        Open a read unit of work on one session; tx.run() returns the records directly.
+
+            with conn.read_tx() as tx:
+                songs = tx.run("MATCH (s:Song) RETURN s.name AS name LIMIT 10")
+        """
+        with self.__unit_of_work(db, READ_ACCESS) as tx:
+            yield tx
+
+    @contextmanager
+    def __unit_of_work(self, db, access_mode):
+        assert self.__driver is not None, "Driver not initialized!"
+        session = self.__driver.session(database=db, default_access_mode=access_mode)
+        tx = UnitOfWork(session, access_mode)
+        try:
+            yield tx
+        except Exception:
+            tx.rollback()
+            raise
+        finally:
+            session.close()
@@ -0,0 +1,28 @@
+"""
+The persistent response cache for Spotify metadata, shared with the web app.
+
+The implementation lives in .legacy/src/spotify/cache.py and is loaded through spotify.shared,
+so the crawler's cache and the web app's stay one format. SpotifyCrawler stores every artist,
+album and track it fetches here under 'artist', 'album' and 'track', keyed by Spotify ID, and
+the web app's feature store is built from those entries. The database is opened on first use.
+
+Classes:
+    ResponseCache: Two-tier (memory LRU + SQLite) cache with per-endpoint TTLs
+
+Functions:
+    cached: Decorator caching a fetch function's result under an endpoint, keyed by its arguments
+
+Attributes:
+    SPOTIFY_CACHE: The process-wide cache used by the Spotify fetchers
+"""
+
+from spotify.shared import load_shared
+
+
+_shared = load_shared("cache")
+
+DAY = _shared.DAY
+DEFAULT_TTLS = _shared.DEFAULT_TTLS
+ResponseCache = _shared.ResponseCache
+cached = _shared.cached
+SPOTIFY_CACHE = _shared.SPOTIFY_CACHE
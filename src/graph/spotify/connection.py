@@ -1,11 +1,17 @@
 import spotipy
-from spotipy.oauth2 import SpotifyClientCredentials
 from config.settings import SPOTIFY_CLIENT_ID, SPOTIFY_CLIENT_SECRET
+from spotify.ratelimit import RateLimitedSession, SPOTIFY_LIMITER
+from spotify.tokens import SharedClientCredentials
+
+_credentials = None
 
 def authenticate_spotify():
-    client_credentials_manager = SpotifyClientCredentials(
-        client_id=SPOTIFY_CLIENT_ID,
-        client_secret=SPOTIFY_CLIENT_SECRET
-    )
-    sp = spotipy.Spotify(client_credentials_manager=client_credentials_manager)
-    return sp
\ No newline at end of file
+    """
+    Authenticate with Spotify using Spotipy, pacing every call through the shared rate limiter.
+    Clients share one client-credentials token per process, cached on disk across processes.
+    """
+    global _credentials
+    if _credentials is None:
+        _credentials = SharedClientCredentials(SPOTIFY_CLIENT_ID, SPOTIFY_CLIENT_SECRET)
+    # Passing our own session bypasses spotipy's retry adapter; the limiter retries instead.
+    return spotipy.Spotify(auth_manager=_credentials, requests_session=RateLimitedSession(SPOTIFY_LIMITER))
@@ -0,0 +1,295 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from spotify.cache import SPOTIFY_CACHE
+from utils.batch import batched
+from utils.nodes import create_nodes_bulk
+from utils.relationships import create_relationships_bulk
+from utils.sync import SyncWriter
+
+# Maximum IDs accepted by Spotify's multi-ID endpoints.
+ARTISTS_PER_CALL = 50
+ALBUMS_PER_CALL = 20
+TRACKS_PER_CALL = 50
+
+
+class CrawlStats:
+    """Thread-safe counters for API pages fetched, IDs resolved and IDs served from the cache."""
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.start = time.perf_counter()
+        self.pages = 0
+        self.ids = 0
+        self.cached = 0
+
+    def record(self, ids=0):
+        with self.__lock:
+            self.pages += 1
+            self.ids += ids
+
+    def record_cached(self, ids):
+        with self.__lock:
+            self.cached += ids
+
+    def report(self):
+        elapsed = time.perf_counter() - self.start
+        pages_rate = self.pages / elapsed if elapsed > 0 else float("inf")
+        ids_rate = self.ids / elapsed if elapsed > 0 else float("inf")
+        print(f"Crawled {self.pages} pages / {self.ids} IDs in {elapsed:.2f}s "
+              f"({pages_rate:.1f} pages/sec, {ids_rate:.1f} IDs/sec), {self.cached} IDs from the cache")
+
+
+class GraphWriter:
+    """Sends crawled rows to the graph through the bulk upsert path."""
+
+    def __init__(self, conn, batch_size=1000):
+        self.conn = conn
+        self.batch_size = batch_size
+
+    def nodes(self, label, rows):
+        if rows:
+            create_nodes_bulk(self.conn, label, rows, self.batch_size, upsert=True)
+
+    def relationships(self, label1, label2, pairs, relationship_type):
+        if pairs:
+            create_relationships_bulk(self.conn, label1, label2, pairs, relationship_type, self.batch_size)
+
+
+class SpotifyCrawler:
+    """
+    Breadth-first crawl of the Spotify catalog: artists -> albums -> tracks -> related artists.
+
+    Every stage uses the multi-ID endpoints and fans its calls out over a bounded worker pool.
+    Each stage's results are handed to the writer as soon as the stage completes, so memory
+    holds at most one frontier of the crawl.
+
+    With a response cache, artists, albums and tracks are looked up there first, one entry per ID
+    under the 'artist', 'album' and 'track' endpoints; only the misses are fetched, and they are
+    cached as they arrive. The web app's feature store is built from these entries.
+    """
+
+    def __init__(self, sp, writer, workers=8, max_artists=1000, cache=None):
+        """
+        :param sp: spotipy.Spotify client (set sp.prefix to point it at a stub API)
+        :param writer: Object with nodes(label, rows) and relationships(label1, label2, pairs, type)
+        :param workers: Maximum concurrent Spotify calls
+        :param max_artists: Stop expanding the frontier after this many artists
+        :param cache: spotify.cache.ResponseCache to read and fill, or None to always fetch
+        """
+        self.sp = sp
+        self.writer = writer
+        self.cache = cache
+        self.workers = workers
+        self.max_artists = max_artists
+        self.stats = CrawlStats()
+        self.seen_artists = set()
+        self.seen_albums = set()
+        self.seen_tracks = set()
+
+    def crawl(self, seed_artist_ids):
+        frontier = list(dict.fromkeys(seed_artist_ids))
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            while frontier and len(self.seen_artists) < self.max_artists:
+                frontier = frontier[:self.max_artists - len(self.seen_artists)]
+                self.seen_artists.update(frontier)
+
+                artists = self._fetch_artists(pool, frontier)
+                genres_by_artist = {artist['id']: artist.get('genres', []) for artist in artists}
+                album_ids = self._fetch_artist_album_ids(pool, frontier)
+                track_ids = self._fetch_albums(pool, album_ids)
+                self._fetch_tracks(pool, track_ids, genres_by_artist)
+
+                frontier = self._fetch_related_artist_ids(pool, frontier)
+
+        self.stats.report()
+        return self.stats
+
+    def _fetch_artists(self, pool, artist_ids):
+        artists = []
+        for page in pool.map(self._artists_page, batched(artist_ids, ARTISTS_PER_CALL)):
+            artists.extend(artist for artist in page if artist)
+
+        self.writer.nodes("Artist", [
+            {"artist_id": artist['id'], "name": artist['name'], "popularity": artist.get('popularity')}
+            for artist in artists
+        ])
+        genres = {genre for artist in artists for genre in artist.get('genres', [])}
+        self.writer.nodes("Genre", [{"name": genre} for genre in genres])
+        self.writer.relationships("Artist", "Genre", [
+            ({"artist_id": artist['id']}, {"name": genre})
+            for artist in artists for genre in artist.get('genres', [])
+        ], "HAS_GENRE")
+        return artists
+
+    def _fetch_artist_album_ids(self, pool, artist_ids):
+        album_ids = []
+        for ids in pool.map(self._artist_album_ids, artist_ids):
+            for album_id in ids:
+                if album_id not in self.seen_albums:
+                    self.seen_albums.add(album_id)
+                    album_ids.append(album_id)
+        return album_ids
+
+    def _fetch_albums(self, pool, album_ids):
+        albums = []
+        for page in pool.map(self._albums_page, batched(album_ids, ALBUMS_PER_CALL)):
+            albums.extend(album for album in page if album)
+
+        self.writer.nodes("Album", [
+            {"album_id": album['id'], "name": album['name'], "release_date": album.get('release_date')}
+            for album in albums
+        ])
+
+        track_ids = []
+        for ids in pool.map(self._album_track_ids, albums):
+            for track_id in ids:
+                if track_id not in self.seen_tracks:
+                    self.seen_tracks.add(track_id)
+                    track_ids.append(track_id)
+        return track_ids
+
+    def _fetch_tracks(self, pool, track_ids, genres_by_artist):
+        tracks = []
+        for page in pool.map(self._tracks_page, batched(track_ids, TRACKS_PER_CALL)):
+            tracks.extend(track for track in page if track)
+
+        self.writer.nodes("Song", [
+            {"song_id": track['id'], "name": track['name'], "duration_ms": track.get('duration_ms'),
+             "popularity": track.get('popularity')}
+            for track in tracks
+        ])
+        # Artists first seen as track credits are upserted with just their key and name.
+        self.writer.nodes("Artist", [
+            {"artist_id": artist['id'], "name": artist['name']}
+            for track in tracks for artist in track['artists']
+            if artist.get('id') and artist['id'] not in genres_by_artist
+        ])
+        self.writer.relationships("Song", "Artist", [
+            ({"song_id": track['id']}, {"artist_id": artist['id']})
+            for track in tracks for artist in track['artists'] if artist.get('id')
+        ], "PERFORMED_BY")
+        self.writer.relationships("Song", "Album", [
+            ({"song_id": track['id']}, {"album_id": track['album']['id']})
+            for track in tracks if track.get('album')
+        ], "PART_OF_ALBUM")
+        self.writer.relationships("Song", "Genre", list({
+            (track['id'], genre): ({"song_id": track['id']}, {"name": genre})
+            for track in tracks for artist in track['artists']
+            for genre in genres_by_artist.get(artist.get('id'), [])
+        }.values()), "HAS_GENRE")
+
+    def _fetch_related_artist_ids(self, pool, artist_ids):
+        related = {}
+        for ids in pool.map(self._related_artist_ids, artist_ids):
+            for artist_id in ids:
+                if artist_id not in self.seen_artists:
+                    related[artist_id] = None
+        return list(related)
+
+    def _artists_page(self, ids):
+        return self._cached_page('artist', ids, lambda missing: self.sp.artists(missing)['artists'])
+
+    def _albums_page(self, ids):
+        return self._cached_page('album', ids, lambda missing: self.sp.albums(missing)['albums'])
+
+    def _tracks_page(self, ids):
+        return self._cached_page('track', ids, lambda missing: self.sp.tracks(missing)['tracks'])
+
+    def _cached_page(self, endpoint, ids, fetch):
+        """
+        Resolve a page of IDs, in order, serving fresh ones from the cache. The rest are fetched
+        with one multi-ID call and cached one entry per ID; IDs Spotify doesn't know resolve to None.
+        :param endpoint: Cache endpoint, e.g. 'artist'
+        :param ids: IDs to resolve, at most one multi-ID call's worth
+        :param fetch: Called with the missing IDs; returns their objects in the same order
+        """
+        if self.cache is None:
+            page = fetch(ids)
+            self.stats.record(len(ids))
+            return page
+
+        objects = {item_id: self.cache.get(endpoint, item_id) for item_id in ids}
+        missing = [item_id for item_id, item in objects.items() if item is None]
+        self.stats.record_cached(len(objects) - len(missing))
+        if missing:
+            for item_id, item in zip(missing, fetch(missing)):
+                if item:
+                    self.cache.set(endpoint, item_id, item)
+                objects[item_id] = item
+            self.stats.record(len(missing))
+        return [objects[item_id] for item_id in ids]
+
+    def _artist_album_ids(self, artist_id):
+        return self._paged_ids(self.sp.artist_albums(artist_id, album_type='album,single', limit=50))
+
+    def _album_track_ids(self, album):
+        return self._paged_ids(album['tracks'], counted=False)
+
+    def _related_artist_ids(self, artist_id):
+        artists = self.sp.artist_related_artists(artist_id)['artists']
+        self.stats.record(len(artists))
+        return [artist['id'] for artist in artists]
+
+    def _paged_ids(self, page, counted=True):
+        """Collect item IDs across a paging object, following its next links."""
+        ids = []
+        while page:
+            if counted:
+                self.stats.record(len(page['items']))
+            ids.extend(item['id'] for item in page['items'] if item.get('id'))
+            page = self.sp.next(page) if page.get('next') else None
+            counted = True
+        return ids
+
+
+def crawl_catalog(sp, conn, seed_artist_ids, workers=8, max_artists=1000, batch_size=1000, incremental=False,
+                  prune=False, reset=False, cache=SPOTIFY_CACHE):
+    """
+    Crawl the catalog from seed artists and upsert everything found into the graph.
+    :param sp: spotipy.Spotify client
+    :param conn: Neo4jConnection object
+    :param seed_artist_ids: Spotify artist IDs to start from
+    :param workers: Maximum concurrent Spotify calls
+    :param max_artists: Upper bound on artists visited
+    :param batch_size: Rows per UNWIND statement
+    :param incremental: Write only rows that changed since the last incremental run (see utils.sync)
+    :param prune: With incremental, also delete everything this crawl did not see; only use it
+                  when the crawl covers the whole catalog
+    :param reset: With incremental, clear the sync state first and write everything again
+    :param cache: Response cache serving and storing the fetched objects, or None to always fetch
+    :return: CrawlStats for the run
+    """
+    writer = SyncWriter(conn, batch_size=batch_size, reset=reset) if incremental else GraphWriter(conn, batch_size)
+    stats = SpotifyCrawler(sp, writer, workers, max_artists, cache).crawl(seed_artist_ids)
+    if incremental:
+        writer.finish(prune)
+    return stats
+
+
+# Run from src/graph: python -m spotify.crawler [--incremental [--prune] [--reset]] [--no-cache] <seed_artist_id> [<seed_artist_id> ...]
+if __name__ == "__main__":
+    import argparse
+    import logging
+    from connection.neo4j import Neo4jConnection
+    from spotify.connection import authenticate_spotify
+    from utils.schema import create_schema
+    from config.settings import NEO4J_URI, NEO4J_USER, NEO4J_PASSWORD
+
+    parser = argparse.ArgumentParser(description="Crawl the Spotify catalog into the graph")
+    parser.add_argument("seeds", nargs="+", help="Spotify artist IDs to start from")
+    parser.add_argument("--incremental", action="store_true", help="Write only what changed since the last run")
+    parser.add_argument("--prune", action="store_true", help="With --incremental, delete what this crawl did not see")
+    parser.add_argument("--reset", action="store_true",
+                        help="With --incremental, forget the sync state and write everything again")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Fetch everything from Spotify instead of serving fresh objects from the response cache")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    conn = Neo4jConnection(uri=NEO4J_URI, user=NEO4J_USER, pwd=NEO4J_PASSWORD)
+    create_schema(conn)
+    crawl_catalog(authenticate_spotify(), conn, args.seeds, incremental=args.incremental, prune=args.prune,
+                  reset=args.reset, cache=None if args.no_cache else SPOTIFY_CACHE)
+    conn.close()
@@ -0,0 +1,33 @@
+"""
+The shared rate limiter for outbound Spotify calls, and its spotipy adapter.
+
+RateLimiter and SPOTIFY_LIMITER are the web app's (.legacy/src/spotify/ratelimit.py), loaded
+through spotify.shared, so the crawler and the web app throttle and retry the same way. The
+crawler has no event loop and only uses the synchronous half.
+
+Classes:
+    RateLimitedSession: requests.Session that sends every request through a RateLimiter
+
+Attributes:
+    SPOTIFY_LIMITER: The process-wide limiter used by the Spotify clients
+"""
+
+import requests
+
+from spotify.shared import load_shared
+
+
+_ratelimit = load_shared("ratelimit")
+RateLimiter = _ratelimit.RateLimiter
+SPOTIFY_LIMITER = _ratelimit.SPOTIFY_LIMITER
+
+
+class RateLimitedSession(requests.Session):
+    """A requests.Session whose requests all go through a shared RateLimiter."""
+
+    def __init__(self, limiter: RateLimiter = None):
+        super().__init__()
+        self.limiter = limiter or SPOTIFY_LIMITER
+
+    def request(self, method, url, *args, **kwargs):
+        return self.limiter.request(super().request, method, url, *args, **kwargs)
@@ -0,0 +1,33 @@
+"""
+Loads modules shared with the web app.
+
+Some Spotify plumbing has one implementation, in .legacy/src/spotify. This tree is imported from
+src/graph and cannot import the web app's packages, so those files are loaded directly instead of
+being copied here. They need nothing outside the standard library.
+
+Functions:
+    load_shared: Load a module from .legacy/src/spotify by file name
+"""
+
+import importlib.util
+import os
+import sys
+
+
+SHARED_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir,
+                                           os.pardir, ".legacy", "src", "spotify"))
+
+
+def load_shared(module: str):
+    """
+    Load .legacy/src/spotify/<module>.py once per process.
+    :param module: Module name, e.g. 'cache'
+    :return: The loaded module
+    """
+    name = f"_shared_spotify_{module}"
+    if name not in sys.modules:
+        spec = importlib.util.spec_from_file_location(name, os.path.join(SHARED_DIR, f"{module}.py"))
+        loaded = importlib.util.module_from_spec(spec)
+        sys.modules[name] = loaded
+        spec.loader.exec_module(loaded)
+    return sys.modules[name]
@@ -0,0 +1,93 @@
+"""
+A client-credentials token cache shared across processes.
+
+spotipy's SpotifyClientCredentials keeps its token per manager instance, so every new client
+(and every crawler process) paid for a token request, and a token was only replaced once expired.
+SharedClientCredentials stores the token in a local SQLite file shared by all processes, refreshes
+it ahead of expiry, and coalesces concurrent refreshes into one request: threads in a process
+queue on a lock, and processes take a short lease on the token's row so only one of them calls
+the token endpoint while the others keep using the current token.
+
+The token table and its lease are the web app's TokenStore (.legacy/src/spotify/token_store.py),
+loaded through spotify.shared, so both trees read and write one format.
+
+Classes:
+    SharedClientCredentials: spotipy auth manager backed by the shared token cache
+"""
+
+import os
+import threading
+import time
+
+import requests
+
+from spotify.ratelimit import SPOTIFY_LIMITER
+from spotify.shared import load_shared
+
+
+TOKEN_URL = os.getenv("SPOTIFY_TOKEN_URL", "https://accounts.spotify.com/api/token")
+TOKEN_PATH = os.getenv("SPOTIFY_TOKEN_PATH", "data/spotify_tokens.sqlite3")
+
+TokenStore = load_shared("token_store").TokenStore
+
+
+########################
+## Client Credentials ##
+########################
+
+
+class SharedClientCredentials:
+    """Pass as spotipy.Spotify(auth_manager=...); spotipy asks it for a token before every request."""
+
+    def __init__(self, client_id: str, client_secret: str, path: str = TOKEN_PATH, refresh_margin: int = 300,
+                 lease: int = 15):
+        """
+        Args:
+            path: SQLite file shared by every process using these credentials
+            refresh_margin: Seconds before expiry at which the token is refreshed
+            lease: Seconds a process may hold the refresh before others may take it over
+        """
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.store = TokenStore(path, lease)
+        self.refresh_margin = refresh_margin
+        self.key = f"client:{client_id}"
+        self._lock = threading.Lock()
+        self._token = None
+        self.refreshes = 0
+
+    def __repr__(self) -> str:
+        return f"SharedClientCredentials(path={self.store.path!r}, refreshes={self.refreshes})"
+
+    def get_access_token(self, as_dict: bool = False):
+        """Return the current token, refreshing it first when it is within refresh_margin of expiry."""
+        token = self._token
+        if token is None or token[1] - self.refresh_margin <= time.time():
+            with self._lock:
+                # Threads that queued here behind a refresh find the new token on entry.
+                token = self._token
+                if token is None or token[1] - self.refresh_margin <= time.time():
+                    self.store.ensure(self.key)
+                    token = self._token = self.store.refresh(self.key, self.refresh_margin, self._request)
+        if as_dict:
+            return {'access_token': token[0], 'token_type': 'Bearer', 'expires_at': int(token[1]),
+                    'expires_in': int(token[1] - time.time())}
+        return token[0]
+
+    def _request(self, refresh_token: str, access_token: str, expires_at: float):
+        """Call the token endpoint while holding the row's lease and store the result."""
+        response = SPOTIFY_LIMITER.request(requests.post, TOKEN_URL, timeout=10, data={
+            'grant_type': 'client_credentials', 'client_id': self.client_id, 'client_secret': self.client_secret})
+        if response.status_code != 200:
+            # Keep serving the old token until it actually expires.
+            if access_token and expires_at > time.time():
+                print(f"Client-credentials refresh failed: {response.status_code}")
+                return access_token, expires_at
+            raise RuntimeError(f"Client-credentials token request failed: {response.status_code} {response.text[:200]}")
+
+        token_info = response.json()
+        access_token = token_info['access_token']
+        expires_at = time.time() + token_info['expires_in']
+        self.store.save(self.key, access_token, expires_at)
+        self.refreshes += 1
+        return access_token, expires_at
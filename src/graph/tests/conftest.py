@@ -0,0 +1,48 @@
+import pytest
+
+# Every graph module imports the Neo4j driver through connection.neo4j.
+pytest.importorskip("neo4j")
+
+
+class FakeUnitOfWork:
+    def __init__(self, log):
+        self.log = log
+
+    def run(self, query, parameters=None):
+        self.log.append((query, list((parameters or {}).get("rows", []))))
+
+    def commit(self):
+        pass
+
+
+class FakeConnection:
+    """Records the statements the bulk helpers send instead of talking to Neo4j."""
+
+    def __init__(self):
+        self.statements = []
+        self.queries = []
+
+    def write_tx(self):
+        connection = self
+
+        class _Context:
+            def __enter__(self):
+                return FakeUnitOfWork(connection.statements)
+
+            def __exit__(self, *exc):
+                return False
+
+        return _Context()
+
+    def query(self, query, parameters=None):
+        self.queries.append((query, parameters))
+        return []
+
+    def rows(self, fragment):
+        """All rows sent by statements containing fragment."""
+        return [row for query, rows in self.statements if fragment in query for row in rows]
+
+
+@pytest.fixture
+def conn():
+    return FakeConnection()
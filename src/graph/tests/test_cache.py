@@ -0,0 +1,31 @@
+import os
+
+from spotify import cache
+from spotify.shared import SHARED_DIR
+
+
+def test_cache_is_the_web_apps_implementation():
+    assert os.path.samefile(cache._shared.__file__, os.path.join(SHARED_DIR, "cache.py"))
+
+
+def test_database_is_opened_on_first_use(tmp_path):
+    path = tmp_path / "nested" / "cache.sqlite3"
+    store = cache.ResponseCache(str(path))
+    assert not path.parent.exists()
+
+    calls = []
+    fetch = lambda: calls.append(1) or {"id": "a"}
+    assert store.get_or_fetch("artist", "a", fetch) == {"id": "a"}
+    assert store.get_or_fetch("artist", "a", fetch) == {"id": "a"}
+    assert calls == [1]
+    assert path.exists()
+
+    # A new process-level cache finds the entry on disk.
+    assert cache.ResponseCache(str(path)).get("artist", "a") == {"id": "a"}
+
+
+def test_empty_results_are_not_cached(tmp_path):
+    store = cache.ResponseCache(str(tmp_path / "cache.sqlite3"))
+    assert store.get_or_fetch("track", "t", lambda: None) is None
+    assert store.stats()["misses"] == 1
+    assert store.get("track", "t") is None
@@ -0,0 +1,164 @@
+import importlib.util
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+spotipy = pytest.importorskip("spotipy")
+
+from spotify.cache import ResponseCache
+from spotify.crawler import SpotifyCrawler
+from spotify.shared import SHARED_DIR
+
+# Two artists related to each other; each has one album of two tracks, and "b" has a second page of albums.
+ARTISTS = {"a": {"id": "a", "name": "Artist A", "popularity": 50, "genres": ["indie"]},
+           "b": {"id": "b", "name": "Artist B", "popularity": 40, "genres": ["indie", "rock"]}}
+ALBUMS = {"al1": ("a", ["t1", "t2"]), "al2": ("b", ["t3"]), "al3": ("b", ["t4"])}
+RELATED = {"a": ["b"], "b": ["a"]}
+
+
+def _track(track_id):
+    album_id = next(album for album, (_, tracks) in ALBUMS.items() if track_id in tracks)
+    artist_id = ALBUMS[album_id][0]
+    return {"id": track_id, "name": f"Track {track_id}", "duration_ms": 1000, "popularity": 10,
+            "album": {"id": album_id}, "artists": [{"id": artist_id, "name": ARTISTS[artist_id]["name"]}]}
+
+
+class StubSpotify(BaseHTTPRequestHandler):
+    requests = []
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+        parts = url.path.strip("/").split("/")[1:]
+        StubSpotify.requests.append(url.path.rstrip("/"))
+        base = f"http://127.0.0.1:{self.server.server_port}/v1"
+
+        if parts == ["artists"]:
+            body = {"artists": [ARTISTS.get(i) for i in query["ids"][0].split(",")]}
+        elif parts[0] == "artists" and parts[2] == "albums":
+            albums = [album for album, (artist, _) in ALBUMS.items() if artist == parts[1]]
+            offset = int(query.get("offset", ["0"])[0])
+            more = offset + 1 < len(albums)
+            body = {"items": [{"id": albums[offset]}],
+                    "next": f"{base}/artists/{parts[1]}/albums?offset={offset + 1}" if more else None}
+        elif parts[0] == "artists" and parts[2] == "related-artists":
+            body = {"artists": [ARTISTS[i] for i in RELATED[parts[1]]]}
+        elif parts == ["albums"]:
+            body = {"albums": [{"id": i, "name": f"Album {i}", "release_date": "2020",
+                                "tracks": {"items": [{"id": t} for t in ALBUMS[i][1]], "next": None}}
+                               for i in query["ids"][0].split(",")]}
+        elif parts == ["tracks"]:
+            body = {"tracks": [_track(i) for i in query["ids"][0].split(",")]}
+        else:
+            self.send_error(404)
+            return
+
+        data = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class RecordingWriter:
+    def __init__(self):
+        self.nodes_by_label = {}
+        self.relationships_by_type = {}
+
+    def nodes(self, label, rows):
+        self.nodes_by_label.setdefault(label, []).extend(rows)
+
+    def relationships(self, label1, label2, pairs, relationship_type):
+        self.relationships_by_type.setdefault(relationship_type, []).extend(pairs)
+
+
+@pytest.fixture
+def sp():
+    StubSpotify.requests = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubSpotify)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    client = spotipy.Spotify(auth="stub-token", retries=0)
+    client.prefix = f"http://127.0.0.1:{server.server_port}/v1/"
+    yield client
+    server.shutdown()
+    server.server_close()
+
+
+def test_crawl_writes_the_reachable_catalog(sp):
+    writer = RecordingWriter()
+    stats = SpotifyCrawler(sp, writer, workers=4).crawl(["a"])
+
+    assert sorted(row["artist_id"] for row in writer.nodes_by_label["Artist"] if "popularity" in row) == ["a", "b"]
+    assert sorted(row["album_id"] for row in writer.nodes_by_label["Album"]) == ["al1", "al2", "al3"]
+    assert sorted(row["song_id"] for row in writer.nodes_by_label["Song"]) == ["t1", "t2", "t3", "t4"]
+    assert sorted(row["name"] for row in writer.nodes_by_label["Genre"]) == ["indie", "indie", "rock"]
+    assert ({"song_id": "t4"}, {"album_id": "al3"}) in writer.relationships_by_type["PART_OF_ALBUM"]
+    assert ({"song_id": "t3"}, {"name": "rock"}) in writer.relationships_by_type["HAS_GENRE"]
+    # Both artists were crawled once: the related-artists loop back to "a" is not followed.
+    assert StubSpotify.requests.count("/v1/artists/a/albums") == 1
+    assert stats.pages > 0
+
+
+def test_crawl_uses_multi_id_endpoints(sp):
+    SpotifyCrawler(sp, RecordingWriter(), workers=2).crawl(["a", "b"])
+
+    assert StubSpotify.requests.count("/v1/artists") == 1
+    assert StubSpotify.requests.count("/v1/albums") == 1
+    assert StubSpotify.requests.count("/v1/tracks") == 1
+    assert not any(path.startswith("/v1/tracks/") for path in StubSpotify.requests)
+
+
+def test_max_artists_bounds_the_frontier(sp):
+    writer = RecordingWriter()
+    crawler = SpotifyCrawler(sp, writer, workers=2, max_artists=1)
+    crawler.crawl(["a"])
+
+    assert crawler.seen_artists == {"a"}
+    assert sorted(row["song_id"] for row in writer.nodes_by_label["Song"]) == ["t1", "t2"]
+
+
+def test_fetched_objects_are_cached_per_id(sp, tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite3"))
+    cache.set("artist", "b", dict(ARTISTS["b"], name="Artist B (cached)"))
+
+    writer = RecordingWriter()
+    SpotifyCrawler(sp, writer, workers=2, cache=cache).crawl(["a", "b"])
+
+    # Only the miss was fetched, and the cached artist was written as cached.
+    assert "/v1/artists" in StubSpotify.requests
+    assert {row["artist_id"]: row["name"] for row in writer.nodes_by_label["Artist"] if "popularity" in row} == \
+        {"a": "Artist A", "b": "Artist B (cached)"}
+    assert cache.get("artist", "a") == ARTISTS["a"]
+    assert cache.get("album", "al2")["name"] == "Album al2"
+    assert cache.get("track", "t3") == _track("t3")
+
+    # A second crawl is served from the cache for everything the multi-ID endpoints return.
+    StubSpotify.requests = []
+    stats = SpotifyCrawler(sp, RecordingWriter(), workers=2, cache=cache).crawl(["a", "b"])
+    assert not {"/v1/artists", "/v1/albums", "/v1/tracks"} & set(StubSpotify.requests)
+    assert stats.cached == 2 + 3 + 4
+
+
+def test_feature_store_is_built_from_the_crawled_cache(sp, tmp_path):
+    pytest.importorskip("numpy")
+    spec = importlib.util.spec_from_file_location(
+        "_web_app_feature_store", os.path.join(SHARED_DIR, os.pardir, "recommendation_engine", "feature_store.py"))
+    feature_store = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(feature_store)
+
+    cache = ResponseCache(str(tmp_path / "cache.sqlite3"))
+    SpotifyCrawler(sp, RecordingWriter(), workers=2, cache=cache).crawl(["a"])
+    meta = feature_store.build_from_cache(cache.path, store_dir=str(tmp_path / "features"))
+    store = feature_store.FeatureStore(str(tmp_path / "features"))
+
+    assert (meta["tracks"], meta["artists"]) == (4, 2)
+    assert store.track(store.track_rows(["t3"])[0])["artists"] == ["Artist B"]
+    assert store.artist_genres_by_name(["artist b"]) == {"artist b": ["indie", "rock"]}
@@ -0,0 +1,31 @@
+from utils.relationships import create_relationships_bulk
+
+
+def test_pairs_are_streamed_in_batches(conn):
+    consumed = []
+
+    def pairs():
+        for i in range(5):
+            consumed.append(i)
+            # The first batch has been sent before the generator is drained.
+            if i == 3:
+                assert len(conn.statements) == 1
+            yield {"song_id": str(i)}, {"artist_id": "a"}
+
+    assert create_relationships_bulk(conn, "Song", "Artist", pairs(), "PERFORMED_BY", batch_size=2) == 5
+    assert consumed == [0, 1, 2, 3, 4]
+    assert [len(rows) for _, rows in conn.statements] == [2, 2, 1]
+    assert conn.rows("PERFORMED_BY")[0] == {"n1": {"song_id": "0"}, "n2": {"artist_id": "a"}, "r": {}}
+
+
+def test_relationship_properties_are_set_from_the_third_element(conn):
+    pairs = iter([({"song_id": "1"}, {"song_id": "2"}, {"weight": 0.5})])
+    create_relationships_bulk(conn, "Song", "Song", pairs, "SIMILAR_TO")
+    query, rows = conn.statements[0]
+    assert "SET r += row.r" in query
+    assert rows[0]["r"] == {"weight": 0.5}
+
+
+def test_empty_input_sends_nothing(conn):
+    assert create_relationships_bulk(conn, "Song", "Artist", iter(()), "PERFORMED_BY") == 0
+    assert conn.statements == []
@@ -0,0 +1,30 @@
+import logging
+
+import pytest
+
+from tests.conftest import FakeConnection
+from utils.schema import INDEXES, NODE_KEYS, create_schema
+
+
+class FailingConnection(FakeConnection):
+    """Answers like Neo4jConnection.query does when a statement fails: None instead of records."""
+
+    def query(self, query, parameters=None):
+        super().query(query, parameters)
+        return None if "song_song_id_unique" in query else []
+
+
+def test_every_constraint_and_index_is_created(conn, caplog):
+    with caplog.at_level(logging.INFO, logger="utils.schema"):
+        create_schema(conn)
+    assert len(conn.queries) == len(NODE_KEYS) + len(INDEXES)
+    assert "Schema ready" in caplog.text
+
+
+def test_failed_statement_is_not_reported_as_ready(caplog):
+    conn = FailingConnection()
+    with caplog.at_level(logging.INFO, logger="utils.schema"), pytest.raises(RuntimeError, match="song_song_id_unique"):
+        create_schema(conn)
+    # The remaining statements were still attempted.
+    assert len(conn.queries) == len(NODE_KEYS) + len(INDEXES)
+    assert "Schema ready" not in caplog.text
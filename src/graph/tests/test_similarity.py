@@ -0,0 +1,74 @@
+from tests.conftest import FakeConnection
+from utils.similarity import build_similarity_edges, compute_similarities
+
+PROFILES = [
+    ("a", ["genre:Jazz", "artist:1", "album:x"]),
+    ("b", ["genre:Jazz", "artist:1", "album:x"]),
+    ("c", ["genre:Jazz", "artist:1"]),
+    ("d", ["genre:Jazz"]),
+    ("e", ["genre:Metal"]),
+    ("f", []),
+]
+
+
+def _edges(**kwargs):
+    return list(compute_similarities(PROFILES, **kwargs))
+
+
+def test_edges_are_ranked_and_capped_at_top_k():
+    edges = _edges(top_k=2, min_score=0.0)
+    by_source = {}
+    for source, target, score in edges:
+        by_source.setdefault(source, []).append((target, score))
+
+    assert [target for target, _ in by_source["a"]] == ["b", "c"]
+    assert by_source["a"][0][1] == 1.0
+    assert all(len(targets) <= 2 for targets in by_source.values())
+    assert all(source != target for source, target, _ in edges)
+    # Items without tokens in common with anyone get no edges.
+    assert "e" not in by_source and "f" not in by_source
+
+
+def test_scores_are_symmetric():
+    scores = {(source, target): score for source, target, score in _edges(top_k=10, min_score=0.0)}
+
+    assert all(scores[target, source] == score for (source, target), score in scores.items())
+
+
+def test_min_score_drops_weak_edges():
+    edges = _edges(top_k=10, min_score=0.5)
+
+    assert edges and all(score >= 0.5 for _, _, score in edges)
+    assert not any("d" in (source, target) for source, target, _ in edges)
+
+
+def test_frequent_tokens_still_score_candidates_found_another_way():
+    # With max_df=3, the Jazz genre (4 items) no longer finds candidates, so d loses its edges,
+    # but it still adds to the a-c score found through the shared artist.
+    edges = {(source, target): score for source, target, score in _edges(top_k=10, min_score=0.0, max_df=3)}
+
+    assert not any("d" in pair for pair in edges)
+    assert edges["a", "c"] == dict(((s, t), v) for s, t, v in _edges(top_k=10, min_score=0.0))["a", "c"]
+
+
+class ProfileConnection(FakeConnection):
+    def stream(self, query, fetch_size=1000, project=None):
+        for key, tokens in PROFILES:
+            row = {"id": key, "genre": [], "artist": [], "album": []}
+            for token in tokens:
+                kind, value = token.split(":", 1)
+                row[kind].append(value)
+            yield row
+
+
+def test_build_writes_edges_then_removes_stale_ones():
+    conn = ProfileConnection()
+    written = build_similarity_edges(conn, "Song", top_k=2, min_score=0.0, batch_size=100)
+
+    rows = conn.rows("SIMILAR_TO")
+    assert written == len(rows) == len(_edges(top_k=2, min_score=0.0))
+    assert {(row["n1"]["song_id"], row["n2"]["song_id"]) for row in rows} >= {("a", "b"), ("b", "a")}
+    assert len({row["r"]["run"] for row in rows}) == 1
+
+    cleanup, parameters = conn.queries[-1]
+    assert "DELETE r" in cleanup and parameters["run"] == rows[0]["r"]["run"]
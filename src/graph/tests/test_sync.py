@@ -0,0 +1,65 @@
+import pytest
+
+from tests.conftest import FakeConnection
+from utils.sync import GRAPH_ID_QUERY, SyncState, SyncWriter
+
+SONGS = [{"song_id": "1", "name": "Song A"}, {"song_id": "2", "name": "Song B"}]
+CREDITS = [({"song_id": "1"}, {"artist_id": "a"}), ({"song_id": "1"}, {"artist_id": "b"})]
+
+
+class GraphConnection(FakeConnection):
+    """A FakeConnection answering the sync ID query for one graph."""
+
+    def __init__(self, graph_id="graph-1"):
+        super().__init__()
+        self.graph_id = graph_id
+
+    def query(self, query, parameters=None):
+        super().query(query, parameters)
+        return [{"graph_id": self.graph_id}] if query == GRAPH_ID_QUERY else []
+
+
+@pytest.fixture
+def state(tmp_path):
+    return SyncState(str(tmp_path / "sync.sqlite3"))
+
+
+def _sync(conn, state, songs=SONGS, credits=CREDITS, **kwargs):
+    writer = SyncWriter(conn, state, **kwargs)
+    writer.nodes("Song", songs)
+    writer.relationships("Song", "Artist", credits, "PERFORMED_BY")
+    return writer.finish()
+
+
+def test_unchanged_rows_are_not_written_again(state):
+    assert _sync(GraphConnection(), state).inserted == 4
+
+    conn = GraphConnection()
+    stats = _sync(conn, state, songs=[SONGS[0], dict(SONGS[1], name="Song B (Remastered)")], credits=CREDITS[:1])
+    assert (stats.inserted, stats.updated, stats.deleted) == (0, 1, 1)
+    assert [row["name"] for row in conn.rows("MERGE (n:Song")] == ["Song B (Remastered)"]
+    assert [row["n2"] for row in conn.rows("DELETE r")] == [{"artist_id": "b"}]
+
+
+def test_another_graph_gets_everything_written(state):
+    _sync(GraphConnection("graph-1"), state)
+
+    conn = GraphConnection("graph-2")
+    assert _sync(conn, state).inserted == 4
+    assert len(conn.rows("MERGE (n:Song")) == 2
+    # Back on the first graph the state was cleared too, so it is written in full again.
+    assert _sync(GraphConnection("graph-1"), state).inserted == 4
+
+
+def test_reset_writes_everything_again(state):
+    _sync(GraphConnection(), state)
+
+    assert _sync(GraphConnection(), state).inserted == 0
+    assert _sync(GraphConnection(), state, reset=True).inserted == 4
+
+
+def test_unreachable_graph_fails_before_writing(state):
+    conn = FakeConnection()
+    with pytest.raises(RuntimeError):
+        SyncWriter(conn, state)
+    assert conn.statements == []
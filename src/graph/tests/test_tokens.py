@@ -0,0 +1,67 @@
+import os
+import sys
+import time
+
+import pytest
+
+from spotify import tokens
+from spotify.shared import SHARED_DIR
+from spotify.tokens import SharedClientCredentials
+
+
+class Response:
+    def __init__(self, status_code, body=None):
+        self.status_code = status_code
+        self.body = body
+        self.text = str(body)
+
+    def json(self):
+        return self.body
+
+
+class TokenEndpoint:
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.calls = 0
+
+    def request(self, send, url, timeout=None, data=None):
+        self.calls += 1
+        return self.responses.pop(0)
+
+
+def test_token_store_is_the_web_apps_implementation():
+    module = sys.modules[tokens.TokenStore.__module__]
+    assert os.path.samefile(module.__file__, os.path.join(SHARED_DIR, "token_store.py"))
+
+
+def test_processes_share_one_token(tmp_path, monkeypatch):
+    endpoint = TokenEndpoint(Response(200, {"access_token": "token", "expires_in": 3600}))
+    monkeypatch.setattr(tokens, "SPOTIFY_LIMITER", endpoint)
+    path = str(tmp_path / "tokens.sqlite3")
+
+    assert SharedClientCredentials("id", "secret", path).get_access_token() == "token"
+    as_dict = SharedClientCredentials("id", "secret", path).get_access_token(as_dict=True)
+    assert as_dict["access_token"] == "token" and 3500 < as_dict["expires_in"] <= 3600
+    assert endpoint.calls == 1
+
+
+def test_lease_is_released_when_the_response_is_unusable(tmp_path, monkeypatch):
+    monkeypatch.setattr(tokens, "SPOTIFY_LIMITER", TokenEndpoint(Response(200, {"access_token": "token"})))
+    credentials = SharedClientCredentials("id", "secret", str(tmp_path / "tokens.sqlite3"))
+
+    with pytest.raises(KeyError):
+        credentials.get_access_token()
+    assert credentials.store.execute("SELECT lease_until FROM tokens")[0][0] == 0
+
+
+def test_failed_refresh_serves_the_old_token_until_it_expires(tmp_path, monkeypatch):
+    monkeypatch.setattr(tokens, "SPOTIFY_LIMITER", TokenEndpoint(Response(503), Response(503)))
+    credentials = SharedClientCredentials("id", "secret", str(tmp_path / "tokens.sqlite3"))
+    credentials.store.ensure(credentials.key)
+    credentials.store.save(credentials.key, "old", time.time() + 60)
+
+    assert credentials.get_access_token() == "old"
+    credentials.store.save(credentials.key, "old", time.time() - 1)
+    credentials._token = None
+    with pytest.raises(RuntimeError):
+        credentials.get_access_token()
@@ -0,0 +1,47 @@
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def batched(rows, batch_size):
+    """
+    Yield successive lists of at most batch_size rows from any iterable.
+    :param rows: Iterable of rows (e.g., a list or a generator of property dicts)
+    :param batch_size: Maximum number of rows per batch
+    """
+    if batch_size < 1:
+        raise ValueError("batch_size must be at least 1")
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def run_batched(conn, query, rows, batch_size=1000, description="rows"):
+    """
+    Run an UNWIND query once per batch of rows and report throughput.
+    All batches share one session; each batch is committed as its own write transaction.
+    :param conn: Neo4jConnection object
+    :param query: Cypher query reading its input from $rows (e.g., "UNWIND $rows AS row CREATE ...")
+    :param rows: Iterable of row parameters, one per UNWIND element
+    :param batch_size: Number of rows sent per statement
+    :param description: Label used in the progress log (e.g., 'Song nodes')
+    :return: Total number of rows sent
+    """
+    total = 0
+    start = time.perf_counter()
+    with conn.write_tx() as tx:
+        for batch in batched(rows, batch_size):
+            tx.run(query, parameters={"rows": batch})
+            tx.commit()
+            total += len(batch)
+
+    elapsed = time.perf_counter() - start
+    rate = total / elapsed if elapsed > 0 else float("inf")
+    logger.info("Wrote %d %s in %.2fs (%.0f rows/sec)", total, description, elapsed, rate)
+    return total
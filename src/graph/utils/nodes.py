@@ -1,12 +1,38 @@
 from connection.neo4j import Neo4jConnection
+from utils.batch import run_batched
+from utils.schema import node_key
 
-def create_node(conn, label, properties):
+def create_node(conn, label, properties, upsert=False):
     """
     Create a node with a given label and properties.
     :param conn: Neo4jConnection object
     :param label: Label of the node (e.g., 'Song', 'Artist', etc.)
     :param properties: Dictionary of properties for the node (e.g., {'song_id': '1', 'name': 'Song A'})
+    :param upsert: MERGE on the label's unique key (see utils.schema) instead of always creating
     """
+    if upsert:
+        key = node_key(label)
+        query = f"MERGE (n:{label} {{{key}: ${key}}}) SET n += $properties RETURN n"
+        conn.query(query, parameters={key: properties[key], "properties": properties})
+        return
+
     properties_string = ', '.join([f"{key}: ${key}" for key in properties])
     query = f"CREATE (n:{label} {{{properties_string}}}) RETURN n"
     conn.query(query, parameters=properties)
+
+def create_nodes_bulk(conn, label, rows, batch_size=1000, upsert=False):
+    """
+    Create many nodes with the same label, sending one UNWIND statement per batch.
+    :param conn: Neo4jConnection object
+    :param label: Label of the nodes (e.g., 'Song', 'Artist', etc.)
+    :param rows: Iterable of property dictionaries, one per node
+    :param batch_size: Number of nodes sent per statement
+    :param upsert: MERGE on the label's unique key (see utils.schema) instead of always creating
+    :return: Number of nodes sent
+    """
+    if upsert:
+        key = node_key(label)
+        query = f"UNWIND $rows AS row MERGE (n:{label} {{{key}: row.{key}}}) SET n += row"
+    else:
+        query = f"UNWIND $rows AS row CREATE (n:{label}) SET n = row"
+    return run_batched(conn, query, rows, batch_size, description=f"{label} nodes")
@@ -1,3 +1,5 @@
+import json
+
 from connection.neo4j import Neo4jConnection
 
 def get_all_nodes(conn):
@@ -10,4 +12,73 @@ def get_all_relationships(conn):
     query = "MATCH (n1)-[r]->(n2) RETURN n1, r, n2 LIMIT 25"
     results = conn.query(query)
     for record in results:
-        print(record)
\ No newline at end of file
+        print(record)
+
+def iter_song_graph(conn, fetch_size=1000):
+    """
+    Lazily yield every song with its artists and genres, without loading the graph into memory.
+    :param conn: Neo4jConnection object
+    :param fetch_size: Number of records pulled from the server per round trip
+    :return: Generator of dicts with keys song_id, song, artists, genres
+    """
+    query = ("MATCH (s:Song) "
+             "OPTIONAL MATCH (s)-[:PERFORMED_BY]->(a:Artist) "
+             "WITH s, collect(DISTINCT a.name) AS artists "
+             "OPTIONAL MATCH (s)-[:HAS_GENRE]->(g:Genre) "
+             "RETURN s.song_id AS song_id, s.name AS song, artists, collect(DISTINCT g.name) AS genres")
+    return conn.stream(query, fetch_size=fetch_size, project='dict')
+
+def export_song_graph(conn, filename="data/song_graph.jsonl", fetch_size=1000):
+    """
+    Write every song with its artists and genres to a JSON Lines file, one song per line.
+    :param conn: Neo4jConnection object
+    :param filename: Output path
+    :param fetch_size: Number of records pulled from the server per round trip
+    :return: Number of songs written
+    """
+    count = 0
+    with open(filename, 'w', encoding='utf-8') as file:
+        for row in iter_song_graph(conn, fetch_size):
+            file.write(json.dumps(row, ensure_ascii=False) + "\n")
+            count += 1
+    print(f"Exported {count} songs to {filename}")
+    return count
+
+def similar_song_candidates(conn, song_ids=(), artist_ids=(), limit=50, artist_weight=0.5, songs_per_artist=10):
+    """
+    Return the top candidate songs for a seed set of songs and artists, from precomputed
+    SIMILAR_TO edges (see utils/similarity.py), in one read query. Seeds are found through
+    their key constraints and each seed has at most top_k edges, so the traversal stays small.
+    Songs reached from several seeds add up their edge weights. Seed songs are excluded.
+    :param conn: Neo4jConnection object
+    :param song_ids: Seed song IDs (e.g., the user's top tracks)
+    :param artist_ids: Seed artist IDs; songs by similar artists are weighted by artist_weight
+    :param limit: Number of candidates returned
+    :param songs_per_artist: Songs taken from each similar artist
+    :return: List of dicts with keys song_id, name, artist (comma-joined), uri and score, best first
+    """
+    query = ("CALL { "
+             "  UNWIND $song_ids AS seed "
+             "  MATCH (:Song {song_id: seed})-[r:SIMILAR_TO]->(c:Song) "
+             "  RETURN c, r.weight AS weight "
+             "  UNION ALL "
+             "  UNWIND $artist_ids AS seed "
+             "  MATCH (:Artist {artist_id: seed})-[r:SIMILAR_TO]->(similar:Artist) "
+             "  CALL { WITH similar "
+             "    MATCH (similar)<-[:PERFORMED_BY]-(c:Song) "
+             "    RETURN c ORDER BY c.popularity DESC LIMIT $songs_per_artist } "
+             "  RETURN c, r.weight * $artist_weight AS weight "
+             "} "
+             "WITH c, sum(weight) AS score "
+             "WHERE NOT c.song_id IN $song_ids "
+             "ORDER BY score DESC LIMIT $limit "
+             "OPTIONAL MATCH (c)-[:PERFORMED_BY]->(a:Artist) "
+             "WITH c, score, collect(a.name) AS artists "
+             "RETURN c.song_id AS song_id, c.name AS name, artists, score "
+             "ORDER BY score DESC")
+    parameters = {"song_ids": list(song_ids), "artist_ids": list(artist_ids), "limit": limit,
+                  "artist_weight": artist_weight, "songs_per_artist": songs_per_artist}
+    with conn.read_tx() as tx:
+        records = tx.run(query, parameters)
+    return [{"song_id": record["song_id"], "name": record["name"], "artist": ", ".join(record["artists"]),
+             "uri": f"spotify:track:{record['song_id']}", "score": record["score"]} for record in records]
@@ -1,6 +1,9 @@
+import itertools
+
 from connection.neo4j import Neo4jConnection
+from utils.batch import run_batched
 
-def create_relationship(conn, label1, label2, node1_props, node2_props, relationship_type):
+def create_relationship(conn, label1, label2, node1_props, node2_props, relationship_type, upsert=False):
     """
     Create a relationship between two nodes.
     :param conn: Neo4jConnection object
@@ -9,12 +12,14 @@ def create_relationship(conn, label1, label2, node1_props, node2_props, relation
     :param node1_props: Properties to identify the first node (e.g., {'song_id': '1'})
     :param node2_props: Properties to identify the second node (e.g., {'artist_id': '1'})
     :param relationship_type: The type of relationship (e.g., 'PERFORMED_BY', 'HAS_FEATURE')
+    :param upsert: MERGE the end nodes on their properties instead of requiring them to exist
     """
+    clause = "MERGE" if upsert else "MATCH"
     node1_string = ', '.join([f"{key}: ${key}_1" for key in node1_props])
     node2_string = ', '.join([f"{key}: ${key}_2" for key in node2_props])
     
-    query = (f"MATCH (n1:{label1} {{{node1_string}}}) "
-             f"MATCH (n2:{label2} {{{node2_string}}}) "
+    query = (f"{clause} (n1:{label1} {{{node1_string}}}) "
+             f"{clause} (n2:{label2} {{{node2_string}}}) "
              f"MERGE (n1)-[:{relationship_type}]->(n2) "
              f"RETURN n1, n2")
     
@@ -23,3 +28,39 @@ def create_relationship(conn, label1, label2, node1_props, node2_props, relation
     parameters.update({f"{key}_2": node2_props[key] for key in node2_props})
     
     conn.query(query, parameters=parameters)
+
+def create_relationships_bulk(conn, label1, label2, pairs, relationship_type, batch_size=1000, upsert=False):
+    """
+    Create many relationships of the same type, sending one UNWIND statement per batch.
+    :param conn: Neo4jConnection object
+    :param label1: Label of the first nodes (e.g., 'Song')
+    :param label2: Label of the second nodes (e.g., 'Artist')
+    :param pairs: Iterable of (node1_props, node2_props) tuples identifying each pair of nodes,
+                  e.g. [({'song_id': '1'}, {'artist_id': '1'}), ...]. Every pair must use the same keys.
+                  A third element sets properties on the relationship, e.g. ({...}, {...}, {'weight': 0.8}).
+    :param relationship_type: The type of relationship (e.g., 'PERFORMED_BY', 'HAS_FEATURE')
+    :param batch_size: Number of relationships sent per statement
+    :param upsert: MERGE the end nodes on their properties instead of requiring them to exist
+    :return: Number of relationships sent
+    """
+    # Peek at the first pair for the keys, then stream the rest so generators stay lazy.
+    pairs = iter(pairs)
+    first = next(pairs, None)
+    if first is None:
+        return 0
+
+    node1_keys, node2_keys = list(first[0]), list(first[1])
+    node1_string = ', '.join([f"{key}: row.n1.{key}" for key in node1_keys])
+    node2_string = ', '.join([f"{key}: row.n2.{key}" for key in node2_keys])
+
+    clause = "MERGE" if upsert else "MATCH"
+    query = (f"UNWIND $rows AS row "
+             f"{clause} (n1:{label1} {{{node1_string}}}) "
+             f"{clause} (n2:{label2} {{{node2_string}}}) "
+             f"MERGE (n1)-[r:{relationship_type}]->(n2)")
+    if len(first) == 3:
+        query += " SET r += row.r"
+
+    rows = ({"n1": pair[0], "n2": pair[1], "r": pair[2] if len(pair) == 3 else {}}
+            for pair in itertools.chain([first], pairs))
+    return run_batched(conn, query, rows, batch_size, description=f"{relationship_type} relationships")
@@ -0,0 +1,52 @@
+import logging
+
+from connection.neo4j import Neo4jConnection
+
+logger = logging.getLogger(__name__)
+
+# Property that uniquely identifies a node of each label. Upserts MERGE on these keys.
+NODE_KEYS = {
+    "Song": "song_id",
+    "Artist": "artist_id",
+    "Album": "album_id",
+    "Genre": "name",
+    "Feature": "name",
+}
+
+# Additional non-unique lookup indexes (label, property).
+INDEXES = [
+    ("Song", "name"),
+    ("Artist", "name"),
+    ("Album", "name"),
+]
+
+def node_key(label):
+    """
+    Return the unique key property for a label.
+    :param label: Label of the node (e.g., 'Song', 'Artist', etc.)
+    """
+    if label not in NODE_KEYS:
+        raise ValueError(f"No unique key declared for label '{label}'")
+    return NODE_KEYS[label]
+
+def create_schema(conn):
+    """
+    Create the uniqueness constraints and indexes the graph relies on. Safe to run repeatedly.
+    Each uniqueness constraint is backed by an index, so MATCH/MERGE on a node key is an index seek.
+    :param conn: Neo4jConnection object
+    :raises RuntimeError: If any constraint or index could not be created
+    """
+    statements = []
+    for label, key in NODE_KEYS.items():
+        name = f"{label.lower()}_{key}_unique"
+        statements.append(f"CREATE CONSTRAINT {name} IF NOT EXISTS FOR (n:{label}) REQUIRE n.{key} IS UNIQUE")
+
+    for label, key in INDEXES:
+        name = f"{label.lower()}_{key}_index"
+        statements.append(f"CREATE INDEX {name} IF NOT EXISTS FOR (n:{label}) ON (n.{key})")
+
+    # Neo4jConnection.query reports a failed statement by returning None instead of raising.
+    failed = [statement for statement in statements if conn.query(statement) is None]
+    if failed:
+        raise RuntimeError(f"Schema setup failed for {len(failed)} statement(s): {'; '.join(failed)}")
+    logger.info("Schema ready: %d constraints, %d indexes", len(NODE_KEYS), len(INDEXES))
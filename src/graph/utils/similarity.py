@@ -0,0 +1,145 @@
+import heapq
+import math
+import time
+from collections import defaultdict
+
+from connection.neo4j import Neo4jConnection
+from utils.relationships import create_relationships_bulk
+from utils.schema import node_key
+
+# Each item is profiled as a set of tokens ('genre:Pop', 'album:<id>', ...). The queries return
+# one list column per token type, next to the item's key as `id`.
+PROFILE_QUERIES = {
+    "Song": ("MATCH (s:Song) "
+             "OPTIONAL MATCH (s)-[:HAS_GENRE]->(g:Genre) "
+             "WITH s, collect(DISTINCT g.name) AS genre "
+             "OPTIONAL MATCH (s)-[:HAS_FEATURE]->(f:Feature) "
+             "WITH s, genre, collect(DISTINCT f.name) AS feature "
+             "OPTIONAL MATCH (s)-[:PERFORMED_BY]->(a:Artist) "
+             "WITH s, genre, feature, collect(DISTINCT a.artist_id) AS artist "
+             "OPTIONAL MATCH (s)-[:PART_OF_ALBUM]->(al:Album) "
+             "RETURN s.song_id AS id, genre, feature, artist, collect(DISTINCT al.album_id) AS album"),
+    "Artist": ("MATCH (a:Artist) "
+               "OPTIONAL MATCH (a)-[:HAS_GENRE]->(g:Genre) "
+               "WITH a, collect(DISTINCT g.name) AS genre "
+               "OPTIONAL MATCH (a)<-[:PERFORMED_BY]-(s:Song) "
+               "WITH a, genre, collect(s) AS songs "
+               "UNWIND (CASE songs WHEN [] THEN [null] ELSE songs END) AS s "
+               "OPTIONAL MATCH (s)-[:HAS_FEATURE]->(f:Feature) "
+               "OPTIONAL MATCH (s)-[:PART_OF_ALBUM]->(al:Album) "
+               "RETURN a.artist_id AS id, genre, collect(DISTINCT s.song_id) AS song, "
+               "collect(DISTINCT f.name) AS feature, collect(DISTINCT al.album_id) AS album"),
+}
+
+# Weight of a shared token by type. Co-occurrence (same artist, album or song credit) counts
+# more than a shared genre or feature.
+TOKEN_WEIGHTS = {"genre": 1.0, "feature": 1.0, "artist": 2.0, "album": 1.5, "song": 2.0}
+
+
+def load_profiles(conn, label, fetch_size=1000):
+    """
+    Read every node of a label as (key, [token, ...]).
+    :param conn: Neo4jConnection object
+    :param label: 'Song' or 'Artist'
+    :return: List of (key, tokens) tuples
+    """
+    profiles = []
+    for row in conn.stream(PROFILE_QUERIES[label], fetch_size=fetch_size, project='dict'):
+        key = row.pop("id")
+        profiles.append((key, [f"{kind}:{value}" for kind, values in row.items() for value in values if value is not None]))
+    return profiles
+
+
+def compute_similarities(profiles, top_k=20, min_score=0.05, max_df=2000, weights=None):
+    """
+    Find each item's top_k most similar items by weighted cosine similarity of their token sets.
+    Tokens are weighted by type and by rarity (idf). Candidates are found through an inverted index,
+    skipping tokens shared by more than max_df items (a broad genre says little and would make the
+    job quadratic); those tokens still count towards the score of candidates found another way.
+    :param profiles: List of (key, tokens) tuples, as returned by load_profiles
+    :param top_k: Maximum edges kept per item
+    :param min_score: Minimum similarity for an edge
+    :param max_df: Tokens held by more items than this are not used to find candidates
+    :param weights: Per-token-type weights, defaulting to TOKEN_WEIGHTS
+    :return: Generator of (key1, key2, score) tuples, at most top_k per key1
+    """
+    weights = {**TOKEN_WEIGHTS, **(weights or {})}
+    vocabulary, postings = {}, defaultdict(list)
+    items = []
+    for row, (_, tokens) in enumerate(profiles):
+        ids = {vocabulary.setdefault(token, len(vocabulary)) for token in tokens}
+        for token_id in ids:
+            postings[token_id].append(row)
+        items.append(ids)
+
+    n = len(items)
+    kinds = {token_id: token.split(":", 1)[0] for token, token_id in vocabulary.items()}
+    token_weight = {token_id: (weights.get(kinds[token_id], 1.0) * math.log(1 + n / len(rows))) ** 2
+                    for token_id, rows in postings.items()}
+    norms = [math.sqrt(sum(token_weight[t] for t in ids)) for ids in items]
+
+    for row, ids in enumerate(items):
+        if not norms[row]:
+            continue
+        shared = defaultdict(float)
+        frequent = []
+        for token_id in ids:
+            if len(postings[token_id]) > max_df:
+                frequent.append(token_id)
+                continue
+            for other in postings[token_id]:
+                shared[other] += token_weight[token_id]
+        shared.pop(row, None)
+
+        scores = []
+        for other, weight in shared.items():
+            weight += sum(token_weight[t] for t in frequent if t in items[other])
+            score = weight / (norms[row] * norms[other])
+            if score >= min_score:
+                scores.append((score, other))
+        for score, other in heapq.nlargest(top_k, scores):
+            yield profiles[row][0], profiles[other][0], round(score, 4)
+
+
+def build_similarity_edges(conn, label, top_k=20, min_score=0.05, max_df=2000, batch_size=1000):
+    """
+    Recompute SIMILAR_TO edges between nodes of one label and write them in bulk.
+    Each edge carries its weight and the run it was written by. Edges left over from earlier runs
+    are deleted only after the new ones are written, so readers always see a complete set.
+    :param conn: Neo4jConnection object
+    :param label: 'Song' or 'Artist'
+    :return: Number of edges written
+    """
+    start = time.perf_counter()
+    run = int(time.time() * 1000)
+    key = node_key(label)
+    profiles = load_profiles(conn, label)
+    print(f"Loaded {len(profiles)} {label} profiles in {time.perf_counter() - start:.2f}s")
+
+    pairs = (({key: key1}, {key: key2}, {"weight": score, "run": run})
+             for key1, key2, score in compute_similarities(profiles, top_k, min_score, max_df))
+    written = create_relationships_bulk(conn, label, label, pairs, "SIMILAR_TO", batch_size)
+
+    deleted = 0
+    while True:
+        result = conn.query(f"MATCH (:{label})-[r:SIMILAR_TO]->(:{label}) WHERE r.run <> $run "
+                            f"WITH r LIMIT $limit DELETE r RETURN count(*) AS deleted",
+                            parameters={"run": run, "limit": batch_size * 10})
+        count = result[0]["deleted"] if result else 0
+        deleted += count
+        if not count:
+            break
+
+    print(f"{label} similarity: {written} edges written, {deleted} stale edges removed "
+          f"in {time.perf_counter() - start:.2f}s")
+    return written
+
+
+# Run from src/graph: python -m utils.similarity
+if __name__ == "__main__":
+    from config.settings import NEO4J_URI, NEO4J_USER, NEO4J_PASSWORD
+
+    conn = Neo4jConnection(uri=NEO4J_URI, user=NEO4J_USER, pwd=NEO4J_PASSWORD)
+    for label in ("Song", "Artist"):
+        build_similarity_edges(conn, label)
+    conn.close()
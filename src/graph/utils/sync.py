@@ -0,0 +1,349 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from connection.neo4j import Neo4jConnection
+from utils.batch import batched, run_batched
+from utils.nodes import create_nodes_bulk
+from utils.relationships import create_relationships_bulk
+from utils.schema import node_key
+
+# Incremental sync keeps a content fingerprint of every node and relationship it has written,
+# with the run that last saw it. Freshly fetched rows are diffed against these, and only new or
+# changed rows are written. When a start node's relationships of a type are emitted again, the
+# ones it no longer has are deleted; with prune=True, everything the run did not see is deleted.
+#
+# The fingerprints describe one particular graph. Each graph gets a random ID, stored on a single
+# (:GraphSync) node the first time it is synced, and the state remembers the ID it was built
+# against. When a run finds another ID (the database was wiped, restored or swapped for another),
+# the state is cleared and everything is written again instead of being skipped as unchanged.
+# Clear it by hand with --reset on the crawler and builder (SyncWriter(reset=True)), e.g. after
+# editing the graph outside the sync.
+
+SYNC_STATE_PATH = os.getenv("GRAPH_SYNC_STATE", "data/graph_sync.sqlite3")
+
+# Keys per SQL IN (...) lookup, below SQLite's variable limit.
+LOOKUP_BATCH = 500
+
+GRAPH_ID_QUERY = ("MERGE (s:GraphSync {key: 'sync'}) ON CREATE SET s.graph_id = randomUUID() "
+                  "RETURN s.graph_id AS graph_id")
+
+
+def graph_id(conn):
+    """
+    Return the ID of the graph behind a connection, giving the graph one on first use.
+    :param conn: Neo4jConnection object
+    """
+    result = conn.query(GRAPH_ID_QUERY)
+    if not result:
+        raise RuntimeError("Could not read the graph's sync ID; is the database reachable?")
+    return result[0]["graph_id"]
+
+
+def fingerprint(properties):
+    """
+    Return a stable content hash of a property dictionary.
+    :param properties: JSON-serializable dict (e.g., a node row or relationship properties)
+    """
+    encoded = json.dumps(properties, sort_keys=True, separators=(",", ":"), default=str).encode("utf-8")
+    return hashlib.blake2b(encoded, digest_size=16).hexdigest()
+
+
+class SyncStats:
+    """Counters for one sync run."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.scanned = 0
+        self.inserted = 0
+        self.updated = 0
+        self.deleted = 0
+        self.written = 0
+
+    @property
+    def changed(self):
+        return self.inserted + self.updated + self.deleted
+
+    def report(self):
+        elapsed = time.perf_counter() - self.start
+        print(f"Synced in {elapsed:.2f}s: {self.scanned} scanned, {self.changed} changed "
+              f"({self.inserted} inserted, {self.updated} updated, {self.deleted} deleted), {self.written} written")
+
+
+class SyncState:
+    """
+    SQLite-backed fingerprints, one row per synced entity, and the runs that wrote them.
+    Node entities are keyed by label and node key. Rows of one label carrying different property
+    sets (e.g. full artists and artists only seen as track credits) are fingerprinted separately,
+    so neither overwrites the other's fingerprint. Relationship entities are keyed by type, end
+    labels and end node keys, and remember their start node as the owner.
+    """
+
+    def __init__(self, path=SYNC_STATE_PATH):
+        """
+        :param path: SQLite file holding the sync state
+        """
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.__lock = threading.Lock()
+        self.__db = sqlite3.connect(path, check_same_thread=False)
+        self.__db.execute("PRAGMA journal_mode=WAL")
+        self.__db.executescript(
+            "CREATE TABLE IF NOT EXISTS entities ("
+            " kind TEXT NOT NULL, key TEXT NOT NULL, owner TEXT, fingerprint TEXT NOT NULL,"
+            " run INTEGER NOT NULL, synced_at REAL NOT NULL, PRIMARY KEY (kind, key));"
+            "CREATE INDEX IF NOT EXISTS entities_run ON entities (kind, run);"
+            "CREATE INDEX IF NOT EXISTS entities_owner ON entities (kind, owner, run);"
+            "CREATE TABLE IF NOT EXISTS runs ("
+            " run INTEGER PRIMARY KEY AUTOINCREMENT, started_at REAL NOT NULL, finished_at REAL,"
+            " scanned INTEGER, inserted INTEGER, updated INTEGER, deleted INTEGER, written INTEGER);"
+            "CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT NOT NULL);"
+        )
+        self.__db.commit()
+
+    def bind(self, graph_id):
+        """
+        Tie the state to a graph, clearing it if it was built against another one.
+        :param graph_id: ID of the graph about to be synced (see graph_id)
+        :return: True if the state was cleared
+        """
+        with self.__lock:
+            row = self.__db.execute("SELECT value FROM meta WHERE name = 'graph_id'").fetchone()
+        if row is not None and row[0] == graph_id:
+            return False
+        if row is not None:
+            print(f"Sync state {self.path} belongs to another graph ({row[0]}); clearing it")
+        self.reset()
+        with self.__lock:
+            self.__db.execute("INSERT OR REPLACE INTO meta VALUES ('graph_id', ?)", (graph_id,))
+            self.__db.commit()
+        return True
+
+    def reset(self):
+        """Forget every fingerprint and run, so the next run writes everything again."""
+        with self.__lock:
+            self.__db.execute("DELETE FROM entities")
+            self.__db.execute("DELETE FROM runs")
+            self.__db.execute("DELETE FROM meta")
+            self.__db.commit()
+
+    def begin(self):
+        """Open a run and return its number."""
+        with self.__lock:
+            run = self.__db.execute("INSERT INTO runs (started_at) VALUES (?)", (time.time(),)).lastrowid
+            self.__db.commit()
+        return run
+
+    def finish(self, run, stats):
+        with self.__lock:
+            self.__db.execute("UPDATE runs SET finished_at = ?, scanned = ?, inserted = ?, updated = ?, deleted = ?, "
+                              "written = ? WHERE run = ?",
+                              (time.time(), stats.scanned, stats.inserted, stats.updated, stats.deleted,
+                               stats.written, run))
+            self.__db.commit()
+
+    def diff(self, kind, entries, run):
+        """
+        Split entries into inserts and updates against the stored fingerprints. Unchanged entries
+        are marked as seen by this run straight away.
+        :param kind: Entity kind (e.g., 'node:Song:duration_ms,name,song_id')
+        :param entries: Dict of key -> (owner, fingerprint, payload)
+        :param run: Current run number
+        :return: (inserts, updates), each a list of (key, owner, fingerprint, payload)
+        """
+        inserts, updates, unchanged = [], [], []
+        with self.__lock:
+            for keys in batched(list(entries), LOOKUP_BATCH):
+                placeholders = ",".join("?" * len(keys))
+                stored = dict(self.__db.execute(f"SELECT key, fingerprint FROM entities WHERE kind = ? "
+                                                f"AND key IN ({placeholders})", (kind, *keys)))
+                for key in keys:
+                    owner, digest, payload = entries[key]
+                    if key not in stored:
+                        inserts.append((key, owner, digest, payload))
+                    elif stored[key] != digest:
+                        updates.append((key, owner, digest, payload))
+                    else:
+                        unchanged.append(key)
+            self.__db.executemany("UPDATE entities SET run = ?, synced_at = ? WHERE kind = ? AND key = ?",
+                                  [(run, time.time(), kind, key) for key in unchanged])
+            self.__db.commit()
+        return inserts, updates
+
+    def record(self, kind, entries, run):
+        """
+        Store fingerprints for entries that were written to the graph.
+        :param entries: List of (key, owner, fingerprint, payload)
+        """
+        now = time.time()
+        with self.__lock:
+            self.__db.executemany("INSERT OR REPLACE INTO entities VALUES (?, ?, ?, ?, ?, ?)",
+                                  [(kind, key, owner, digest, run, now) for key, owner, digest, _ in entries])
+            self.__db.commit()
+
+    def kinds(self, prefix):
+        with self.__lock:
+            return [row[0] for row in self.__db.execute("SELECT DISTINCT kind FROM entities WHERE kind LIKE ?",
+                                                        (prefix + "%",))]
+
+    def stale_relationships(self, kind, run, prune=False):
+        """
+        Return (key, owner) for relationships not seen by this run whose owner re-emitted edges of
+        the same kind this run (or all unseen ones with prune=True).
+        """
+        query = "SELECT key, owner FROM entities WHERE kind = ? AND run < ?"
+        if not prune:
+            query += " AND owner IN (SELECT owner FROM entities WHERE kind = ? AND run = ?)"
+        with self.__lock:
+            return self.__db.execute(query, (kind, run) if prune else (kind, run, kind, run)).fetchall()
+
+    def stale_nodes(self, label, run):
+        """Return keys of a label's nodes that no row of this run mentioned."""
+        with self.__lock:
+            return [row[0] for row in self.__db.execute(
+                "SELECT key FROM entities WHERE kind LIKE ? GROUP BY key HAVING MAX(run) < ?",
+                (f"node:{label}:%", run))]
+
+    def forget(self, kind, keys):
+        with self.__lock:
+            self.__db.executemany("DELETE FROM entities WHERE kind = ? AND key = ?", [(kind, key) for key in keys])
+            self.__db.commit()
+
+    def forget_nodes(self, label, keys):
+        with self.__lock:
+            self.__db.executemany("DELETE FROM entities WHERE kind LIKE ? AND key = ?",
+                                  [(f"node:{label}:%", key) for key in keys])
+            self.__db.commit()
+
+
+class SyncWriter:
+    """
+    A drop-in for GraphWriter (spotify/crawler.py) that writes only what changed since the last
+    run. Call finish() once everything has been fetched to apply deletes and record the run.
+    """
+
+    def __init__(self, conn, state=None, batch_size=1000, reset=False):
+        """
+        :param conn: Neo4jConnection object
+        :param state: SyncState holding fingerprints (defaults to SYNC_STATE_PATH)
+        :param batch_size: Rows per UNWIND statement
+        :param reset: Clear the state first, so everything is written again
+        """
+        self.conn = conn
+        self.state = state or SyncState()
+        self.batch_size = batch_size
+        if reset:
+            self.state.reset()
+        self.state.bind(graph_id(conn))
+        self.stats = SyncStats()
+        self.run = self.state.begin()
+
+    def nodes(self, label, rows):
+        if not rows:
+            return
+        key = node_key(label)
+        self.stats.scanned += len(rows)
+        # Later rows for the same key win, as they would with successive upserts.
+        entries = {str(row[key]): (None, fingerprint(row), row) for row in rows}
+        by_fields = {}
+        for node_id, entry in entries.items():
+            by_fields.setdefault(",".join(sorted(entry[2])), {})[node_id] = entry
+
+        for fields, group in by_fields.items():
+            kind = f"node:{label}:{fields}"
+            inserts, updates = self.state.diff(kind, group, self.run)
+            changed = inserts + updates
+            if changed:
+                self.stats.written += create_nodes_bulk(self.conn, label, [entry[3] for entry in changed],
+                                                        self.batch_size, upsert=True)
+                self.state.record(kind, changed, self.run)
+            self.stats.inserted += len(inserts)
+            self.stats.updated += len(updates)
+
+    def relationships(self, label1, label2, pairs, relationship_type):
+        if not pairs:
+            return
+        kind = f"rel:{relationship_type}:{label1}:{label2}"
+        self.stats.scanned += len(pairs)
+        entries = {}
+        for pair in pairs:
+            properties = pair[2] if len(pair) == 3 else {}
+            owner = json.dumps(pair[0], sort_keys=True)
+            entries[json.dumps([pair[0], pair[1]], sort_keys=True)] = (owner, fingerprint(properties), pair)
+
+        inserts, updates = self.state.diff(kind, entries, self.run)
+        changed = inserts + updates
+        if changed:
+            self.stats.written += create_relationships_bulk(self.conn, label1, label2, [entry[3] for entry in changed],
+                                                            relationship_type, self.batch_size)
+            self.state.record(kind, changed, self.run)
+        self.stats.inserted += len(inserts)
+        self.stats.updated += len(updates)
+
+    def finish(self, prune=False):
+        """
+        Delete relationships that owners re-emitted this run no longer have and, with prune=True
+        (only after a crawl covering the whole catalog), every node and relationship not seen this
+        run. Records and reports the run.
+        :param prune: Delete everything this run did not see
+        :return: SyncStats for the run
+        """
+        for kind in self.state.kinds("rel:"):
+            stale = self.state.stale_relationships(kind, self.run, prune)
+            if not stale:
+                continue
+            _, relationship_type, label1, label2 = kind.split(":", 3)
+            pairs = [json.loads(key) for key, _ in stale]
+            self.stats.written += delete_relationships_bulk(self.conn, label1, label2, pairs, relationship_type,
+                                                            self.batch_size)
+            self.state.forget(kind, [key for key, _ in stale])
+            self.stats.deleted += len(stale)
+
+        if prune:
+            labels = {kind.split(":")[1] for kind in self.state.kinds("node:")}
+            for label in sorted(labels):
+                stale = self.state.stale_nodes(label, self.run)
+                if not stale:
+                    continue
+                self.stats.written += delete_nodes_bulk(self.conn, label, stale, self.batch_size)
+                self.state.forget_nodes(label, stale)
+                self.stats.deleted += len(stale)
+
+        self.state.finish(self.run, self.stats)
+        self.stats.report()
+        return self.stats
+
+
+def delete_nodes_bulk(conn, label, keys, batch_size=1000):
+    """
+    Delete nodes and their relationships by unique key, sending one UNWIND statement per batch.
+    :param conn: Neo4jConnection object
+    :param label: Label of the nodes (e.g., 'Song')
+    :param keys: Values of the label's unique key (see utils.schema)
+    :param batch_size: Number of nodes sent per statement
+    :return: Number of keys sent
+    """
+    key = node_key(label)
+    query = f"UNWIND $rows AS key MATCH (n:{label} {{{key}: key}}) DETACH DELETE n"
+    return run_batched(conn, query, keys, batch_size, description=f"{label} node deletes")
+
+
+def delete_relationships_bulk(conn, label1, label2, pairs, relationship_type, batch_size=1000):
+    """
+    Delete relationships of one type between identified node pairs, one UNWIND statement per batch.
+    :param pairs: Sequence of [node1_props, node2_props] identifying each pair; every pair uses the same keys
+    :return: Number of pairs sent
+    """
+    if not pairs:
+        return 0
+    node1_string = ', '.join([f"{key}: row.n1.{key}" for key in pairs[0][0]])
+    node2_string = ', '.join([f"{key}: row.n2.{key}" for key in pairs[0][1]])
+    query = (f"UNWIND $rows AS row "
+             f"MATCH (n1:{label1} {{{node1_string}}})-[r:{relationship_type}]->(n2:{label2} {{{node2_string}}}) "
+             f"DELETE r")
+    rows = ({"n1": pair[0], "n2": pair[1]} for pair in pairs)
+    return run_batched(conn, query, rows, batch_size, description=f"{relationship_type} relationship deletes")